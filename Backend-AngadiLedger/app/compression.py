@@ -0,0 +1,200 @@
+import asyncio
+import os
+import zlib
+from typing import List, Optional
+
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+# Larger chunks are compressed in a worker thread; zlib and zstd release the GIL.
+COMPRESSION_THREAD_THRESHOLD = 256 * 1024
+
+# Already-compressed formats (PDF, XLSX, ZIP, Parquet) are left alone.
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/xml",
+    "application/vnd.apache.arrow.stream",
+)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _supported_encodings() -> List[str]:
+    return ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    # Picks the supported coding with the highest q-value; zstd wins ties.
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        weights[name] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in _supported_encodings():
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _ZstdEncoder:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+class CompressionMiddleware:
+    # Compresses each body chunk as it is sent and flushes it, so streamed
+    # exports stay streamed. Bodies are held back only until minimum_size bytes
+    # have arrived; a response that ends before that is sent as is.
+    def __init__(
+        self,
+        app,
+        minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+        gzip_level: int = COMPRESSION_GZIP_LEVEL,
+        zstd_level: int = COMPRESSION_ZSTD_LEVEL
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = {name.lower(): value for name, value in scope.get("headers", [])}
+        encoding = negotiate_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None or b"range" in headers or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(send, encoding, self)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, send, encoding: str, options: CompressionMiddleware):
+        self._send = send
+        self.encoding = encoding
+        self.options = options
+        self.start_message = None
+        self.encoder = None
+        self.passthrough = False
+        self.pending: List[bytes] = []
+        self.pending_size = 0
+
+    async def _compress(self, data: bytes, finish: bool) -> bytes:
+        if len(data) >= COMPRESSION_THREAD_THRESHOLD:
+            compressed = await asyncio.to_thread(self.encoder.compress, data)
+        else:
+            compressed = self.encoder.compress(data) if data else b""
+        return compressed + self.encoder.finish() if finish else compressed
+
+    def _encoder(self):
+        if self.encoding == "zstd":
+            return _ZstdEncoder(self.options.zstd_level)
+        return _GzipEncoder(self.options.gzip_level)
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            self.passthrough = not self._compressible(message)
+            if self.passthrough:
+                await self._send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.encoder is not None:
+            data = await self._compress(body, finish=not more_body)
+            if data or not more_body:
+                await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+            return
+
+        self.pending.append(body)
+        self.pending_size += len(body)
+        if more_body and self.pending_size < self.options.minimum_size:
+            return
+        buffered = b"".join(self.pending)
+        self.pending = []
+        if not more_body and len(buffered) < self.options.minimum_size:
+            await self._send(self._with_headers())
+            await self._send({"type": "http.response.body", "body": buffered, "more_body": False})
+            return
+
+        self.encoder = self._encoder()
+        data = await self._compress(buffered, finish=not more_body)
+        await self._send(self._with_headers(self.encoding, None if more_body else len(data)))
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    def _compressible(self, message) -> bool:
+        if message["status"] < 200 or message["status"] in (204, 206, 304):
+            return False
+        content_type = b""
+        for name, value in message.get("headers", []):
+            name = name.lower()
+            if name == b"content-encoding":
+                return False
+            if name == b"accept-ranges" and value.lower() == b"bytes":
+                # Byte ranges refer to the identity encoding; compressing would
+                # break resumed downloads of files.
+                return False
+            if name == b"content-type":
+                content_type = value.lower()
+        return content_type.decode("latin-1").startswith(COMPRESSIBLE_TYPES)
+
+    def _with_headers(self, encoding: Optional[str] = None, content_length: Optional[int] = None) -> dict:
+        headers = []
+        vary = b"Accept-Encoding"
+        for name, value in self.start_message.get("headers", []):
+            lowered = name.lower()
+            if lowered == b"vary":
+                vary = value + b", " + vary
+                continue
+            if encoding is not None and lowered == b"content-length":
+                continue
+            if encoding is not None and lowered == b"etag" and not value.startswith(b"W/"):
+                # The encoded bytes differ from the identity representation.
+                value = b"W/" + value
+            headers.append((name, value))
+        headers.append((b"vary", vary))
+        if encoding is not None:
+            headers.append((b"content-encoding", encoding.encode()))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode()))
+        return {**self.start_message, "headers": headers}
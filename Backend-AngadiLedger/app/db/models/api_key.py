@@ -0,0 +1,24 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
+from app.database import Base
+
+class ApiKey(Base):
+    __tablename__ = "api_keys"
+    id = Column(Integer, primary_key=True)
+    business_id = Column(Integer, ForeignKey("businesses.id", ondelete="CASCADE"), nullable=False)
+    # Requests made with the key are recorded as made by the owner who issued it.
+    created_by_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String(100), nullable=False)
+    # The public part of the key, used to find it; only a SHA-256 of the
+    # whole key is stored.
+    prefix = Column(String(16), nullable=False)
+    key_hash = Column(String(64), nullable=False)
+    scopes = Column(String(200), nullable=False)  # space separated, e.g. "ledger:read ledger:write"
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+    last_used_at = Column(DateTime, nullable=True)
+    revoked_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_api_keys_prefix", "prefix", unique=True),
+        Index("ix_api_keys_business_id", "business_id"),
+    )
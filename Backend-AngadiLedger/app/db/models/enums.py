@@ -9,3 +9,9 @@ class StaffRoleEnum(str, enum.Enum):
     supervisor = "supervisor"
     cashier = "cashier"
     salesman = "salesman"
+
+class PaymentStatusEnum(str, enum.Enum):
+    pending = "pending"
+    paid = "paid"
+    overdue = "overdue"
+    disputed = "disputed"
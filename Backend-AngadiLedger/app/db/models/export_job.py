@@ -0,0 +1,32 @@
+from datetime import datetime, timezone
+from sqlalchemy import BigInteger, Column, Date, DateTime, ForeignKey, Index, Integer, String, Text
+from app.database import Base
+
+class ExportJob(Base):
+    __tablename__ = "export_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    business_id = Column(Integer, ForeignKey("businesses.id", ondelete="CASCADE"), nullable=False)
+    created_by_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    kind = Column(String(30), nullable=False)  # "ledger_entries", "payments", "customers", "statement_bundle"
+    format = Column(String(10), nullable=False)
+    from_date = Column(Date, nullable=True)
+    to_date = Column(Date, nullable=True)
+    status = Column(String(20), nullable=False, default="queued")  # "queued", "running", "completed", "failed", "expired"
+    rows_processed = Column(Integer, nullable=False, default=0)
+    total_rows = Column(Integer, nullable=True)
+    file_path = Column(String(500), nullable=True)
+    file_size = Column(BigInteger, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+    started_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)
+
+    # The worker picks queued jobs in order and counts running ones per
+    # business; the sweeper looks for completed jobs past their expiry.
+    __table_args__ = (
+        Index("ix_export_jobs_status_id", "status", "id"),
+        Index("ix_export_jobs_business_status", "business_id", "status"),
+        Index("ix_export_jobs_status_expires_at", "status", "expires_at"),
+    )
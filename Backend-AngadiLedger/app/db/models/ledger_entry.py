@@ -1,5 +1,5 @@
 from datetime import datetime,timezone
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, Numeric, String, Text
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, Numeric, String, Text
 from sqlalchemy.orm import relationship
 from app.database import Base
 from app.db.models.payment import Payment
@@ -14,12 +14,23 @@ class LedgerEntry(Base):
     amount = Column(Numeric(12, 2), nullable=False)
     description = Column(Text, nullable=True)
     image_url = Column(String(255), nullable=True)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+    updated_at = Column(DateTime, nullable=True, onupdate=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
     created_by_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     customer = relationship("Customer", back_populates="ledgers")
     created_by = relationship("User")
     payment_ledger_entries = relationship("PaymentLedgerEntry", back_populates="ledger_entry")
 
+    # customer_type_id serves the per-customer debit listing and its keyset
+    # pagination on id; customer_created_at serves statement date ranges and
+    # the opening balance sum before them; business_created_at serves
+    # business-wide exports over a date range.
+    __table_args__ = (
+        Index("ix_ledger_entries_customer_type_id", "customer_id", "entry_type", "id"),
+        Index("ix_ledger_entries_customer_created_at", "customer_id", "created_at", "id"),
+        Index("ix_ledger_entries_business_created_at", "business_id", "created_at", "id"),
+    )
+
 
 class PaymentLedgerEntry(Base):
     __tablename__ = "payment_ledger_entry"
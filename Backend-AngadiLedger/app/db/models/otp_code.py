@@ -0,0 +1,20 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
+from app.database import Base
+
+class OtpCode(Base):
+    __tablename__ = "otp_codes"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    purpose = Column(String(30), nullable=False, default="verify_account")
+    # HMAC-SHA256 of the code keyed with the server secret, never the code itself.
+    code_hash = Column(String(64), nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+    expires_at = Column(DateTime, nullable=False)
+
+    # One live code per user and purpose; the sweeper deletes by expiry.
+    __table_args__ = (
+        Index("ix_otp_codes_user_purpose", "user_id", "purpose", unique=True),
+        Index("ix_otp_codes_expires_at", "expires_at"),
+    )
@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, Numeric, String
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, Numeric, String
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -11,11 +11,19 @@ class Payment(Base):
     business_id = Column(Integer, ForeignKey("businesses.id", ondelete="CASCADE"), nullable=False)
     amount = Column(Numeric(12, 2), nullable=False)
     status = Column(String(20), nullable=False)  # "pending", "paid", "overdue", "disputed"
+    due_at = Column(DateTime, nullable=True)
     paid_at = Column(DateTime, nullable=True)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
     created_by_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     customer = relationship("Customer")
     created_by = relationship("User")
     payment_ledger_entries = relationship("PaymentLedgerEntry", back_populates="payment")
 
+    # The overdue sweeper range-scans (status, due_at) for pending payments past
+    # their deadline; accounting exports range-scan a business's paid payments.
+    __table_args__ = (
+        Index("ix_payments_status_due_at", "status", "due_at"),
+        Index("ix_payments_business_status_paid_at", "business_id", "status", "paid_at"),
+    )
+
 
@@ -1,13 +1,22 @@
 from datetime import datetime,timezone
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class PaymentReminder(Base):
     __tablename__ = "payment_reminders"
     id = Column(Integer, primary_key=True, index=True)
-    payment_id = Column(Integer, ForeignKey("payments.id", ondelete="CASCADE"), nullable=False)
-    sent_at = Column(DateTime, default=datetime.now(timezone.utc))
+    payment_id = Column(Integer, ForeignKey("payments.id", ondelete="CASCADE"), nullable=True)
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), nullable=True)
+    business_id = Column(Integer, ForeignKey("businesses.id", ondelete="CASCADE"), nullable=True)
+    sent_at = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
     method = Column(String(10), nullable=False)  # "sms" or "email"
     status = Column(String(20), nullable=False)  # "sent", "failed"
     payment = relationship("Payment")
+
+    # Throttle lookups are "who was reminded since X" for a batch of customers,
+    # and the quota is "how many sends since X" for a business.
+    __table_args__ = (
+        Index("ix_payment_reminders_customer_sent_at", "customer_id", "sent_at"),
+        Index("ix_payment_reminders_business_sent_at", "business_id", "sent_at"),
+    )
@@ -0,0 +1,15 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, Index, Integer
+from app.database import Base
+
+class PrincipalInvalidation(Base):
+    __tablename__ = "principal_invalidations"
+    id = Column(Integer, primary_key=True)
+    # No foreign key: deleted users are announced too.
+    user_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+
+    # Workers poll for ids above the last one they saw; old rows are pruned by age.
+    __table_args__ = (
+        Index("ix_principal_invalidations_created_at", "created_at"),
+    )
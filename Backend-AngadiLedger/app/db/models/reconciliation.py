@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Date, DateTime, ForeignKey, Integer, Numeric, String, Text, func
+from app.database import Base
+
+
+class ReconciliationMatch(Base):
+    __tablename__ = "reconciliation_matches"
+    id = Column(Integer, primary_key=True, index=True)
+    business_id = Column(Integer, ForeignKey("businesses.id", ondelete="CASCADE"), nullable=False, index=True)
+    ledger_entry_id = Column(Integer, ForeignKey("ledger_entries.id", ondelete="CASCADE"), nullable=True, unique=True)
+    payment_id = Column(Integer, ForeignKey("payments.id", ondelete="CASCADE"), nullable=True, unique=True)
+    statement_date = Column(Date, nullable=False)
+    amount = Column(Numeric(12, 2), nullable=False)
+    reference = Column(String(100), nullable=True)
+    narration = Column(Text, nullable=True)
+    match_method = Column(String(20), nullable=False)  # "exact", "reference", "phone", "phone_fuzzy", "reference_fuzzy"
+    matched_at = Column(DateTime, server_default=func.now())
+    matched_by_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -0,0 +1,25 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
+from app.database import Base
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    # Every token rotated from the same login shares a family.
+    family_id = Column(String(32), nullable=False)
+    # SHA-256 of the opaque token; the token itself is never stored.
+    token_hash = Column(String(64), nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=True)
+    revoked_at = Column(DateTime, nullable=True)
+
+    # Refresh looks tokens up by hash, reuse detection revokes a whole family
+    # and the sweeper deletes by expiry.
+    __table_args__ = (
+        Index("ix_refresh_tokens_token_hash", "token_hash", unique=True),
+        Index("ix_refresh_tokens_family_id", "family_id"),
+        Index("ix_refresh_tokens_user_id", "user_id"),
+        Index("ix_refresh_tokens_expires_at", "expires_at"),
+    )
@@ -0,0 +1,27 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, Index, Integer, String
+from app.database import Base
+
+class TokenRevocation(Base):
+    __tablename__ = "token_revocations"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(12), nullable=False)  # "token", "deactivate", "reactivate"
+    # Set for revoked access tokens only.
+    jti = Column(String(32), nullable=True)
+    # No foreign key: rows are pruned on their own schedule.
+    user_id = Column(Integer, nullable=False)
+    # When the row stops mattering: the token's own expiry, or how long a
+    # reactivation is kept for workers that are still catching up. Never
+    # set for deactivations.
+    expires_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+
+    # Workers read rows above the last id they saw or created recently; the
+    # sweep deletes by expiry and reactivation deletes a user's deactivations.
+    __table_args__ = (
+        Index("ix_token_revocations_created_at", "created_at"),
+        Index("ix_token_revocations_expires_at", "expires_at"),
+        Index("ix_token_revocations_user_id_kind", "user_id", "kind"),
+        # Ids must never be reused after deletes, or workers would skip rows.
+        {"sqlite_autoincrement": True},
+    )
@@ -17,6 +17,8 @@ class User(Base):
     otp_expiry = Column(DateTime, nullable=True)
     is_verified = Column(Boolean, default=False)
     phone_number = Column(String(20), nullable=True)
+    # Bumped when claims carried in access tokens change; older tokens stop working.
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     invited_by_id = Column(Integer, ForeignKey("users.id"), nullable=True) 
     invited_by = relationship("User", remote_side=[id])
     roles = relationship("UserRole", back_populates="user")
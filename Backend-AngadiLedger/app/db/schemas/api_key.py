@@ -0,0 +1,21 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from .enums import ApiKeyScopeEnum
+
+class ApiKeyCreate(BaseModel):
+    name: str = Field(min_length=1, max_length=100)
+    scopes: List[ApiKeyScopeEnum] = Field(min_length=1)
+
+class ApiKeyRead(BaseModel):
+    id: int
+    name: str
+    prefix: str
+    scopes: List[str]
+    created_at: datetime
+    last_used_at: Optional[datetime] = None
+    revoked_at: Optional[datetime] = None
+
+class ApiKeyCreated(ApiKeyRead):
+    # Shown only in the response that creates the key.
+    key: str
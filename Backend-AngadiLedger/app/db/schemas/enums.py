@@ -9,3 +9,55 @@ class StaffRoleEnum(str, Enum):
     supervisor = "supervisor"
     cashier = "cashier"
     delivery_man = "delivery_man"
+
+class PaymentStatusEnum(str, Enum):
+    pending = "pending"
+    paid = "paid"
+    overdue = "overdue"
+    disputed = "disputed"
+
+class StatementFormatEnum(str, Enum):
+    json = "json"
+    csv = "csv"
+    html = "html"
+    pdf = "pdf"
+    xlsx = "xlsx"
+
+class ExportTableEnum(str, Enum):
+    ledger_entries = "ledger_entries"
+    payments = "payments"
+    customers = "customers"
+
+class ColumnarFormatEnum(str, Enum):
+    parquet = "parquet"
+    arrow = "arrow"
+
+class MonthlyStatementFormatEnum(str, Enum):
+    csv = "csv"
+    pdf = "pdf"
+
+class StatementBundleFormatEnum(str, Enum):
+    csv = "csv"
+    html = "html"
+
+class ExportJobKindEnum(str, Enum):
+    ledger_entries = "ledger_entries"
+    payments = "payments"
+    customers = "customers"
+    statement_bundle = "statement_bundle"
+
+class ExportJobFormatEnum(str, Enum):
+    csv = "csv"
+    xlsx = "xlsx"
+    html = "html"
+    parquet = "parquet"
+    arrow = "arrow"
+
+class AccountingExportFormatEnum(str, Enum):
+    tally = "tally"
+    journal = "journal"
+
+class ApiKeyScopeEnum(str, Enum):
+    ledger_read = "ledger:read"
+    ledger_write = "ledger:write"
+    analytics_read = "analytics:read"
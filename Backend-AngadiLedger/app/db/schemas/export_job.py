@@ -0,0 +1,34 @@
+from datetime import date, datetime
+from pydantic import BaseModel
+from typing import Optional
+from .enums import ExportJobFormatEnum, ExportJobKindEnum
+
+class ExportJobCreate(BaseModel):
+    kind: ExportJobKindEnum
+    format: ExportJobFormatEnum
+    # Statement period; only used by statement_bundle exports.
+    from_date: Optional[date] = None
+    to_date: Optional[date] = None
+
+class ExportJobRead(BaseModel):
+    id: int
+    kind: str
+    format: str
+    status: str
+    from_date: Optional[date] = None
+    to_date: Optional[date] = None
+    # Rows for table exports, customers for statement bundles.
+    rows_processed: int
+    total_rows: Optional[int] = None
+    progress: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    file_size: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    download_url: Optional[str] = None
+
+    class Config:
+        from_attributes = True
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 from typing import List, Optional
 
@@ -36,4 +36,22 @@ class CustomerPayableLedger(BaseModel):
     ledgers: List[LedgerEntryRead]
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class StatementEntry(BaseModel):
+    ledger_entry_id: int
+    created_at: datetime
+    entry_type: str
+    description: Optional[str] = None
+    debit: Decimal
+    credit: Decimal
+    balance: Decimal
+
+class CustomerStatement(BaseModel):
+    customer_id: int
+    customer_name: str
+    from_date: Optional[date] = None
+    to_date: date
+    opening_balance: Decimal
+    closing_balance: Decimal
+    entries: List[StatementEntry]
@@ -2,6 +2,7 @@ from decimal import Decimal
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
+from .enums import PaymentStatusEnum
 
 class PaymentAllocation(BaseModel):
     ledger_entry_id: int
@@ -13,6 +14,7 @@ class PaymentCreateRequest(BaseModel):
     amount: float
     status: str
     paid_at: Optional[datetime] = None
+    due_at: Optional[datetime] = None
     created_by_id: int
     allocations: List[PaymentAllocation]
 
@@ -23,12 +25,17 @@ class PaymentResponse(BaseModel):
     amount: float
     status: str
     paid_at: Optional[datetime]
+    due_at: Optional[datetime] = None
     created_by_id: int
     allocations: List[PaymentAllocation]
 
     class Config:
         from_attributes = True
 
+class PaymentStatusUpdate(BaseModel):
+    status: PaymentStatusEnum
+    due_at: Optional[datetime] = None
+
 
 class PaymentFromLedgerEntry(BaseModel):
     ledger_entry_id: int
@@ -42,4 +49,4 @@ class PaymentFromLedgerEntry(BaseModel):
     paid_at: Optional[datetime] = None 
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
@@ -33,10 +33,16 @@ class UserVerifyOTP(BaseModel):
     email: EmailStr
     otp_code: str
 
+class UserResendOTP(BaseModel):
+    email: EmailStr
+
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
 
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
 class StaffCreate(BaseModel):
     email: EmailStr
     password: str
@@ -1,9 +1,37 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
-from app.routers import health, users, staff,admin,customer,ledger_entry,profile,payments,statement_download,analytics
+from app.routers import health, users, staff,admin,customer,ledger_entry,profile,payments,statement_download,analytics,reconciliation,exports,api_keys
+from app.compression import CompressionMiddleware
+from app.services.auth import password_hasher
+from app.services.export_job_service import EXPORT_POLL_INTERVAL_SECONDS, export_worker, run_export_jobs
+from app.services.monthly_statement_service import MONTHLY_STATEMENT_INTERVAL_SECONDS, generate_monthly_statements
+from app.services.otp import OTP_SWEEP_INTERVAL_SECONDS, sweep_expired_otps
+from app.services.payment_status_service import OVERDUE_SWEEP_INTERVAL_SECONDS, sweep_overdue_payments
+from app.services.pdf_service import pdf_pool
+from app.services.principal_cache import PRINCIPAL_CACHE_POLL_SECONDS, poll_principal_invalidations
+from app.services.refresh_tokens import REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS, sweep_refresh_tokens
+from app.services.scheduler import start_periodic_job, stop_periodic_jobs
+from app.services.token_revocation import TOKEN_REVOCATION_POLL_SECONDS, poll_token_revocations
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_periodic_job("overdue_payment_sweeper", OVERDUE_SWEEP_INTERVAL_SECONDS, sweep_overdue_payments)
+    start_periodic_job("monthly_statement_generator", MONTHLY_STATEMENT_INTERVAL_SECONDS, generate_monthly_statements)
+    start_periodic_job("export_jobs", EXPORT_POLL_INTERVAL_SECONDS, run_export_jobs)
+    start_periodic_job("principal_cache_invalidations", PRINCIPAL_CACHE_POLL_SECONDS, poll_principal_invalidations)
+    start_periodic_job("refresh_token_sweeper", REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS, sweep_refresh_tokens)
+    start_periodic_job("otp_sweeper", OTP_SWEEP_INTERVAL_SECONDS, sweep_expired_otps)
+    start_periodic_job("token_revocations", TOKEN_REVOCATION_POLL_SECONDS, poll_token_revocations)
+    yield
+    await stop_periodic_jobs()
+    await export_worker.shutdown()
+    pdf_pool.shutdown()
+    password_hasher.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 
 app.include_router(health.router)
@@ -16,6 +44,11 @@ app.include_router(ledger_entry.router,prefix="",tags=["ledger"])
 app.include_router(payments.router,prefix="/payments",tags=["payment"])
 app.include_router(statement_download.router,prefix="/download",tags=["statements"])
 app.include_router(analytics.router,prefix="",tags=["analytics"])
+app.include_router(reconciliation.router,prefix="/reconciliation",tags=["reconciliation"])
+app.include_router(exports.router,prefix="/exports",tags=["exports"])
+app.include_router(api_keys.router,prefix="/api-keys",tags=["api keys"])
+
+app.add_middleware(CompressionMiddleware)
 
 origins = [
     "http://localhost:4200", 
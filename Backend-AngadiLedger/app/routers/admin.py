@@ -6,6 +6,8 @@ from app.db.models.user import User, Role, UserRole
 from app.db.models.business import Business
 from app.db.schemas.user import OwnerUserRead, RoleRead, UserCreate, UserRead
 from app.services.auth import admin_required, get_password_hash
+from app.services.principal_cache import principals_changed
+from app.services.token_revocation import deactivate_user, reactivate_user
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.deps import get_db
 
@@ -48,7 +50,7 @@ async def add_owner(
 
         user = User(
             email=owner_in.email,
-            hashed_password=get_password_hash(owner_in.password),
+            hashed_password=await get_password_hash(owner_in.password),
             role="owner",
             business_id=business.id,
             phone_number=owner_in.phone_number,
@@ -100,6 +102,7 @@ async def delete_owner(
             raise HTTPException(status_code=404, detail="Owner not found")
         await db.delete(owner)
         await db.commit()
+        await principals_changed(owner_id)
         logger.info(f"Owner deleted: user_id={owner_id}")
         return {"detail": "Owner deleted successfully"}
     except HTTPException as http_exc:
@@ -109,6 +112,37 @@ async def delete_owner(
         logger.exception("Unexpected error in delete_owner")
         raise HTTPException(status_code=500, detail="Internal server error")
     
+async def _user_for_admin(db: AsyncSession, user_id: int) -> User:
+    result = await db.execute(select(User).where(User.id == user_id, User.role != "admin"))
+    user = result.scalars().first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+@router.post("/admin/users/{user_id}/deactivate")
+async def deactivate_user_account(
+    user_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(admin_required)
+):
+    # Takes effect on every worker within a poll interval, including for
+    # access tokens and API keys issued before.
+    user = await _user_for_admin(db, user_id)
+    await deactivate_user(db, user)
+    logger.info(f"User deactivated: user_id={user_id}")
+    return {"detail": "User deactivated successfully"}
+
+@router.post("/admin/users/{user_id}/activate")
+async def activate_user_account(
+    user_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(admin_required)
+):
+    user = await _user_for_admin(db, user_id)
+    await reactivate_user(db, user)
+    logger.info(f"User reactivated: user_id={user_id}")
+    return {"detail": "User activated successfully"}
+
 @router.get("/owners", response_model=list[OwnerUserRead])
 async def get_all_owners(
     db: AsyncSession = Depends(get_db),
@@ -0,0 +1,68 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.db.models.api_key import ApiKey
+from app.db.models.user import User
+from app.db.schemas.api_key import ApiKeyCreate, ApiKeyCreated, ApiKeyRead
+from app.deps import get_db
+from app.services.api_keys import api_key_scopes, issue_api_key, revoke_api_key
+from app.services.auth import owner_required
+
+router = APIRouter()
+
+def _key_read(api_key: ApiKey) -> ApiKeyRead:
+    return ApiKeyRead(
+        id=api_key.id,
+        name=api_key.name,
+        prefix=api_key.prefix,
+        scopes=api_key_scopes(api_key),
+        created_at=api_key.created_at,
+        last_used_at=api_key.last_used_at,
+        revoked_at=api_key.revoked_at
+    )
+
+async def business_api_key_required(
+    key_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(owner_required)
+) -> ApiKey:
+    result = await db.execute(select(ApiKey).where(ApiKey.id == key_id))
+    api_key = result.scalars().first()
+    if not api_key or api_key.business_id != current_user.business_id:
+        raise HTTPException(status_code=404, detail="API key not found.")
+    return api_key
+
+@router.post("/", response_model=ApiKeyCreated, status_code=status.HTTP_201_CREATED)
+async def create_api_key(
+    api_key_in: ApiKeyCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(owner_required)
+):
+    if not current_user.business_id:
+        raise HTTPException(status_code=400, detail="User is not associated with any business.")
+    api_key, key = issue_api_key(
+        db, current_user.business_id, current_user.id, api_key_in.name,
+        [scope.value for scope in api_key_in.scopes]
+    )
+    await db.commit()
+    await db.refresh(api_key)
+    return ApiKeyCreated(**_key_read(api_key).model_dump(), key=key)
+
+@router.get("/", response_model=List[ApiKeyRead])
+async def list_api_keys(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(owner_required)
+):
+    result = await db.execute(
+        select(ApiKey).where(ApiKey.business_id == current_user.business_id).order_by(ApiKey.id)
+    )
+    return [_key_read(api_key) for api_key in result.scalars().all()]
+
+@router.delete("/{key_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_api_key(
+    api_key: ApiKey = Depends(business_api_key_required),
+    db: AsyncSession = Depends(get_db)
+):
+    await revoke_api_key(db, api_key)
+    return
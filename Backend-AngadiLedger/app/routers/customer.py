@@ -1,29 +1,26 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.services.customer_services import business_customer_access_required
+from app.services.resource_access import business_customer_access_required, load_business_resource
 from app.db.models.customer import Customer
 from app.db.models.user import User
 from app.db.models.business import Business
 from app.deps import get_db
 from app.db.schemas.customer import CustomerCreate, CustomerRead, CustomerUpdate
 from app.services.auth import cashier_or_owner_required
+from app.services.monthly_statement_service import invalidate_monthly_statements
 
 router = APIRouter()
 
 @router.post("/customers/", response_model=CustomerRead, status_code=status.HTTP_201_CREATED)
 async def create_customer(
     customer: CustomerCreate,
+    request: Request,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(cashier_or_owner_required)
 ):
-    result = await db.execute(
-        select(Business).where(Business.id == current_user.business_id)
-    )
-    business = result.scalars().first()
-    if not business:
-        raise HTTPException(status_code=404, detail="Business not found.")
+    await load_business_resource(db, Business, current_user.business_id, current_user.business_id, request)
 
     new_customer = Customer(
         name=customer.name,
@@ -66,6 +63,7 @@ async def update_customer(
         setattr(customer, field, value)
     await db.commit()
     await db.refresh(customer)
+    invalidate_monthly_statements(customer.id)
     return customer
 
 @router.delete("/customers/{customer_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -73,8 +71,10 @@ async def delete_customer(
     customer: Customer = Depends(business_customer_access_required),
     db: AsyncSession = Depends(get_db)
 ):
+    customer_id = customer.id
     await db.delete(customer)
     await db.commit()
+    invalidate_monthly_statements(customer_id)
     return
 
 @router.get("/customers/", response_model=List[CustomerRead])
@@ -0,0 +1,102 @@
+import os
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.db.models.export_job import ExportJob
+from app.db.models.user import User
+from app.db.schemas.enums import ExportJobKindEnum
+from app.db.schemas.export_job import ExportJobCreate, ExportJobRead
+from app.deps import get_db
+from app.services.auth import cashier_or_owner_required
+from app.services.export_job_service import (
+    artifact_filename,
+    artifact_media_type,
+    estimate_progress,
+    export_worker,
+    validate_export_request,
+)
+from app.services.payment_status_service import utc_now
+
+router = APIRouter()
+
+def _job_read(job: ExportJob) -> ExportJobRead:
+    rows, total_rows = job.rows_processed, job.total_rows
+    live = export_worker.progress.get(job.id)
+    if live is not None:
+        rows, total_rows = live.rows, live.total_rows or total_rows
+    progress, eta_seconds = estimate_progress(job, rows, total_rows)
+    read = ExportJobRead.model_validate(job)
+    read.rows_processed, read.total_rows = rows, total_rows
+    read.progress, read.eta_seconds = progress, eta_seconds
+    if job.status == "completed":
+        read.download_url = f"/exports/{job.id}/download"
+    return read
+
+async def business_export_job_required(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(cashier_or_owner_required)
+) -> ExportJob:
+    result = await db.execute(select(ExportJob).where(ExportJob.id == job_id))
+    job = result.scalars().first()
+    if not job or job.business_id != current_user.business_id:
+        raise HTTPException(status_code=404, detail="Export job not found.")
+    return job
+
+@router.post("/", response_model=ExportJobRead, status_code=status.HTTP_202_ACCEPTED)
+async def create_export_job(
+    export: ExportJobCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(cashier_or_owner_required)
+):
+    validate_export_request(export.kind.value, export.format.value)
+    from_date, to_date = None, None
+    if export.kind == ExportJobKindEnum.statement_bundle:
+        from_date, to_date = export.from_date, export.to_date or utc_now().date()
+        if from_date is not None and from_date > to_date:
+            raise HTTPException(status_code=400, detail="from_date must not be after to_date.")
+
+    job = ExportJob(
+        business_id=current_user.business_id,
+        created_by_id=current_user.id,
+        kind=export.kind.value,
+        format=export.format.value,
+        from_date=from_date,
+        to_date=to_date,
+        status="queued",
+        rows_processed=0
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    export_worker.wake()
+    return _job_read(job)
+
+@router.get("/", response_model=List[ExportJobRead])
+async def list_export_jobs(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(cashier_or_owner_required)
+):
+    result = await db.execute(
+        select(ExportJob)
+        .where(ExportJob.business_id == current_user.business_id)
+        .order_by(ExportJob.id.desc())
+        .limit(50)
+    )
+    return [_job_read(job) for job in result.scalars().all()]
+
+@router.get("/{job_id}", response_model=ExportJobRead)
+async def get_export_job(job: ExportJob = Depends(business_export_job_required)):
+    return _job_read(job)
+
+@router.get("/{job_id}/download")
+async def download_export(job: ExportJob = Depends(business_export_job_required)):
+    # FileResponse answers Range and If-Range requests, so interrupted
+    # downloads resume from where they stopped.
+    if job.status == "expired" or (job.status == "completed" and not os.path.exists(job.file_path or "")):
+        raise HTTPException(status_code=410, detail="This export has expired. Please create a new one.")
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Export is not ready (status: {job.status}).")
+    return FileResponse(job.file_path, media_type=artifact_media_type(job), filename=artifact_filename(job))
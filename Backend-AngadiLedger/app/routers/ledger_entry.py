@@ -1,14 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from decimal import Decimal
-from app.services.ledger_services import business_access_required, business_customer_access_required, business_ledger_access_required, get_customer_balance, get_customer_balance_excluding_entry
+from app.services.ledger_services import get_customer_balance, get_customer_balance_excluding_entry
+from app.services.resource_access import business_access_required, business_customer_access_required, business_ledger_access_required, load_business_resource
 from app.db.models.customer import Customer
 from app.db.models.user import User
 from app.db.models.ledger_entry import LedgerEntry
 from app.deps import get_db
 from app.db.schemas.ledger_entry import LedgerEntryCreate, LedgerEntryRead
 from app.services.auth import cashier_or_owner_required
+from app.services.monthly_statement_service import invalidate_monthly_statements
 from app.db.schemas.ledger_entry import LedgerEntryUpdate, LedgerEntryRead
 from app.db.models.business import Business
 router = APIRouter()
@@ -16,10 +18,11 @@ router = APIRouter()
 @router.post("/ledger/", response_model=LedgerEntryRead)
 async def create_ledger_entry(
     entry: LedgerEntryCreate,
+    request: Request,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(cashier_or_owner_required)
 ):
-    
+    await load_business_resource(db, Customer, entry.customer_id, current_user.business_id, request)
     balance = await get_customer_balance(entry.customer_id, db)
 
     if entry.entry_type == "debit":
@@ -47,6 +50,7 @@ async def create_ledger_entry(
     db.add(new_entry)
     await db.commit()
     await db.refresh(new_entry)
+    invalidate_monthly_statements(new_entry.customer_id, new_entry.created_at)
     return LedgerEntryRead(
         id=new_entry.id,
         customer_id=new_entry.customer_id,
@@ -64,25 +68,19 @@ async def delete_ledger_entry(
     ledger_entry: LedgerEntry = Depends(business_ledger_access_required),
     db: AsyncSession = Depends(get_db)
 ):
+    customer_id, created_at = ledger_entry.customer_id, ledger_entry.created_at
     await db.delete(ledger_entry)
     await db.commit()
+    invalidate_monthly_statements(customer_id, created_at)
     return
 
 
 @router.put("/ledger/{ledger_entry_id}", response_model=LedgerEntryRead)
 async def update_ledger_entry(
-    ledger_entry_id: int,
     entry_update: LedgerEntryUpdate,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(cashier_or_owner_required)
+    ledger_entry: LedgerEntry = Depends(business_ledger_access_required),
+    db: AsyncSession = Depends(get_db)
 ):
-    result = await db.execute(
-        select(LedgerEntry).where(LedgerEntry.id == ledger_entry_id)
-    )
-    ledger_entry = result.scalars().first()
-    if not ledger_entry:
-        raise HTTPException(status_code=404, detail="Ledger entry not found.")
-
     balance = await get_customer_balance_excluding_entry(
         ledger_entry.customer_id, ledger_entry.id, db
     )
@@ -106,6 +104,7 @@ async def update_ledger_entry(
         setattr(ledger_entry, field, value)
     await db.commit()
     await db.refresh(ledger_entry)
+    invalidate_monthly_statements(ledger_entry.customer_id, ledger_entry.created_at)
     return LedgerEntryRead(
         id=ledger_entry.id,
         customer_id=ledger_entry.customer_id,
@@ -1,24 +1,72 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
-from app.db.schemas.payment import PaymentCreateRequest, PaymentFromLedgerEntry, PaymentResponse
+from app.db.schemas.payment import PaymentCreateRequest, PaymentFromLedgerEntry, PaymentResponse, PaymentStatusUpdate
 from app.deps import get_db
-from app.services.payment_service import get_outstanding_balances, get_partial_settlements, get_payments_from_ledger_entries, send_email_reminder
+from app.services.payment_service import create_payment, get_outstanding_balances, get_partial_settlements, get_payments_from_ledger_entries, update_payment_status
+from app.db.models.customer import Customer
 from app.db.models.user import User
+from app.services.mailer import send_email
+from app.services.payment_import_service import import_payments_csv
+from app.services.payment_status_service import utc_now
+from app.services.reminder_service import REMINDER_HOURLY_QUOTA, REMINDER_THROTTLE_HOURS, claim_reminders, count_business_reminders_since, finish_reminder, get_recently_reminded_customer_ids, lock_business_reminders, plan_reminders
 from app.services.auth import cashier_or_owner_required
+from app.services.resource_access import business_customer_access_required
 from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter()
 
+@router.post("/", response_model=PaymentResponse, status_code=status.HTTP_201_CREATED)
+async def create_customer_payment(
+    payment_in: PaymentCreateRequest,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(cashier_or_owner_required)
+):
+    return await create_payment(payment_in, user, db)
+
+@router.post("/import")
+async def import_payments(
+    request: Request,
+    dry_run: bool = False,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(cashier_or_owner_required)
+):
+    # The CSV is sent as the raw text/csv request body and parsed as it streams in.
+    return await import_payments_csv(request.stream(), user, db, dry_run)
+
+@router.patch("/{payment_id}/status", response_model=PaymentResponse)
+async def change_payment_status(
+    payment_id: int,
+    status_update: PaymentStatusUpdate,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(cashier_or_owner_required)
+):
+    payment = await update_payment_status(payment_id, status_update.status.value, status_update.due_at, user, db)
+    return PaymentResponse(
+        id=payment.id,
+        customer_id=payment.customer_id,
+        business_id=payment.business_id,
+        amount=float(payment.amount),
+        status=payment.status,
+        paid_at=payment.paid_at,
+        due_at=payment.due_at,
+        created_by_id=payment.created_by_id,
+        allocations=[]
+    )
+
 @router.get("/customers/{customer_id}/payments-from-ledger/", response_model=List[PaymentFromLedgerEntry])
 async def get_payments_for_customer(
     customer_id: int,
+    after_id: Optional[int] = Query(None, description="Return entries after this ledger_entry_id"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
     db: AsyncSession = Depends(get_db),
-    user=Depends(cashier_or_owner_required)
+    customer: Customer = Depends(business_customer_access_required)
 ):
-    payments = await get_payments_from_ledger_entries(db, customer_id)
-    if not payments:
+    payments = await get_payments_from_ledger_entries(db, customer.id, customer.business_id, after_id, from_date, to_date, limit)
+    if not payments and after_id is None:
         raise HTTPException(status_code=404, detail="No payments found for this customer.")
     return payments
 
@@ -38,6 +86,7 @@ async def outstanding_balance_endpoint(
 
 @router.post("/customers/outstanding-balances/send-reminders/")
 async def send_outstanding_balance_reminders(
+    window_hours: int = Query(REMINDER_THROTTLE_HOURS, ge=REMINDER_THROTTLE_HOURS, description="Skip customers reminded within this many hours (at least the throttle window)"),
     db: AsyncSession = Depends(get_db),
     current_user=Depends(cashier_or_owner_required)
 ):
@@ -47,13 +96,30 @@ async def send_outstanding_balance_reminders(
 
     sent = []
     failed = []
+    reachable = []
     for customer in customers:
+        if not customer.get("email"):
+            failed.append({"customer": customer.get("customer_name"), "reason": "No email address"})
+        else:
+            reachable.append(customer)
+
+    now = utc_now()
+    await lock_business_reminders(db, current_user.business_id)
+    recently_reminded = await get_recently_reminded_customer_ids(
+        db, [customer["customer_id"] for customer in reachable], now - timedelta(hours=window_hours)
+    )
+    sent_last_hour = await count_business_reminders_since(db, current_user.business_id, now - timedelta(hours=1))
+    to_send, skipped = plan_reminders(reachable, recently_reminded, REMINDER_HOURLY_QUOTA - sent_last_hour, window_hours)
+
+    # Claims are committed before any mail goes out: a crash or a concurrent
+    # run leaves them behind as "sending", which the throttle check honours.
+    reminder_ids = await claim_reminders(
+        db, current_user.business_id, [customer["customer_id"] for customer in to_send], "email", now
+    )
+    for customer, reminder_id in zip(to_send, reminder_ids):
         email = customer.get("email")
         name = customer.get("customer_name")
         balance = customer.get("outstanding_balance")
-        if not email:
-            failed.append({"customer": name, "reason": "No email address"})
-            continue
         subject = "Outstanding Balance Reminder"
         body = (
             f"Dear {name},\n\n"
@@ -62,11 +128,14 @@ async def send_outstanding_balance_reminders(
             "Thank you."
         )
         try:
-            await send_email_reminder(email, subject, body)
+            await send_email(email, subject, body)
             sent.append(email)
+            outcome = "sent"
         except Exception as e:
             failed.append({"customer": name, "reason": str(e)})
+            outcome = "failed"
+        await finish_reminder(db, reminder_id, outcome)
 
-    return {"sent": sent, "failed": failed}
+    return {"sent": sent, "failed": failed, "skipped": skipped}
 
 
@@ -5,18 +5,27 @@ from app.deps import get_db
 from app.db.models.user import User, UserRole, Role
 from app.db.models.business import Business
 from app.db.models.user import StaffAssignment
-from app.services.auth import get_current_user
+from app.services.auth import user_required
+from app.services.principal_cache import Principal, principals_changed
 from app.db.schemas.user import BusinessDetail, PersonalDetail, UserProfileRead, UserProfileUpdate, UserProfileView
 
 router = APIRouter()
 
+async def _load_user(db: AsyncSession, current_user: Principal) -> User:
+    # The principal carries only what authorization needs; profiles need the row.
+    user = await db.get(User, current_user.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
 @router.get("/profile", response_model=UserProfileRead)
 async def get_profile(
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(user_required)
 ):
+    user = await _load_user(db, current_user)
     result = await db.execute(
-        select(UserRole).where(UserRole.user_id == current_user.id)
+        select(UserRole).where(UserRole.user_id == user.id)
     )
     user_roles = result.scalars().all()
 
@@ -30,22 +39,22 @@ async def get_profile(
             role_names.append(role.name)
 
     profile_data = {
-        "id": current_user.id,
-        "email": current_user.email,
-        "phone_number": current_user.phone_number,
-        "is_verified": current_user.is_verified,
-        "role": current_user.role,
+        "id": user.id,
+        "email": user.email,
+        "phone_number": user.phone_number,
+        "is_verified": user.is_verified,
+        "role": user.role,
         "roles": role_names
     }
 
-    if current_user.role == "admin":
+    if user.role == "admin":
         return UserProfileRead(**profile_data)
 
-    elif current_user.role == "owner":
+    elif user.role == "owner":
         business_name = None
-        if current_user.business_id:
+        if user.business_id:
             result = await db.execute(
-                select(Business).where(Business.id == current_user.business_id)
+                select(Business).where(Business.id == user.business_id)
             )
             business = result.scalars().first()
             if business:
@@ -53,11 +62,11 @@ async def get_profile(
         profile_data["business_name"] = business_name
         return UserProfileRead(**profile_data)
 
-    elif current_user.role == "staff":
+    elif user.role == "staff":
         business_name = None
-        if current_user.business_id:
+        if user.business_id:
             result = await db.execute(
-                select(Business).where(Business.id == current_user.business_id)
+                select(Business).where(Business.id == user.business_id)
             )
             business = result.scalars().first()
             if business:
@@ -66,7 +75,7 @@ async def get_profile(
 
         assigned_role = None
         result = await db.execute(
-            select(StaffAssignment).where(StaffAssignment.staff_id == current_user.id)
+            select(StaffAssignment).where(StaffAssignment.staff_id == user.id)
         )
         assignment = result.scalars().first()
         if assignment:
@@ -81,16 +90,18 @@ async def get_profile(
 async def update_profile(
     update: UserProfileUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(user_required)
 ):
-    current_user.phone_number = update.phone_number
+    user = await _load_user(db, current_user)
+    user.phone_number = update.phone_number
 
-    db.add(current_user)
+    db.add(user)
     await db.commit()
-    await db.refresh(current_user)
+    await db.refresh(user)
+    await principals_changed(user.id)
 
     result = await db.execute(
-        select(UserRole).where(UserRole.user_id == current_user.id)
+        select(UserRole).where(UserRole.user_id == user.id)
     )
     user_roles = result.scalars().all()
     role_names = []
@@ -103,22 +114,22 @@ async def update_profile(
             role_names.append(role.name)
 
     profile_data = {
-        "id": current_user.id,
-        "email": current_user.email,
-        "phone_number": current_user.phone_number,
-        "is_verified": current_user.is_verified,
-        "role": current_user.role,
+        "id": user.id,
+        "email": user.email,
+        "phone_number": user.phone_number,
+        "is_verified": user.is_verified,
+        "role": user.role,
         "roles": role_names
     }
 
-    if current_user.role == "admin":
+    if user.role == "admin":
         return UserProfileRead(**profile_data)
 
-    elif current_user.role == "owner":
+    elif user.role == "owner":
         business_name = None
-        if current_user.business_id:
+        if user.business_id:
             result = await db.execute(
-                select(Business).where(Business.id == current_user.business_id)
+                select(Business).where(Business.id == user.business_id)
             )
             business = result.scalars().first()
             if business:
@@ -126,11 +137,11 @@ async def update_profile(
         profile_data["business_name"] = business_name
         return UserProfileRead(**profile_data)
 
-    elif current_user.role == "staff":
+    elif user.role == "staff":
         business_name = None
-        if current_user.business_id:
+        if user.business_id:
             result = await db.execute(
-                select(Business).where(Business.id == current_user.business_id)
+                select(Business).where(Business.id == user.business_id)
             )
             business = result.scalars().first()
             if business:
@@ -139,7 +150,7 @@ async def update_profile(
 
         assigned_role = None
         result = await db.execute(
-            select(StaffAssignment).where(StaffAssignment.staff_id == current_user.id)
+            select(StaffAssignment).where(StaffAssignment.staff_id == user.id)
         )
         assignment = result.scalars().first()
         if assignment:
@@ -153,28 +164,29 @@ async def update_profile(
 @router.get("/profile/details", response_model=UserProfileView)
 async def view_profile_details(
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(user_required)
 ):
+    user = await _load_user(db, current_user)
     personal = PersonalDetail(
-        email=current_user.email,
-        phone_number=current_user.phone_number
+        email=user.email,
+        phone_number=user.phone_number
     )
 
-    business_email = current_user.email
+    business_email = user.email
     business_name = None
     assigned_role = None
 
-    if current_user.role in ("owner", "staff") and current_user.business_id:
+    if user.role in ("owner", "staff") and user.business_id:
         result = await db.execute(
-            select(Business).where(Business.id == current_user.business_id)
+            select(Business).where(Business.id == user.business_id)
         )
         business = result.scalars().first()
         if business:
             business_name = business.name
 
-    if current_user.role == "staff":
+    if user.role == "staff":
         result = await db.execute(
-            select(StaffAssignment).where(StaffAssignment.staff_id == current_user.id)
+            select(StaffAssignment).where(StaffAssignment.staff_id == user.id)
         )
         assignment = result.scalars().first()
         if assignment:
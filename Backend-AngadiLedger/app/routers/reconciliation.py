@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.deps import get_db
+from app.services.auth import cashier_or_owner_required
+from app.services.reconciliation_service import RECONCILIATION_DATE_WINDOW_DAYS, reconcile_statement
+
+router = APIRouter()
+
+@router.post("/statements/import")
+async def import_bank_statement(
+    request: Request,
+    window_days: int = Query(RECONCILIATION_DATE_WINDOW_DAYS, ge=0, le=15),
+    dry_run: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(cashier_or_owner_required)
+):
+    # The statement is sent as the raw text/csv request body and parsed as it streams in.
+    report = await reconcile_statement(request.stream(), current_user, db, window_days, dry_run)
+    # The report only holds JSON-native values; skip jsonable_encoder on 100k-row reports.
+    return JSONResponse(content=report)
@@ -8,6 +8,8 @@ from app.db.schemas.user import StaffCreate, RoleRead, StaffListItem, StaffUpdat
 from app.db.models.business import Business
 from app.services.auth import owner_required, get_password_hash
 from app.services.otp import generate_otp
+from app.services.principal_cache import principals_changed
+from app.services.token_revocation import deactivate_user, reactivate_user
 from app.deps import get_db
 
 router = APIRouter()
@@ -44,7 +46,7 @@ async def add_staff(
             logger.warning("Attempt to add staff with existing email (redacted)")
             raise HTTPException(status_code=400, detail="User with this email already exists.")
 
-        hashed_password = get_password_hash(staff.password)
+        hashed_password = await get_password_hash(staff.password)
         new_user = User(
             email=staff.email,
             hashed_password=hashed_password,
@@ -79,6 +81,7 @@ async def add_staff(
         )
         db.add(staff_assignment)
         await db.commit()
+        await principals_changed(new_user.id)
         logger.info(f"Staff assignment created for user_id={new_user.id} as assigned_role (redacted)")
 
         return UserRead(
@@ -174,6 +177,7 @@ async def delete_staff(
 
     await db.delete(staff)
     await db.commit()
+    await principals_changed(staff_id)
     return
 
 
@@ -207,6 +211,8 @@ async def update_staff(
             select(StaffAssignment).where(StaffAssignment.staff_id == staff.id)
         )
         assignment = assignment_result.scalars().first()
+        if assignment and assignment.assigned_role != update.assigned_role:
+            staff.token_version = (staff.token_version or 0) + 1
         if assignment:
             assignment.assigned_role = update.assigned_role
             db.add(assignment)
@@ -216,13 +222,50 @@ async def update_staff(
                 assigned_role=update.assigned_role
             )
             db.add(new_assignment)
+            staff.token_version = (staff.token_version or 0) + 1
 
     db.add(staff)
     await db.commit()
     await db.refresh(staff)
+    await principals_changed(staff.id)
 
     return {"detail": "Staff updated successfully"}
 
+async def _staff_of_owner(db: AsyncSession, staff_id: int, current_user: User) -> User:
+    result = await db.execute(
+        select(User).where(
+            User.id == staff_id,
+            User.role == "staff",
+            User.business_id == current_user.business_id
+        )
+    )
+    staff = result.scalars().first()
+    if not staff:
+        raise HTTPException(status_code=404, detail="Staff not found or not part of your business")
+    return staff
+
+@router.post("/owner/deactivate/{staff_id}")
+async def deactivate_staff(
+    staff_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(owner_required)
+):
+    staff = await _staff_of_owner(db, staff_id, current_user)
+    await deactivate_user(db, staff)
+    logger.info(f"Staff deactivated: user_id={staff_id}")
+    return {"detail": "Staff deactivated successfully"}
+
+@router.post("/owner/activate/{staff_id}")
+async def activate_staff(
+    staff_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(owner_required)
+):
+    staff = await _staff_of_owner(db, staff_id, current_user)
+    await reactivate_user(db, staff)
+    logger.info(f"Staff reactivated: user_id={staff_id}")
+    return {"detail": "Staff activated successfully"}
+
 @router.get("/owner/staffs/{staff_id}", response_model=StaffListItem)
 async def get_staff_detail(
     staff_id: int,
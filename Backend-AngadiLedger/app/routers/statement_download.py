@@ -1,9 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import StreamingResponse
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Path, Request
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.business import Business
+from app.db.models.customer import Customer
+from app.db.models.ledger_entry import LedgerEntry
+from app.db.schemas.enums import AccountingExportFormatEnum, ColumnarFormatEnum, ExportTableEnum, MonthlyStatementFormatEnum, StatementBundleFormatEnum, StatementFormatEnum
+from app.db.schemas.ledger_entry import CustomerStatement
 from app.deps import get_db
-from app.services.payment_service import get_outstanding_balances, get_partial_settlements, get_payments_from_ledger_entries
-from app.services.statement_services import list_of_dicts_to_csv
+from app.services.accounting_export import iter_vouchers, stream_journal_csv, stream_tally_xml
+from app.services.arrow_export import MEDIA_TYPES, arrow_export_available, stream_table_export
+from app.services.ledger_services import iter_ledger_entries
+from app.services.resource_access import business_access_required, business_customer_access_required
+from app.services.monthly_statement_service import cached_file_response, closed_month_for_period, monthly_statement
+from app.services.payment_service import iter_outstanding_balances, iter_partial_settlements, iter_payments_from_ledger_entries
+from app.services.payment_status_service import utc_now
+from app.services.pdf_service import customer_statement_pdf, outstanding_balances_pdf, pdf_rendering_available
+from app.services.statement_bundle_service import iter_bundle_customers, stream_statement_bundle
+from app.services.statement_services import csv_streaming_response, get_statement_balances, iter_statement_entries, peek_rows, statement_csv_rows, stream_statement_html
+from app.services.xlsx_export import xlsx_streaming_response
 from app.services.auth import cashier_or_owner_required
 
 router = APIRouter()
@@ -11,34 +27,25 @@ router = APIRouter()
 @router.get("/customers/{customer_id}/payments-from-ledger/download-csv/")
 async def download_payments_csv(
     customer_id: int,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
     db: AsyncSession = Depends(get_db),
-    user=Depends(cashier_or_owner_required)
-
+    customer: Customer = Depends(business_customer_access_required)
 ):
-    payments = await get_payments_from_ledger_entries(db, customer_id)
-    if not payments:
+    payments = await peek_rows(iter_payments_from_ledger_entries(db, customer.id, customer.business_id, from_date, to_date))
+    if payments is None:
         raise HTTPException(status_code=404, detail="No payments found for this customer.")
-    csv_file = list_of_dicts_to_csv(payments)
-    return StreamingResponse(
-        csv_file,
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=payments_customer_{customer_id}.csv"}
-    )
+    return csv_streaming_response(payments, f"payments_customer_{customer_id}.csv")
 
 @router.get("/customers/partial-settlements/download-csv/")
 async def download_partial_settlements_csv(
     db: AsyncSession = Depends(get_db),
     user=Depends(cashier_or_owner_required)
 ):
-    settlements = await get_partial_settlements(user,db)
-    if not settlements:
+    settlements = await peek_rows(iter_partial_settlements(user, db))
+    if settlements is None:
         raise HTTPException(status_code=404, detail="No partial settlements found.")
-    csv_file = list_of_dicts_to_csv(settlements)
-    return StreamingResponse(
-        csv_file,
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=partial_settlements.csv"}
-    )
+    return csv_streaming_response(settlements, "partial_settlements.csv")
 
 
 @router.get("/customers/outstanding-balances/download-csv/")
@@ -46,12 +53,210 @@ async def download_outstanding_balances_csv(
     db: AsyncSession = Depends(get_db),
     user=Depends(cashier_or_owner_required)
 ):
-    balances = await get_outstanding_balances(user,db, threshold=10000.0)
-    if not balances:
+    balances = await peek_rows(iter_outstanding_balances(user, db, threshold=10000.0))
+    if balances is None:
         raise HTTPException(status_code=404, detail="No outstanding balances found.")
-    csv_file = list_of_dicts_to_csv(balances)
+    return csv_streaming_response(balances, "outstanding_balances.csv")
+
+def _require_pdf_rendering():
+    if not pdf_rendering_available():
+        raise HTTPException(status_code=501, detail="PDF rendering is not installed on this server.")
+
+@router.get("/customers/outstanding-balances/download-pdf/")
+async def download_outstanding_balances_pdf(
+    db: AsyncSession = Depends(get_db),
+    user=Depends(cashier_or_owner_required)
+):
+    _require_pdf_rendering()
+    path = await outstanding_balances_pdf(db, user, threshold=10000.0)
+    if path is None:
+        raise HTTPException(status_code=404, detail="No outstanding balances found.")
+    return FileResponse(path, media_type="application/pdf", filename="outstanding_balances.pdf")
+
+async def _xlsx_download(rows, sheet_title: str, filename: str, not_found_detail: str):
+    rows = await peek_rows(rows)
+    if rows is None:
+        raise HTTPException(status_code=404, detail=not_found_detail)
+    return xlsx_streaming_response(rows, sheet_title, filename)
+
+@router.get("/customers/{customer_id}/payments-from-ledger/download-xlsx/")
+async def download_payments_xlsx(
+    customer_id: int,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    db: AsyncSession = Depends(get_db),
+    customer: Customer = Depends(business_customer_access_required)
+):
+    return await _xlsx_download(
+        iter_payments_from_ledger_entries(db, customer.id, customer.business_id, from_date, to_date),
+        "Payments", f"payments_customer_{customer_id}.xlsx", "No payments found for this customer."
+    )
+
+@router.get("/customers/partial-settlements/download-xlsx/")
+async def download_partial_settlements_xlsx(
+    db: AsyncSession = Depends(get_db),
+    user=Depends(cashier_or_owner_required)
+):
+    return await _xlsx_download(
+        iter_partial_settlements(user, db),
+        "Partial settlements", "partial_settlements.xlsx", "No partial settlements found."
+    )
+
+@router.get("/customers/outstanding-balances/download-xlsx/")
+async def download_outstanding_balances_xlsx(
+    db: AsyncSession = Depends(get_db),
+    user=Depends(cashier_or_owner_required)
+):
+    return await _xlsx_download(
+        iter_outstanding_balances(user, db, threshold=10000.0),
+        "Outstanding balances", "outstanding_balances.xlsx", "No outstanding balances found."
+    )
+
+@router.get("/customers/{customer_id}/ledgers/download-xlsx/")
+async def download_customer_ledgers_xlsx(
+    customer: Customer = Depends(business_customer_access_required),
+    db: AsyncSession = Depends(get_db)
+):
+    return await _xlsx_download(
+        iter_ledger_entries(db, LedgerEntry.customer_id == customer.id),
+        "Ledger", f"ledger_customer_{customer.id}.xlsx", "No ledger entries found for this customer."
+    )
+
+@router.get("/businesses/{business_id}/ledgers/download-xlsx/")
+async def download_business_ledgers_xlsx(
+    business: Business = Depends(business_access_required),
+    db: AsyncSession = Depends(get_db)
+):
+    return await _xlsx_download(
+        iter_ledger_entries(db, LedgerEntry.business_id == business.id),
+        "Ledger", f"ledger_business_{business.id}.xlsx", "No ledger entries found for this business."
+    )
+
+@router.get("/businesses/{business_id}/export/{table}")
+async def export_business_table(
+    table: ExportTableEnum,
+    format: ColumnarFormatEnum = ColumnarFormatEnum.parquet,
+    business: Business = Depends(business_access_required),
+    db: AsyncSession = Depends(get_db)
+):
+    if not arrow_export_available():
+        raise HTTPException(status_code=501, detail="Columnar export is not installed on this server.")
+    return StreamingResponse(
+        stream_table_export(db, table.value, business.id, format.value),
+        media_type=MEDIA_TYPES[format.value],
+        headers={"Content-Disposition": f"attachment; filename={table.value}_business_{business.id}.{format.value}"}
+    )
+
+@router.get("/businesses/{business_id}/statements/bundle")
+async def download_statement_bundle(
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    format: StatementBundleFormatEnum = StatementBundleFormatEnum.csv,
+    business: Business = Depends(business_access_required),
+    db: AsyncSession = Depends(get_db)
+):
+    to_date = to_date or utc_now().date()
+    if from_date is not None and from_date > to_date:
+        raise HTTPException(status_code=400, detail="from_date must not be after to_date.")
+    customers = await peek_rows(iter_bundle_customers(db, business.id, from_date, to_date))
+    if customers is None:
+        raise HTTPException(status_code=404, detail="No customers found for this business.")
+    return StreamingResponse(
+        stream_statement_bundle(db, business.id, customers, from_date, to_date, format.value),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=statements_business_{business.id}_{to_date.isoformat()}.zip"}
+    )
+
+@router.get("/businesses/{business_id}/accounting-export")
+async def download_accounting_export(
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    format: AccountingExportFormatEnum = AccountingExportFormatEnum.tally,
+    include_payments: bool = True,
+    business: Business = Depends(business_access_required),
+    db: AsyncSession = Depends(get_db)
+):
+    to_date = to_date or utc_now().date()
+    if from_date is not None and from_date > to_date:
+        raise HTTPException(status_code=400, detail="from_date must not be after to_date.")
+    vouchers = iter_vouchers(db, business.id, from_date, to_date, include_payments)
+    period = f"{from_date.isoformat() if from_date else 'start'}_{to_date.isoformat()}"
+    if format == AccountingExportFormatEnum.journal:
+        return StreamingResponse(
+            stream_journal_csv(vouchers),
+            media_type="text/csv",
+            headers={"Content-Disposition": f"attachment; filename=journal_business_{business.id}_{period}.csv"}
+        )
     return StreamingResponse(
-        csv_file,
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=outstanding_balances.csv"}
-    )
\ No newline at end of file
+        stream_tally_xml(vouchers, business.name),
+        media_type="application/xml",
+        headers={"Content-Disposition": f"attachment; filename=tally_vouchers_business_{business.id}_{period}.xml"}
+    )
+
+async def _monthly_statement_response(request: Request, db: AsyncSession, customer: Customer, year: int, month: int, fmt: str):
+    path, digest = await monthly_statement(db, customer, year, month, fmt)
+    filename = f"statement_customer_{customer.id}_{year:04d}-{month:02d}.{fmt}"
+    return cached_file_response(request, path, digest, fmt, filename)
+
+@router.get("/customers/{customer_id}/statements/{year}/{month}")
+async def download_monthly_statement(
+    request: Request,
+    customer_id: int,
+    year: int = Path(..., ge=2000, le=9999),
+    month: int = Path(..., ge=1, le=12),
+    format: MonthlyStatementFormatEnum = MonthlyStatementFormatEnum.pdf,
+    db: AsyncSession = Depends(get_db),
+    customer: Customer = Depends(business_customer_access_required)
+):
+    if format == MonthlyStatementFormatEnum.pdf:
+        _require_pdf_rendering()
+    return await _monthly_statement_response(request, db, customer, year, month, format.value)
+
+@router.get("/customers/{customer_id}/statement", response_model=CustomerStatement)
+async def download_customer_statement(
+    request: Request,
+    customer_id: int,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    format: StatementFormatEnum = StatementFormatEnum.json,
+    db: AsyncSession = Depends(get_db),
+    customer: Customer = Depends(business_customer_access_required)
+):
+    to_date = to_date or utc_now().date()
+    if from_date is not None and from_date > to_date:
+        raise HTTPException(status_code=400, detail="from_date must not be after to_date.")
+
+    closed_month = closed_month_for_period(from_date, to_date)
+    if closed_month is not None and format in (StatementFormatEnum.csv, StatementFormatEnum.pdf):
+        if format == StatementFormatEnum.pdf:
+            _require_pdf_rendering()
+        return await _monthly_statement_response(request, db, customer, *closed_month, format.value)
+
+    if format == StatementFormatEnum.pdf:
+        _require_pdf_rendering()
+        path = await customer_statement_pdf(db, customer, from_date, to_date)
+        return FileResponse(path, media_type="application/pdf", filename=f"statement_customer_{customer.id}_{to_date.isoformat()}.pdf")
+
+    opening_balance, closing_balance = await get_statement_balances(db, customer.id, from_date, to_date)
+    entries = iter_statement_entries(db, customer.id, from_date, to_date, opening_balance)
+
+    if format == StatementFormatEnum.csv:
+        rows = statement_csv_rows(entries, from_date, to_date, opening_balance, closing_balance)
+        return csv_streaming_response(rows, f"statement_customer_{customer.id}_{to_date.isoformat()}.csv")
+    if format == StatementFormatEnum.xlsx:
+        rows = statement_csv_rows(entries, from_date, to_date, opening_balance, closing_balance)
+        return xlsx_streaming_response(rows, "Statement", f"statement_customer_{customer.id}_{to_date.isoformat()}.xlsx")
+    if format == StatementFormatEnum.html:
+        return StreamingResponse(
+            stream_statement_html(customer, entries, from_date, to_date, opening_balance, closing_balance),
+            media_type="text/html"
+        )
+    return {
+        "customer_id": customer.id,
+        "customer_name": customer.name,
+        "from_date": from_date,
+        "to_date": to_date,
+        "opening_balance": opening_balance,
+        "closing_balance": closing_balance,
+        "entries": [entry async for entry in entries],
+    }
@@ -1,13 +1,27 @@
 import os
 import logging
-from fastapi import APIRouter, Depends, HTTPException, Request
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy import select
-from app.db.schemas.user import RoleRead, UserCreate, UserLogin, UserRead, UserVerifyOTP
+from app.db.schemas.user import RoleRead, TokenRefresh, UserCreate, UserLogin, UserRead, UserResendOTP, UserVerifyOTP
 from app.db.models.user import Role, User, UserRole
 from app.deps import get_db
-from app.services.auth import create_access_token, get_password_hash
-from app.services.auth import verify_password
-from app.services.otp import generate_otp
+from app.services.auth import access_token_claims, bearer_scheme, create_access_token, decode_access_token, get_password_hash, load_principal, user_required
+from app.services.auth import verify_and_update_password
+from app.services.otp import issue_otp, verify_otp_code
+from app.services.rate_limit import (
+    LOGIN_RATE_LIMIT_PER_ACCOUNT,
+    LOGIN_RATE_LIMIT_PER_IP,
+    OTP_RATE_LIMIT_PER_ACCOUNT,
+    OTP_RATE_LIMIT_PER_IP,
+    client_address,
+    rate_limiter,
+)
+from app.services.principal_cache import Principal
+from app.services.refresh_tokens import issue_refresh_token, revoke_refresh_token, rotate_refresh_token
+from app.services.token_revocation import revoke_access_token
 from app.db.models.business import Business
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -49,15 +63,12 @@ async def register_user(user_in: UserCreate, db: AsyncSession = Depends(get_db))
                 logger.info("Business created during registration (name redacted)")
             business_id = business.id
 
-        otp_code = generate_otp()
-
         user = User(
             email=user_in.email,
-            hashed_password=get_password_hash(user_in.password),
+            hashed_password=await get_password_hash(user_in.password),
             role=user_in.role,
             business_id=business_id,
             phone_number=user_in.phone_number,
-            otp_code=otp_code,
             is_verified=False
         )
         db.add(user)
@@ -76,6 +87,9 @@ async def register_user(user_in: UserCreate, db: AsyncSession = Depends(get_db))
         user_role = UserRole(user_id=user.id, role_id=role.id)
         db.add(user_role)
         await db.commit()
+        # A code that could not be sent does not undo the registration; the
+        # user asks for another through /resend-otp.
+        await issue_otp(db, user)
 
         return UserRead(
             id=user.id,
@@ -93,20 +107,29 @@ async def register_user(user_in: UserCreate, db: AsyncSession = Depends(get_db))
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.post("/verify-otp", response_model=UserRead)
-async def verify_otp(otp_data: UserVerifyOTP, db: AsyncSession = Depends(get_db)):
+async def verify_otp(request: Request, otp_data: UserVerifyOTP, db: AsyncSession = Depends(get_db)):
     try:
+        # Every attempt counts against the client's address; only wrong codes
+        # count against the account, so guessing is capped per account. The
+        # account is charged up front and refunded otherwise, so concurrent
+        # guesses cannot all get past the limit before one is counted.
+        account_key = f"otp:account:{otp_data.email.lower()}"
+        await rate_limiter.hit(f"otp:ip:{client_address(request)}", OTP_RATE_LIMIT_PER_IP)
+        await rate_limiter.hit(account_key, OTP_RATE_LIMIT_PER_ACCOUNT)
+
         result = await db.execute(select(User).where(User.email == otp_data.email))
         user = result.scalars().first()
         if not user:
+            await rate_limiter.refund(account_key, OTP_RATE_LIMIT_PER_ACCOUNT)
             logger.warning("OTP verification attempt for non-existent user (email redacted)")
             raise HTTPException(status_code=404, detail="User not found")
 
-        if user.otp_code != otp_data.otp_code:
+        if not await verify_otp_code(db, user, otp_data.otp_code):
             logger.warning(f"Invalid OTP attempt for user_id={user.id}")
             raise HTTPException(status_code=400, detail="Invalid OTP")
+        await rate_limiter.refund(account_key, OTP_RATE_LIMIT_PER_ACCOUNT)
 
         user.is_verified = True
-        user.otp_code = None
         await db.commit()
         await db.refresh(user)
         logger.info(f"User verified via OTP: user_id={user.id}")
@@ -129,9 +152,39 @@ async def verify_otp(otp_data: UserVerifyOTP, db: AsyncSession = Depends(get_db)
         logger.exception("Unexpected error in verify_otp")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.post("/resend-otp")
+async def resend_otp(request: Request, otp_data: UserResendOTP, db: AsyncSession = Depends(get_db)):
+    try:
+        await rate_limiter.hit(f"otp:ip:{client_address(request)}", OTP_RATE_LIMIT_PER_IP)
+        result = await db.execute(select(User).where(User.email == otp_data.email))
+        user = result.scalars().first()
+        if not user:
+            logger.warning("OTP resend for non-existent user (email redacted)")
+            raise HTTPException(status_code=404, detail="User not found")
+        if user.is_verified:
+            raise HTTPException(status_code=400, detail="User already verified")
+        if await issue_otp(db, user) is None:
+            raise HTTPException(status_code=503, detail="The code could not be sent. Please try again shortly.")
+        logger.info(f"OTP resent: user_id={user.id}")
+        return {"detail": "A new code has been sent."}
+    except HTTPException as http_exc:
+        logger.error(f"HTTPException in resend_otp: {http_exc.detail}")
+        raise
+    except Exception:
+        logger.exception("Unexpected error in resend_otp")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @router.post("/login")
 async def login(request: Request,user_in: UserLogin, db: AsyncSession = Depends(get_db)):
     try:
+        # Charged before the lookup and the bcrypt call, so throttled attempts
+        # cost nothing and concurrent guesses cannot all pass before one is
+        # counted. A correct password is refunded, so only failed passwords
+        # count against the account.
+        account_key = f"login:account:{user_in.email.lower()}"
+        await rate_limiter.hit(f"login:ip:{client_address(request)}", LOGIN_RATE_LIMIT_PER_IP)
+        await rate_limiter.hit(account_key, LOGIN_RATE_LIMIT_PER_ACCOUNT)
+
         logger.debug("Starting login DB query")
         result = await db.execute(select(User).where(User.email == user_in.email))
         logger.debug("Fetching user from DB result")
@@ -139,22 +192,34 @@ async def login(request: Request,user_in: UserLogin, db: AsyncSession = Depends(
         if not user:
             logger.warning("Login attempt with invalid credentials (email redacted)")
             raise HTTPException(status_code=401, detail="Invalid credentials")
-        if not verify_password(user_in.password, user.hashed_password):
+        valid, new_hash = await verify_and_update_password(user_in.password, user.hashed_password)
+        if not valid:
             logger.warning(f"Login attempt with invalid password for user_id={user.id}")
             raise HTTPException(status_code=401, detail="Invalid credentials")
+        await rate_limiter.refund(account_key, LOGIN_RATE_LIMIT_PER_ACCOUNT)
+        if new_hash is not None:
+            user.hashed_password = new_hash
+            await db.commit()
+            logger.info(f"Password hash upgraded: user_id={user.id}")
 
         if not user.is_verified:
             logger.warning(f"Unverified user login attempt: user_id={user.id}")
             raise HTTPException(status_code=403, detail="User not verified")
+        if user.is_active is False:
+            logger.warning(f"Deactivated user login attempt: user_id={user.id}")
+            raise HTTPException(status_code=403, detail="User is deactivated")
 
         role = user.role
-        token_data = {"sub": user.email, "role": role}
+        principal = await load_principal(db, user.email)
         logger.debug("Creating access token")
-        access_token = create_access_token(token_data)
+        access_token = create_access_token(access_token_claims(principal))
+        refresh_token = issue_refresh_token(db, user.id)
+        await db.commit()
         logger.info(f"User logged in: user_id={user.id}")
 
         return {
             "access_token": access_token,
+            "refresh_token": refresh_token,
             "token_type": "bearer",
             "user": {
                 "id": user.id,
@@ -164,6 +229,54 @@ async def login(request: Request,user_in: UserLogin, db: AsyncSession = Depends(
                 "phone_number": user.phone_number
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Login error: {e}")  # Replace with proper logging in production
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/token/refresh")
+async def refresh_access_token(token_in: TokenRefresh, db: AsyncSession = Depends(get_db)):
+    # Trades a refresh token for a new access token and a new refresh token,
+    # without the password check that makes /login expensive.
+    try:
+        user, refresh_token = await rotate_refresh_token(db, token_in.refresh_token)
+        if not user.is_verified:
+            raise HTTPException(status_code=403, detail="User not verified")
+        if user.is_active is False:
+            raise HTTPException(status_code=403, detail="User is deactivated")
+        principal = await load_principal(db, user.email)
+        access_token = create_access_token(access_token_claims(principal))
+        logger.info(f"Access token refreshed: user_id={user.id}")
+        return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+    except HTTPException as http_exc:
+        logger.warning(f"HTTPException in refresh_access_token: {http_exc.detail}")
+        raise
+    except Exception:
+        logger.exception("Unexpected error in refresh_access_token")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    token_in: Optional[TokenRefresh] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+    current_user: Principal = Depends(user_required),
+    db: AsyncSession = Depends(get_db)
+):
+    # Revokes the access token that made the request and, when given, the
+    # refresh token of the same login. API keys are revoked under /api-keys.
+    try:
+        if credentials is not None:
+            payload = decode_access_token(credentials.credentials)
+            if payload.get("jti"):
+                expires_at = datetime.fromtimestamp(payload["exp"], timezone.utc).replace(tzinfo=None)
+                await revoke_access_token(db, payload["jti"], current_user.id, expires_at)
+        if token_in is not None:
+            await revoke_refresh_token(db, token_in.refresh_token, current_user.id)
+        logger.info(f"User logged out: user_id={current_user.id}")
+        return
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Unexpected error in logout")
+        raise HTTPException(status_code=500, detail="Internal server error")
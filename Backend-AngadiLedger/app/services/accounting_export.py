@@ -0,0 +1,219 @@
+import io
+import os
+import re
+from datetime import date
+from decimal import Decimal
+from typing import AsyncIterator, Optional
+from xml.sax.saxutils import XMLGenerator, escape
+from sqlalchemy import String, exists, literal, null, or_, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.customer import Customer
+from app.db.models.ledger_entry import LedgerEntry, PaymentLedgerEntry
+from app.db.models.payment import Payment
+from app.services.statement_services import CENT, statement_period, stream_csv
+
+ACCOUNTING_FETCH_SIZE = 1000
+ACCOUNTING_VOUCHERS_PER_CHUNK = int(os.getenv("ACCOUNTING_VOUCHERS_PER_CHUNK", "500"))
+TALLY_CASH_LEDGER = os.getenv("TALLY_CASH_LEDGER", "Cash")
+TALLY_SALES_LEDGER = os.getenv("TALLY_SALES_LEDGER", "Sales")
+
+JOURNAL_FIELDS = [
+    "date", "voucher_number", "voucher_type", "account", "debit", "credit",
+    "narration", "customer_id", "source", "source_id",
+]
+# XML 1.0 forbids these control characters; Tally rejects files containing them.
+_ILLEGAL_CHARACTERS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _vouchers_stmt(business_id: int, from_date: Optional[date], to_date: date, include_payments: bool):
+    start, end = statement_period(from_date, to_date)
+    ledger = (
+        select(
+            literal("ledger", String).label("source"),
+            LedgerEntry.id.label("source_id"),
+            LedgerEntry.entry_type.label("entry_type"),
+            LedgerEntry.created_at.label("voucher_at"),
+            LedgerEntry.amount,
+            LedgerEntry.description,
+            Customer.id.label("customer_id"),
+            Customer.name.label("customer_name")
+        )
+        .join(Customer, Customer.id == LedgerEntry.customer_id)
+        .where(LedgerEntry.business_id == business_id, LedgerEntry.created_at < end)
+    )
+    if start is not None:
+        ledger = ledger.where(LedgerEntry.created_at >= start)
+    if not include_payments:
+        vouchers = ledger.subquery()
+    else:
+        # A ledger debit allocated to a paid payment records that payment;
+        # the payment's own voucher stands for it, so it is not booked twice.
+        recorded_payment = exists().where(
+            PaymentLedgerEntry.ledger_entry_id == LedgerEntry.id,
+            PaymentLedgerEntry.payment_id == Payment.id,
+            Payment.status == "paid"
+        )
+        ledger = ledger.where(or_(LedgerEntry.entry_type != "debit", ~recorded_payment))
+        payments = (
+            select(
+                literal("payment", String),
+                Payment.id,
+                literal("payment", String),
+                Payment.paid_at,
+                Payment.amount,
+                null(),
+                Customer.id,
+                Customer.name
+            )
+            .join(Customer, Customer.id == Payment.customer_id)
+            .where(Payment.business_id == business_id, Payment.status == "paid", Payment.paid_at < end)
+        )
+        if start is not None:
+            payments = payments.where(Payment.paid_at >= start)
+        vouchers = union_all(ledger, payments).subquery()
+    return select(vouchers).order_by(vouchers.c.voucher_at, vouchers.c.source, vouchers.c.source_id)
+
+
+def party_ledger_name(customer_id: int, customer_name: str) -> str:
+    # Tally ledger names must be unique, customer names are not.
+    return f"{customer_name} [{customer_id}]"
+
+
+def _voucher_from_row(row) -> dict:
+    # Ledger credits are sales on the customer's account; ledger debits and
+    # paid payments are receipts from the customer.
+    party = party_ledger_name(row.customer_id, row.customer_name)
+    amount = Decimal(row.amount).quantize(CENT)
+    if row.source == "payment":
+        number, voucher_type = f"PAY-{row.source_id}", "Receipt"
+        narration = f"Payment #{row.source_id}"
+    else:
+        number = f"LE-{row.source_id}"
+        voucher_type = "Sales" if row.entry_type == "credit" else "Receipt"
+        narration = row.description or ""
+    if voucher_type == "Sales":
+        debit_account, credit_account = party, TALLY_SALES_LEDGER
+    else:
+        debit_account, credit_account = TALLY_CASH_LEDGER, party
+    return {
+        "date": row.voucher_at.date(),
+        "voucher_number": number,
+        "voucher_type": voucher_type,
+        "party": party,
+        "debit_account": debit_account,
+        "credit_account": credit_account,
+        "amount": amount,
+        "narration": narration,
+        "customer_id": row.customer_id,
+        "source": row.source,
+        "source_id": row.source_id,
+    }
+
+
+async def iter_vouchers(
+    db: AsyncSession,
+    business_id: int,
+    from_date: Optional[date],
+    to_date: date,
+    include_payments: bool = True
+) -> AsyncIterator[dict]:
+    stmt = _vouchers_stmt(business_id, from_date, to_date, include_payments)
+    result = await db.stream(stmt.execution_options(yield_per=ACCOUNTING_FETCH_SIZE))
+    async for rows in result.partitions():
+        for row in rows:
+            yield _voucher_from_row(row)
+
+
+async def journal_rows(vouchers: AsyncIterator[dict]) -> AsyncIterator[dict]:
+    async for voucher in vouchers:
+        common = {
+            "date": voucher["date"],
+            "voucher_number": voucher["voucher_number"],
+            "voucher_type": voucher["voucher_type"],
+            "narration": voucher["narration"],
+            "customer_id": voucher["customer_id"],
+            "source": voucher["source"],
+            "source_id": voucher["source_id"],
+        }
+        yield {**common, "account": voucher["debit_account"], "debit": voucher["amount"], "credit": ""}
+        yield {**common, "account": voucher["credit_account"], "debit": "", "credit": voucher["amount"]}
+
+
+def stream_journal_csv(vouchers: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    return stream_csv(journal_rows(vouchers), fieldnames=JOURNAL_FIELDS)
+
+
+def _clean(value) -> str:
+    text = str(value)
+    if _ILLEGAL_CHARACTERS.search(text):
+        text = _ILLEGAL_CHARACTERS.sub("", text)
+    return escape(text)
+
+
+def _element(writer: XMLGenerator, name: str, value):
+    writer.startElement(name, {})
+    writer.characters(_ILLEGAL_CHARACTERS.sub("", str(value)))
+    writer.endElement(name)
+
+
+def _ledger_line_xml(ledger_name: str, amount: Decimal, is_debit: bool) -> str:
+    # Tally writes debits as negative amounts flagged ISDEEMEDPOSITIVE=Yes.
+    return (
+        f"<ALLLEDGERENTRIES.LIST><LEDGERNAME>{_clean(ledger_name)}</LEDGERNAME>"
+        f"<ISDEEMEDPOSITIVE>{'Yes' if is_debit else 'No'}</ISDEEMEDPOSITIVE>"
+        f"<AMOUNT>{-amount if is_debit else amount:.2f}</AMOUNT></ALLLEDGERENTRIES.LIST>"
+    )
+
+
+def _voucher_xml(voucher: dict) -> str:
+    # Vouchers are formatted directly rather than through SAX calls, which
+    # cost several times more per voucher; every text value is escaped.
+    return (
+        f'<TALLYMESSAGE xmlns:UDF="TallyUDF"><VOUCHER VCHTYPE="{voucher["voucher_type"]}" ACTION="Create">'
+        f"<DATE>{voucher['date'].strftime('%Y%m%d')}</DATE>"
+        f"<VOUCHERTYPENAME>{voucher['voucher_type']}</VOUCHERTYPENAME>"
+        f"<VOUCHERNUMBER>{voucher['voucher_number']}</VOUCHERNUMBER>"
+        f"<PARTYLEDGERNAME>{_clean(voucher['party'])}</PARTYLEDGERNAME>"
+        f"<NARRATION>{_clean(voucher['narration'])}</NARRATION>"
+        + _ledger_line_xml(voucher["debit_account"], voucher["amount"], True)
+        + _ledger_line_xml(voucher["credit_account"], voucher["amount"], False)
+        + "</VOUCHER></TALLYMESSAGE>"
+    )
+
+
+async def stream_tally_xml(vouchers: AsyncIterator[dict], company_name: str) -> AsyncIterator[bytes]:
+    # An Import Data envelope with one TALLYMESSAGE per voucher, written into a
+    # small text buffer that is sent and emptied every
+    # ACCOUNTING_VOUCHERS_PER_CHUNK vouchers.
+    buffer = io.StringIO()
+    writer = XMLGenerator(buffer, encoding="utf-8")
+    writer.startDocument()
+    writer.startElement("ENVELOPE", {})
+    writer.startElement("HEADER", {})
+    _element(writer, "TALLYREQUEST", "Import Data")
+    writer.endElement("HEADER")
+    writer.startElement("BODY", {})
+    writer.startElement("IMPORTDATA", {})
+    writer.startElement("REQUESTDESC", {})
+    _element(writer, "REPORTNAME", "Vouchers")
+    writer.startElement("STATICVARIABLES", {})
+    _element(writer, "SVCURRENTCOMPANY", company_name)
+    writer.endElement("STATICVARIABLES")
+    writer.endElement("REQUESTDESC")
+    writer.startElement("REQUESTDATA", {})
+
+    count = 0
+    async for voucher in vouchers:
+        buffer.write(_voucher_xml(voucher))
+        count += 1
+        if count % ACCOUNTING_VOUCHERS_PER_CHUNK == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    writer.endElement("REQUESTDATA")
+    writer.endElement("IMPORTDATA")
+    writer.endElement("BODY")
+    writer.endElement("ENVELOPE")
+    writer.endDocument()
+    yield buffer.getvalue().encode("utf-8")
@@ -0,0 +1,111 @@
+import hashlib
+import hmac
+import secrets
+from typing import Iterable, List, Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.api_key import ApiKey
+from app.db.models.user import User
+from app.services.payment_status_service import utc_now
+from app.services.principal_cache import Principal, principal_cache, principals_changed
+
+API_KEY_PREFIX = "al"
+# ledger:write passes the cashier checks, ledger:read passes them for GET
+# requests only and analytics:read passes the supervisor checks. No scope
+# reaches owner or admin endpoints.
+API_KEY_SCOPES = ("ledger:read", "ledger:write", "analytics:read")
+API_KEY_ROLE = "api_key"
+
+
+def hash_api_key(key: str) -> str:
+    # Keys hold 256 random bits, so a plain digest is enough and costs
+    # microseconds, not the bcrypt round of a password check.
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def generate_api_key() -> Tuple[str, str]:
+    prefix = secrets.token_hex(6)
+    return prefix, f"{API_KEY_PREFIX}_{prefix}_{secrets.token_urlsafe(32)}"
+
+
+def is_api_key(token: str) -> bool:
+    return token.startswith(f"{API_KEY_PREFIX}_")
+
+
+def api_key_prefix(key: str) -> Optional[str]:
+    parts = key.split("_", 2)
+    if len(parts) != 3 or parts[0] != API_KEY_PREFIX or not parts[1] or not parts[2]:
+        return None
+    return parts[1]
+
+
+def api_key_scopes(key: ApiKey) -> List[str]:
+    return key.scopes.split()
+
+
+def issue_api_key(db: AsyncSession, business_id: int, created_by_id: int, name: str, scopes: Iterable[str]) -> Tuple[ApiKey, str]:
+    # Added to the session; the caller commits. The key itself is returned
+    # once and cannot be recovered later.
+    prefix, key = generate_api_key()
+    api_key = ApiKey(
+        business_id=business_id,
+        created_by_id=created_by_id,
+        name=name,
+        prefix=prefix,
+        key_hash=hash_api_key(key),
+        scopes=" ".join(sorted(set(scopes)))
+    )
+    db.add(api_key)
+    return api_key, key
+
+
+async def revoke_api_key(db: AsyncSession, api_key: ApiKey):
+    if api_key.revoked_at is None:
+        api_key.revoked_at = utc_now()
+        await db.commit()
+    # Cached keys are filed under the owner who issued them.
+    await principals_changed(api_key.created_by_id)
+
+
+def _invalid_api_key(detail: str = "Invalid API key") -> HTTPException:
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=detail)
+
+
+async def resolve_api_key(db: AsyncSession, key: str) -> Principal:
+    # A cache hit means this exact key was checked within the cache TTL;
+    # otherwise the key is found by its indexed prefix and its digest
+    # compared in constant time.
+    key_hash = hash_api_key(key)
+    subject = f"{API_KEY_ROLE}:{key_hash}"
+    cached = principal_cache.get(subject)
+    if cached is not None:
+        return cached
+
+    prefix = api_key_prefix(key)
+    if prefix is None:
+        raise _invalid_api_key()
+    generation = principal_cache.generation
+    result = await db.execute(
+        select(ApiKey, User.is_active)
+        .join(User, User.id == ApiKey.created_by_id)
+        .where(ApiKey.prefix == prefix)
+    )
+    row = result.first()
+    if row is None or not hmac.compare_digest(row.ApiKey.key_hash, key_hash):
+        raise _invalid_api_key()
+    api_key = row.ApiKey
+    if api_key.revoked_at is not None:
+        raise _invalid_api_key("API key has been revoked")
+    if row.is_active is False:
+        raise _invalid_api_key("API key owner is inactive")
+
+    principal = Principal(
+        api_key.created_by_id, f"{API_KEY_ROLE}:{api_key.prefix}", API_KEY_ROLE, api_key.business_id, None,
+        True, 0, tuple(api_key_scopes(api_key))
+    )
+    # Written once per cache miss rather than on every request.
+    await db.execute(update(ApiKey).where(ApiKey.id == api_key.id).values(last_used_at=utc_now()))
+    await db.commit()
+    principal_cache.set(subject, principal, generation)
+    return principal
@@ -0,0 +1,97 @@
+import asyncio
+import importlib.util
+import os
+from typing import AsyncIterator, Callable, Optional, Sequence
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Numeric, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.customer import Customer
+from app.db.models.ledger_entry import LedgerEntry
+from app.db.models.payment import Payment
+from app.services.statement_services import ChunkSink
+
+ARROW_EXPORT_BATCH_ROWS = int(os.getenv("ARROW_EXPORT_BATCH_ROWS", "65536"))
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+
+EXPORT_TABLES = {
+    "ledger_entries": LedgerEntry,
+    "payments": Payment,
+    "customers": Customer,
+}
+MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def arrow_export_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _arrow_type(pa, column_type):
+    # Float subclasses Numeric, so it is checked first. Timestamps are naive
+    # UTC in the database and stay timezone-free in the export.
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, Numeric):
+        return pa.decimal128(column_type.precision or 38, column_type.scale or 0)
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column_type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def table_schema(pa, model):
+    return pa.schema(
+        [pa.field(column.name, _arrow_type(pa, column.type), nullable=bool(column.nullable)) for column in model.__table__.columns],
+        metadata={"table": model.__tablename__}
+    )
+
+
+def _write_batch(pa, writer, schema, rows: Sequence):
+    columns = zip(*rows)
+    arrays = [pa.array(values, type=field.type) for values, field in zip(columns, schema)]
+    writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+
+
+async def stream_table_export(
+    db: AsyncSession,
+    table: str,
+    business_id: int,
+    export_format: str,
+    progress: Optional[Callable[[int], None]] = None
+) -> AsyncIterator[bytes]:
+    # Rows are fetched in partitions of ARROW_EXPORT_BATCH_ROWS from a
+    # server-side cursor and each partition becomes one record batch (one row
+    # group in Parquet). Building and encoding a batch runs in a worker thread.
+    import pyarrow as pa
+
+    model = EXPORT_TABLES[table]
+    schema = table_schema(pa, model)
+    sink = ChunkSink()
+    if export_format == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(sink, schema, compression=PARQUET_COMPRESSION)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    stmt = (
+        select(*model.__table__.columns)
+        .where(model.business_id == business_id)
+        .order_by(model.id)
+        .execution_options(yield_per=ARROW_EXPORT_BATCH_ROWS)
+    )
+    result = await db.stream(stmt)
+    async for partition in result.partitions():
+        await asyncio.to_thread(_write_batch, pa, writer, schema, partition)
+        if progress is not None:
+            progress(len(partition))
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
@@ -1,9 +1,12 @@
+import asyncio
 import logging
 import os
 import sys
-from sqlalchemy.orm import selectinload
-from fastapi import Depends, HTTPException, logger,status
-from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer, OAuth2PasswordBearer
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from fastapi import Depends, HTTPException, Request, logger,status
+from fastapi.security import APIKeyHeader, HTTPAuthorizationCredentials, HTTPBearer, OAuth2PasswordBearer
 from jose import JWTError
 import jwt
 from passlib.context import CryptContext
@@ -11,9 +14,12 @@ from datetime import datetime,timezone,timedelta
 from sqlalchemy import select
 from app.deps import get_db
 from pytest import Session
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 from dotenv import load_dotenv
+from app.db.models.enums import StaffRoleEnum
 from app.db.models.user import StaffAssignment, User
+from app.services.api_keys import API_KEY_ROLE, is_api_key, resolve_api_key
+from app.services.principal_cache import Principal, principal_cache
+from app.services.token_revocation import revocation_list
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
@@ -22,96 +28,243 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES=10
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+def password_context(rounds: int) -> CryptContext:
+    # Pinning min and max rounds to the configured cost makes hashes of any
+    # other cost report needs_update, so they are rehashed at the next login.
+    return CryptContext(
+        schemes=["bcrypt"], deprecated="auto",
+        bcrypt__rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds
+    )
+
+
+pwd_context = password_context(BCRYPT_ROUNDS)
+
+
+class PasswordHasher:
+    # bcrypt takes hundreds of milliseconds per call and releases the GIL, so
+    # it runs on a small thread pool instead of the event loop. At most
+    # max_pending calls are queued or running; beyond that callers get a 503.
+    def __init__(self, workers: int, max_pending: int, context: CryptContext = pwd_context):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.context = context
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, func, *args):
+        if self._pending >= self.max_pending:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many sign-in requests. Please try again shortly.",
+                headers={"Retry-After": "1"}
+            )
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, plain_password, hashed_password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        # Returns a new hash alongside a successful check when the stored one
+        # was made with a different cost.
+        return await self._run(self.context.verify_and_update, plain_password, hashed_password)
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
+
+
+async def get_password_hash(password: str) -> str:
+    return await password_hasher.hash(password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await password_hasher.verify_and_update(plain_password, hashed_password)
 
 
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # The jti lets a single token be revoked before it expires.
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def access_token_claims(principal: Principal) -> dict:
+    # Everything the role dependencies check travels signed in the token.
+    return {
+        "sub": principal.email,
+        "role": principal.role,
+        "uid": principal.id,
+        "bid": principal.business_id,
+        "srole": principal.staff_role,
+        "ver": principal.token_version,
+    }
+
+def principal_from_claims(payload: dict, current: Principal) -> Principal:
+    # Tokens issued before claims were added carry none; they are served from
+    # the stored principal until they expire.
+    # get_current_user reloads a stored principal older than the token, so
+    # only tokens minted before the latest change are refused here.
+    if "ver" not in payload:
+        return current
+    if payload["ver"] < current.token_version or payload.get("uid") != current.id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token is out of date; refresh it or sign in again")
+    return Principal(
+        current.id, current.email, payload["role"], payload.get("bid"), payload.get("srole"),
+        current.is_active, current.token_version
+    )
+
 logger = logging.getLogger(__name__)
-bearer_scheme = HTTPBearer()
+# Either header may be missing; get_current_user reports when both are.
+bearer_scheme = HTTPBearer(auto_error=False)
+api_key_scheme = APIKeyHeader(name="X-API-Key", auto_error=False)
+SAFE_METHODS = ("GET", "HEAD")
+
+
+async def load_principal(db: AsyncSession, subject: str) -> Optional[Principal]:
+    # One query for the user and their staff assignment, if any.
+    result = await db.execute(
+        select(
+            User.id, User.email, User.role, User.business_id, StaffAssignment.assigned_role, User.is_active,
+            User.token_version
+        )
+        .outerjoin(StaffAssignment, StaffAssignment.staff_id == User.id)
+        .where(User.email == subject)
+        .limit(1)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    staff_role = row.assigned_role.value if isinstance(row.assigned_role, StaffRoleEnum) else row.assigned_role
+    return Principal(
+        row.id, row.email, row.role, row.business_id, staff_role, row.is_active is not False, row.token_version or 0
+    )
+
+
+def decode_access_token(token: str) -> dict:
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+
+def _not_revoked(principal: Principal, jti: Optional[str] = None) -> Principal:
+    # In-memory checks only; the revocation list is kept current by polling.
+    if not principal.is_active or revocation_list.is_revoked(jti, principal.id):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked")
+    return principal
 
 
 async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
-    db: AsyncSession = Depends(get_db)
-):
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+    db: AsyncSession = Depends(get_db),
+    api_key: Optional[str] = Depends(api_key_scheme)
+) -> Principal:
+    # Devices send an API key, as X-API-Key or as the bearer token; people
+    # send an access token.
+    if credentials is None:
+        if not isinstance(api_key, str) or not api_key:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated",
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+        return _not_revoked(await resolve_api_key(db, api_key))
     token = credentials.credentials
+    if is_api_key(token):
+        return _not_revoked(await resolve_api_key(db, token))
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         user_email = payload.get("sub")
         user_role = payload.get("role")
         if user_email is None or user_role is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
-        result = await db.execute(select(User).options(selectinload(User.roles)).where(User.email == user_email))
-        user = result.scalars().first()
-        if not user:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-        return user
-    except JWTError:
+        # The stored principal, usually from the cache, only vouches that the
+        # token's version is current; roles come from the signed claims.
+        current = principal_cache.get(user_email)
+        if current is not None and payload.get("ver", 0) > current.token_version:
+            # Minted after the cached copy was read, e.g. by another worker
+            # just after a role change; the cached copy is the stale one.
+            current = None
+        if current is None:
+            generation = principal_cache.generation
+            current = await load_principal(db, user_email)
+            if current is None:
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+            principal_cache.set(user_email, current, generation)
+        return _not_revoked(principal_from_claims(payload, current), payload.get("jti"))
+    except (JWTError, jwt.PyJWTError):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-def admin_required(current_user: User = Depends(get_current_user)):
+def user_required(current_user: Principal = Depends(get_current_user)):
+    # Endpoints about the signed-in person; an API key acts for a business, not a user.
+    if getattr(current_user, "role", None) == API_KEY_ROLE:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="API keys cannot access this endpoint")
+    return current_user
+
+def admin_required(current_user: Principal = Depends(get_current_user)):
     if getattr(current_user, "role", None) != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
     return current_user
 
-def owner_required(current_user: User = Depends(get_current_user)):
+def owner_required(current_user: Principal = Depends(get_current_user)):
     if getattr(current_user, "role", None) != "owner":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Owner privileges required")
     return current_user
 
-async def cashier_or_owner_required(
-    current_user = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
-):
+def api_key_allows(current_user: Principal, resource: str, request: Optional[Request] = None) -> bool:
+    # "<resource>:write" allows any request, "<resource>:read" only GET and HEAD.
+    if getattr(current_user, "role", None) != API_KEY_ROLE:
+        return False
+    if f"{resource}:write" in current_user.scopes:
+        return True
+    return f"{resource}:read" in current_user.scopes and request is not None and request.method in SAFE_METHODS
+
+async def cashier_or_owner_required(current_user: Principal = Depends(get_current_user), request: Request = None):
     if getattr(current_user, "role", None) == "owner":
         return current_user
-    
-    if getattr(current_user, "role", None) == "staff":
-        result = await db.execute(
-            select(StaffAssignment).where(
-                StaffAssignment.staff_id == current_user.id,
-                StaffAssignment.assigned_role == "cashier"
-            )
-        )
-        staff_assignment = result.scalars().first()
-        if staff_assignment:
-            return current_user
-        
+
+    if api_key_allows(current_user, "ledger", request):
+        return current_user
+
+    if getattr(current_user, "role", None) == "staff" and current_user.staff_role == "cashier":
+        return current_user
+
     raise HTTPException(
         status_code=status.HTTP_403_FORBIDDEN,
         detail="Only owners or cashiers can perform this action."
     )
 
-async def supervisor_or_owner_required(
-    current_user = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
-):
+async def supervisor_or_owner_required(current_user: Principal = Depends(get_current_user), request: Request = None):
     if getattr(current_user, "role", None) == "owner":
         return current_user
-    
-    if getattr(current_user, "role", None) == "staff":
-        result = await db.execute(
-            select(StaffAssignment).where(
-                StaffAssignment.staff_id == current_user.id,
-                StaffAssignment.assigned_role == "supervisor"
-            )
-        )
-        staff_assignment = result.scalars().first()
-        if staff_assignment:
-            return current_user
-        
+
+    if api_key_allows(current_user, "analytics", request):
+        return current_user
+
+    if getattr(current_user, "role", None) == "staff" and current_user.staff_role == "supervisor":
+        return current_user
+
     raise HTTPException(
         status_code=status.HTTP_403_FORBIDDEN,
         detail="Only owners or cashiers can perform this action."
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,141 @@
+import codecs
+import csv
+import re
+from functools import lru_cache
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+DATE_FORMATS = (
+    "%Y-%m-%d",
+    "%d/%m/%Y",
+    "%d-%m-%Y",
+    "%d/%m/%y",
+    "%d-%m-%y",
+    "%d-%b-%Y",
+    "%d %b %Y",
+    "%d-%b-%y",
+    "%Y-%m-%d %H:%M:%S",
+    "%d/%m/%Y %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+)
+
+_AMOUNT_NOISE = re.compile(r"[,\s₹]|INR|Rs\.?", re.IGNORECASE)
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalise_header(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", (name or "").strip().lower()).strip("_")
+
+class CsvRecordParser:
+    # Turns decoded text into CSV records as it arrives. A record may span several
+    # physical lines when a quoted field contains a newline, so lines are buffered
+    # until their quotes balance.
+    def __init__(self):
+        self.header: Optional[List[str]] = None
+        self.row_number = 0
+        self._buffer = ""
+        self._record = ""
+
+    def feed(self, text: str) -> List[Tuple[int, Dict[str, str]]]:
+        self._buffer += text
+        lines = self._buffer.split("\n")
+        self._buffer = lines.pop()
+        rows = []
+        for line in lines:
+            row = self._add_line(line)
+            if row is not None:
+                rows.append(row)
+        return rows
+
+    def close(self) -> List[Tuple[int, Dict[str, str]]]:
+        rows = []
+        if self._buffer:
+            row = self._add_line(self._buffer)
+            self._buffer = ""
+            if row is not None:
+                rows.append(row)
+        if self._record:
+            row = self._emit(self._record)
+            self._record = ""
+            if row is not None:
+                rows.append(row)
+        return rows
+
+    def _add_line(self, line: str) -> Optional[Tuple[int, Dict[str, str]]]:
+        self._record = f"{self._record}\n{line}" if self._record else line
+        if self._record.count('"') % 2:
+            return None
+        record, self._record = self._record, ""
+        return self._emit(record)
+
+    def _emit(self, record: str) -> Optional[Tuple[int, Dict[str, str]]]:
+        values = next(csv.reader([record.rstrip("\r")]), [])
+        if not any(value.strip() for value in values):
+            return None
+        if self.header is None:
+            self.header = [normalise_header(value) for value in values]
+            return None
+        self.row_number += 1
+        return self.row_number, dict(zip(self.header, (value.strip() for value in values)))
+
+
+async def iter_csv_records(chunks: AsyncIterator[bytes], encoding: str = "utf-8-sig") -> AsyncIterator[Tuple[int, Dict[str, str]]]:
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    parser = CsvRecordParser()
+    async for chunk in chunks:
+        for row in parser.feed(decoder.decode(chunk)):
+            yield row
+    for row in parser.feed(decoder.decode(b"", final=True)) + parser.close():
+        yield row
+
+def pick_column(columns: Iterable[str], *names: str) -> Optional[str]:
+    available = set(columns)
+    for name in names:
+        if name in available:
+            return name
+    return None
+
+def parse_amount(value: Optional[str]) -> Optional[Decimal]:
+    if value is None:
+        return None
+    cleaned = _AMOUNT_NOISE.sub("", value)
+    negative = cleaned.startswith("(") and cleaned.endswith(")")
+    cleaned = cleaned.strip("()")
+    if cleaned.upper().endswith(("CR", "DR")):
+        negative = negative or cleaned.upper().endswith("DR")
+        cleaned = cleaned[:-2]
+    if not cleaned:
+        return None
+    try:
+        amount = Decimal(cleaned).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        return None
+    return -amount if negative else amount
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    parsed = parse_datetime(value)
+    return parsed.date() if parsed else None
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    return _parse_datetime(value.strip())
+
+@lru_cache(maxsize=4096)
+def _parse_datetime(value: str) -> Optional[datetime]:
+    # Uploads repeat the same few dates thousands of times; strptime is the hot spot.
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+def normalise_phone(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    digits = _NON_DIGITS.sub("", value)
+    if len(digits) < 10:
+        return None
+    return digits[-10:]
@@ -0,0 +1,312 @@
+import asyncio
+import os
+import time
+from datetime import timedelta
+from typing import AsyncIterator, Callable, Dict, Optional
+from fastapi import HTTPException
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from app.database import SessionLocal
+from app.db.models.business import Business
+from app.db.models.customer import Customer
+from app.db.models.export_job import ExportJob
+from app.db.models.ledger_entry import LedgerEntry
+from app.db.models.payment import Payment
+from app.logger import logger
+from app.services.arrow_export import MEDIA_TYPES as COLUMNAR_MEDIA_TYPES, arrow_export_available, stream_table_export
+from app.services.ledger_services import iter_ledger_entries
+from app.services.payment_status_service import utc_now
+from app.services.statement_bundle_service import iter_bundle_customers, stream_statement_bundle
+from app.services.statement_services import stream_csv
+from app.services.xlsx_export import XLSX_MEDIA_TYPE, stream_xlsx
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join("cache", "exports"))
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "4"))
+EXPORT_MAX_JOBS_PER_BUSINESS = int(os.getenv("EXPORT_MAX_JOBS_PER_BUSINESS", "1"))
+EXPORT_TTL_SECONDS = int(os.getenv("EXPORT_TTL_SECONDS", str(24 * 3600)))
+EXPORT_POLL_INTERVAL_SECONDS = float(os.getenv("EXPORT_POLL_INTERVAL_SECONDS", "5"))
+EXPORT_PROGRESS_INTERVAL_SECONDS = float(os.getenv("EXPORT_PROGRESS_INTERVAL_SECONDS", "2"))
+EXPORT_STALE_SECONDS = int(os.getenv("EXPORT_STALE_SECONDS", "600"))
+# Running jobs touch updated_at this often even when no rows are written, so
+# the stale sweep only fails jobs whose worker is gone.
+EXPORT_HEARTBEAT_SECONDS = float(os.getenv("EXPORT_HEARTBEAT_SECONDS", "60"))
+
+EXPORT_FORMATS = {
+    "ledger_entries": {"csv", "xlsx", "parquet", "arrow"},
+    "payments": {"parquet", "arrow"},
+    "customers": {"parquet", "arrow"},
+    "statement_bundle": {"csv", "html"},
+}
+_COUNTED_MODELS = {
+    "ledger_entries": LedgerEntry,
+    "payments": Payment,
+    "customers": Customer,
+    "statement_bundle": Customer,
+}
+
+
+def validate_export_request(kind: str, export_format: str):
+    if export_format not in EXPORT_FORMATS[kind]:
+        supported = ", ".join(sorted(EXPORT_FORMATS[kind]))
+        raise HTTPException(status_code=400, detail=f"{kind} exports support these formats: {supported}.")
+    if export_format in ("parquet", "arrow") and not arrow_export_available():
+        raise HTTPException(status_code=501, detail="Columnar export is not installed on this server.")
+
+
+def artifact_extension(job: ExportJob) -> str:
+    return "zip" if job.kind == "statement_bundle" else job.format
+
+
+def artifact_media_type(job: ExportJob) -> str:
+    if job.kind == "statement_bundle":
+        return "application/zip"
+    if job.format in COLUMNAR_MEDIA_TYPES:
+        return COLUMNAR_MEDIA_TYPES[job.format]
+    return XLSX_MEDIA_TYPE if job.format == "xlsx" else "text/csv"
+
+
+def artifact_filename(job: ExportJob) -> str:
+    return f"{job.kind}_business_{job.business_id}_{job.id}.{artifact_extension(job)}"
+
+
+async def _counted(rows: AsyncIterator[dict], progress: Callable[[int], None]) -> AsyncIterator[dict]:
+    async for row in rows:
+        progress(1)
+        yield row
+
+
+def _artifact_chunks(db: AsyncSession, job: ExportJob, progress: Callable[[int], None]) -> AsyncIterator[bytes]:
+    if job.kind == "statement_bundle":
+        customers = iter_bundle_customers(db, job.business_id, job.from_date, job.to_date)
+        return stream_statement_bundle(db, job.business_id, customers, job.from_date, job.to_date, job.format, progress)
+    if job.format in ("parquet", "arrow"):
+        return stream_table_export(db, job.kind, job.business_id, job.format, progress)
+    rows = _counted(iter_ledger_entries(db, LedgerEntry.business_id == job.business_id), progress)
+    if job.format == "xlsx":
+        return stream_xlsx(rows, "Ledger")
+    return stream_csv(rows)
+
+
+async def _count_rows(db: AsyncSession, job: ExportJob) -> int:
+    model = _COUNTED_MODELS[job.kind]
+    result = await db.execute(select(func.count(model.id)).where(model.business_id == job.business_id))
+    return result.scalar_one()
+
+
+def _claim_job_stmt(job_id: int, per_business: int):
+    # Claims a queued job only while its business has fewer than per_business
+    # running jobs, counted in the same statement.
+    running = aliased(ExportJob)
+    running_for_business = (
+        select(func.count(running.id))
+        .where(running.business_id == ExportJob.business_id, running.status == "running")
+        .scalar_subquery()
+    )
+    return (
+        update(ExportJob)
+        .where(ExportJob.id == job_id, ExportJob.status == "queued", running_for_business < per_business)
+        .values(status="running", started_at=utc_now(), updated_at=utc_now())
+    )
+
+
+class ExportProgress:
+    def __init__(self, total_rows: Optional[int] = None):
+        self.rows = 0
+        self.total_rows = total_rows
+        self.saved_at = time.monotonic()
+
+    def add(self, rows: int):
+        self.rows += rows
+
+
+def estimate_progress(job: ExportJob, rows: int, total_rows: Optional[int]):
+    # ETA assumes the remaining rows go at the average rate so far.
+    if job.status == "completed":
+        return 1.0, 0.0
+    if job.status != "running" or not total_rows or job.started_at is None:
+        return None, None
+    fraction = min(rows / total_rows, 1.0)
+    if rows == 0:
+        return fraction, None
+    elapsed = (utc_now() - job.started_at).total_seconds()
+    return fraction, round(elapsed * (total_rows - rows) / rows, 1)
+
+
+class ExportWorker:
+    # Runs queued export jobs as tasks in this process. At most `workers` run
+    # here at once, and at most `per_business` run for one business across
+    # all processes. A job is claimed with a conditional UPDATE that also
+    # counts its business's running jobs, under a lock on the business row,
+    # so two processes never run the same job or overfill a business.
+    def __init__(self, workers: int = EXPORT_WORKERS, per_business: int = EXPORT_MAX_JOBS_PER_BUSINESS):
+        self.workers = workers
+        self.per_business = per_business
+        self.progress: Dict[int, ExportProgress] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._dispatching: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def wake(self):
+        if self._closing:
+            return
+        if self._dispatching is None or self._dispatching.done():
+            self._dispatching = asyncio.create_task(self.dispatch())
+
+    async def dispatch(self) -> int:
+        started = 0
+        async with SessionLocal() as db:
+            while not self._closing and len(self._tasks) < self.workers:
+                running = await db.execute(
+                    select(ExportJob.business_id, func.count(ExportJob.id))
+                    .where(ExportJob.status == "running")
+                    .group_by(ExportJob.business_id)
+                )
+                busy = {business_id for business_id, count in running.all() if count >= self.per_business}
+                stmt = (
+                    select(ExportJob.id, ExportJob.business_id)
+                    .where(ExportJob.status == "queued")
+                    .order_by(ExportJob.id)
+                    .limit(1)
+                )
+                if busy:
+                    stmt = stmt.where(ExportJob.business_id.notin_(busy))
+                queued = (await db.execute(stmt)).first()
+                if queued is None:
+                    break
+                job_id = queued.id
+                # Concurrent claims for one business wait for each other here,
+                # so each counts the jobs the other started.
+                await db.execute(select(Business.id).where(Business.id == queued.business_id).with_for_update())
+                claimed = await db.execute(_claim_job_stmt(job_id, self.per_business))
+                await db.commit()
+                if claimed.rowcount != 1:
+                    continue
+                self.progress[job_id] = ExportProgress()
+                self._tasks[job_id] = asyncio.create_task(self._run(job_id), name=f"export_job_{job_id}")
+                started += 1
+        return started
+
+    async def _save(self, job_id: int, **values) -> bool:
+        # Writes only while the job is still running here; the stale sweep may
+        # have failed it, and its result must not be overwritten.
+        async with SessionLocal() as db:
+            result = await db.execute(
+                update(ExportJob)
+                .where(ExportJob.id == job_id, ExportJob.status == "running")
+                .values(updated_at=utc_now(), **values)
+            )
+            await db.commit()
+        return result.rowcount == 1
+
+    async def _heartbeat(self, job_id: int):
+        while True:
+            await asyncio.sleep(EXPORT_HEARTBEAT_SECONDS)
+            try:
+                await self._save(job_id)
+            except Exception as exc:
+                logger.warning(f"Could not record heartbeat of export job {job_id}: {exc}")
+
+    async def _save_progress(self, job_id: int, progress: ExportProgress):
+        progress.saved_at = time.monotonic()
+        try:
+            await self._save(job_id, rows_processed=progress.rows)
+        except Exception as exc:
+            # Progress is advisory; the in-process counter stays authoritative.
+            logger.warning(f"Could not save progress of export job {job_id}: {exc}")
+
+    async def _run(self, job_id: int):
+        progress = self.progress[job_id]
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        tmp_path = os.path.join(EXPORT_DIR, f"{job_id}.part")
+        cancelled = False
+        heartbeat = asyncio.create_task(self._heartbeat(job_id), name=f"export_job_{job_id}_heartbeat")
+        try:
+            async with SessionLocal() as db:
+                job = await db.get(ExportJob, job_id)
+                progress.total_rows = await _count_rows(db, job)
+                await self._save(job_id, total_rows=progress.total_rows)
+                size = 0
+                with open(tmp_path, "wb") as handle:
+                    async for chunk in _artifact_chunks(db, job, progress.add):
+                        handle.write(chunk)
+                        size += len(chunk)
+                        if time.monotonic() - progress.saved_at >= EXPORT_PROGRESS_INTERVAL_SECONDS:
+                            await self._save_progress(job_id, progress)
+                path = os.path.join(EXPORT_DIR, f"{job_id}_{artifact_filename(job)}")
+            os.replace(tmp_path, path)
+            now = utc_now()
+            completed = await self._save(
+                job_id, status="completed", rows_processed=progress.rows, file_path=path, file_size=size,
+                finished_at=now, expires_at=now + timedelta(seconds=EXPORT_TTL_SECONDS)
+            )
+            if not completed:
+                os.remove(path)
+                logger.warning(f"Export job {job_id} was no longer running when it finished; its file was discarded")
+                return
+            logger.info(f"Export job {job_id} finished: {progress.rows} rows, {size} bytes")
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back so it is picked up again.
+            cancelled = True
+            await asyncio.shield(self._save(job_id, status="queued", rows_processed=0, started_at=None))
+            raise
+        except Exception as exc:
+            logger.exception(f"Export job {job_id} failed")
+            await self._save(job_id, status="failed", error=str(exc)[:500], finished_at=utc_now())
+        finally:
+            heartbeat.cancel()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self._tasks.pop(job_id, None)
+            self.progress.pop(job_id, None)
+            # A cancelled job is shutting down and must not start more work.
+            if not cancelled:
+                self.wake()
+
+    async def shutdown(self):
+        self._closing = True
+        tasks = list(self._tasks.values())
+        if self._dispatching is not None:
+            tasks.append(self._dispatching)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+export_worker = ExportWorker()
+
+
+async def expire_export_jobs(db: AsyncSession) -> int:
+    now = utc_now()
+    result = await db.execute(
+        select(ExportJob).where(ExportJob.status == "completed", ExportJob.expires_at <= now)
+    )
+    jobs = result.scalars().all()
+    for job in jobs:
+        if job.file_path and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+        job.status = "expired"
+        job.file_path = None
+
+    # Jobs whose worker died stop sending progress; they would otherwise hold
+    # their business's slot forever.
+    stale_before = now - timedelta(seconds=EXPORT_STALE_SECONDS)
+    stale = await db.execute(
+        update(ExportJob)
+        .where(
+            ExportJob.status == "running",
+            ExportJob.id.notin_(list(export_worker.progress)),
+            or_(ExportJob.updated_at.is_(None), ExportJob.updated_at < stale_before)
+        )
+        .values(status="failed", error="Export worker stopped before the job finished.", finished_at=now)
+    )
+    await db.commit()
+    return len(jobs) + stale.rowcount
+
+
+async def run_export_jobs() -> int:
+    async with SessionLocal() as db:
+        expired = await expire_export_jobs(db)
+    if expired:
+        logger.info(f"Expired or failed {expired} export jobs")
+    return await export_worker.dispatch()
@@ -1,62 +1,9 @@
-from fastapi import Depends, HTTPException, status
+from typing import AsyncIterator
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.db.models.ledger_entry import LedgerEntry
-from app.db.models.user import User
-from app.db.models.customer import Customer
-from app.deps import get_db
-from app.services.auth import cashier_or_owner_required
-from app.db.models.business import Business
 
-async def business_ledger_access_required(
-    ledger_entry_id: int,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(cashier_or_owner_required)
-):
-    result = await db.execute(select(LedgerEntry).where(LedgerEntry.id == ledger_entry_id))
-    ledger_entry = result.scalars().first()
-    if not ledger_entry:
-        raise HTTPException(status_code=404, detail="Ledger entry not found.")
-
-    if ledger_entry.business_id != current_user.business_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have permission to access this ledger entry."
-        )
-    return ledger_entry
-
-
-async def business_customer_access_required(
-    customer_id: int,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(cashier_or_owner_required)
-):
-    result = await db.execute(select(Customer).where(Customer.id == customer_id))
-    customer = result.scalars().first()
-    if not customer:
-        raise HTTPException(status_code=404, detail="Customer not found.")
-    if customer.business_id != current_user.business_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have permission to access this customer."
-        )
-    return customer
-
-async def business_access_required(
-    business_id: int,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(cashier_or_owner_required)
-):
-    result = await db.execute(select(Business).where(Business.id == business_id))
-    business = result.scalars().first()
-    if not business:
-        raise HTTPException(status_code=404, detail="Business not found.")
-    if business.id != current_user.business_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have permission to access this business."
-        )
-    return business
+LEDGER_EXPORT_FETCH_SIZE = 1000
 
 async def get_customer_balance(customer_id: int, db: AsyncSession):
     result = await db.execute(
@@ -82,4 +29,27 @@ async def get_customer_balance_excluding_entry(customer_id: int, exclude_entry_i
         le.amount if le.entry_type == "credit" else -le.amount
         for le in ledger_entries
     )
-    return balance
\ No newline at end of file
+    return balance
+
+async def iter_ledger_entries(db: AsyncSession, *criteria) -> AsyncIterator[dict]:
+    # Column projection read through a server-side cursor, for exports of
+    # whole ledgers that should not be loaded as ORM objects.
+    stmt = (
+        select(
+            LedgerEntry.id,
+            LedgerEntry.customer_id,
+            LedgerEntry.business_id,
+            LedgerEntry.entry_type,
+            LedgerEntry.amount,
+            LedgerEntry.description,
+            LedgerEntry.image_url,
+            LedgerEntry.created_by_id,
+            LedgerEntry.created_at
+        )
+        .where(*criteria)
+        .order_by(LedgerEntry.id)
+        .execution_options(yield_per=LEDGER_EXPORT_FETCH_SIZE)
+    )
+    result = await db.stream(stmt)
+    async for row in result:
+        yield dict(row._mapping)
@@ -0,0 +1,29 @@
+import os
+from email.message import EmailMessage
+import aiosmtplib
+
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_FROM = os.getenv("SMTP_FROM") or SMTP_USERNAME
+
+
+async def send_email(to_email: str, subject: str, body: str):
+    # Plain-text mail for reminders and verification codes. Raises when the
+    # server refuses or cannot be reached; callers decide whether that fails
+    # the request.
+    message = EmailMessage()
+    message["From"] = SMTP_FROM
+    message["To"] = to_email
+    message["Subject"] = subject
+    message.set_content(body)
+
+    await aiosmtplib.send(
+        message,
+        hostname=SMTP_HOST,
+        port=SMTP_PORT,
+        username=SMTP_USERNAME,
+        password=SMTP_PASSWORD,
+        start_tls=True,
+    )
@@ -0,0 +1,233 @@
+import calendar
+import hashlib
+import os
+import uuid
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import SessionLocal
+from app.db.models.customer import Customer
+from app.db.models.ledger_entry import LedgerEntry
+from app.logger import logger
+from app.services.payment_status_service import utc_now
+from app.services.pdf_service import pdf_rendering_available, render_statement_pdf
+from app.services.statement_services import get_statement_balances, iter_statement_entries, statement_csv_rows, statement_period, stream_csv
+
+MONTHLY_STATEMENT_DIR = os.getenv("MONTHLY_STATEMENT_DIR", os.path.join("cache", "monthly_statements"))
+MONTHLY_STATEMENT_INTERVAL_SECONDS = int(os.getenv("MONTHLY_STATEMENT_INTERVAL_SECONDS", "3600"))
+MONTHLY_STATEMENT_BATCH_SIZE = int(os.getenv("MONTHLY_STATEMENT_BATCH_SIZE", "200"))
+
+MEDIA_TYPES = {"csv": "text/csv", "pdf": "application/pdf"}
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+# Bumped on every invalidation so a statement rendered from data read before a
+# concurrent write is not stored over the invalidation.
+_invalidations: Dict[int, int] = {}
+
+
+def month_key(year: int, month: int) -> str:
+    return f"{year:04d}-{month:02d}"
+
+
+def month_bounds(year: int, month: int) -> Tuple[date, date]:
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def last_closed_month(now: Optional[datetime] = None) -> Tuple[int, int]:
+    today = (now or utc_now()).date()
+    return (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+
+
+def is_closed_month(year: int, month: int, now: Optional[datetime] = None) -> bool:
+    return (year, month) <= last_closed_month(now)
+
+
+def closed_month_for_period(from_date: Optional[date], to_date: date) -> Optional[Tuple[int, int]]:
+    # The generic statement endpoint can be served from the monthly cache when
+    # it asks for exactly one calendar month that has already closed.
+    if from_date is None or from_date.day != 1:
+        return None
+    if month_bounds(from_date.year, from_date.month) != (from_date, to_date):
+        return None
+    if not is_closed_month(from_date.year, from_date.month):
+        return None
+    return from_date.year, from_date.month
+
+
+def _customer_dir(customer_id: int) -> str:
+    return os.path.join(MONTHLY_STATEMENT_DIR, f"customer_{customer_id}")
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()[:32]
+
+
+def cached_statement(customer_id: int, key: str, fmt: str) -> Optional[Tuple[str, str]]:
+    # Files are named {month}_{content hash}.{format}; the hash doubles as the ETag.
+    directory = _customer_dir(customer_id)
+    if not os.path.isdir(directory):
+        return None
+    prefix, suffix = f"{key}_", f".{fmt}"
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith(suffix):
+            return os.path.join(directory, name), name[len(prefix):-len(suffix)]
+    return None
+
+
+def _store(customer_id: int, key: str, fmt: str, tmp_path: str) -> Tuple[str, str]:
+    digest = _file_digest(tmp_path)
+    path = os.path.join(_customer_dir(customer_id), f"{key}_{digest}.{fmt}")
+    os.replace(tmp_path, path)
+    for name in os.listdir(_customer_dir(customer_id)):
+        stale = os.path.join(_customer_dir(customer_id), name)
+        if stale != path and name.startswith(f"{key}_") and name.endswith(f".{fmt}"):
+            _remove(stale)
+    return path, digest
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+async def _write_csv(db: AsyncSession, customer_id: int, from_date: date, to_date: date, path: str):
+    opening_balance, closing_balance = await get_statement_balances(db, customer_id, from_date, to_date)
+    entries = iter_statement_entries(db, customer_id, from_date, to_date, opening_balance)
+    with open(path, "wb") as handle:
+        async for chunk in stream_csv(statement_csv_rows(entries, from_date, to_date, opening_balance, closing_balance)):
+            handle.write(chunk)
+
+
+async def build_monthly_statement(db: AsyncSession, customer, year: int, month: int, fmt: str) -> Tuple[str, str]:
+    from_date, to_date = month_bounds(year, month)
+    key = month_key(year, month)
+    os.makedirs(_customer_dir(customer.id), exist_ok=True)
+    tmp_path = os.path.join(_customer_dir(customer.id), f".{key}.{uuid.uuid4().hex}.{fmt}.tmp")
+    generation = _invalidations.get(customer.id, 0)
+    try:
+        if fmt == "pdf":
+            await render_statement_pdf(db, customer, from_date, to_date, tmp_path)
+        else:
+            await _write_csv(db, customer.id, from_date, to_date, tmp_path)
+        if _invalidations.get(customer.id, 0) != generation:
+            # Data changed while rendering: hand out this copy but do not cache it.
+            digest = _file_digest(tmp_path)
+            path = os.path.join(_customer_dir(customer.id), f".{key}_{digest}.{uuid.uuid4().hex}.{fmt}.uncached")
+            os.replace(tmp_path, path)
+            return path, digest
+        return _store(customer.id, key, fmt, tmp_path)
+    finally:
+        if os.path.exists(tmp_path):
+            _remove(tmp_path)
+
+
+async def monthly_statement(db: AsyncSession, customer, year: int, month: int, fmt: str) -> Tuple[str, str]:
+    if not is_closed_month(year, month):
+        raise HTTPException(status_code=400, detail="Statements are only available for months that have closed.")
+    cached = cached_statement(customer.id, month_key(year, month), fmt)
+    if cached is not None:
+        return cached
+    return await build_monthly_statement(db, customer, year, month, fmt)
+
+
+def invalidate_monthly_statements(customer_id: int, since: Optional[datetime] = None):
+    # A change to one month also moves the opening balance of every later
+    # month, so everything from that month onwards is dropped.
+    _invalidations[customer_id] = _invalidations.get(customer_id, 0) + 1
+    directory = _customer_dir(customer_id)
+    if not os.path.isdir(directory):
+        return
+    first_key = month_key(since.year, since.month) if since is not None else ""
+    for name in os.listdir(directory):
+        if not name.startswith(".") and name[:7] >= first_key:
+            _remove(os.path.join(directory, name))
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return any(value.removeprefix("W/") == etag for value in candidates)
+
+
+def cached_file_response(request: Request, path: str, digest: str, fmt: str, filename: str) -> Response:
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    background = BackgroundTask(_remove, path) if path.endswith(".uncached") else None
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers, background=background)
+    return FileResponse(
+        path, media_type=MEDIA_TYPES[fmt], filename=filename, headers=headers,
+        background=background, stat_result=os.stat(path)
+    )
+
+
+def monthly_statement_formats() -> List[str]:
+    return ["csv", "pdf"] if pdf_rendering_available() else ["csv"]
+
+
+class MonthlyStatementGenerator:
+    # Once a month has closed, renders its statement for every customer with
+    # ledger history up to that month. Months whose run finished are skipped;
+    # a failed run is retried on the next tick and resumes from the cache.
+    def __init__(self, batch_size: int = MONTHLY_STATEMENT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.completed_month: Optional[str] = None
+
+    async def run(self, db: AsyncSession, now: Optional[datetime] = None) -> int:
+        year, month = last_closed_month(now)
+        key = month_key(year, month)
+        if self.completed_month == key:
+            return 0
+
+        _, end = statement_period(None, month_bounds(year, month)[1])
+        has_history = exists().where(LedgerEntry.customer_id == Customer.id, LedgerEntry.created_at < end)
+        formats = monthly_statement_formats()
+        generated = 0
+        failed = False
+        last_id = 0
+        while True:
+            result = await db.execute(
+                select(Customer).where(Customer.id > last_id, has_history).order_by(Customer.id).limit(self.batch_size)
+            )
+            customers = result.scalars().all()
+            if not customers:
+                break
+            for customer in customers:
+                for fmt in formats:
+                    if cached_statement(customer.id, key, fmt) is not None:
+                        continue
+                    try:
+                        await build_monthly_statement(db, customer, year, month, fmt)
+                        generated += 1
+                    except HTTPException as exc:
+                        failed = True
+                        logger.warning(f"Monthly {fmt} statement {key} for customer {customer.id} failed: {exc.detail}")
+            last_id = customers[-1].id
+            db.expunge_all()
+
+        if not failed:
+            self.completed_month = key
+        return generated
+
+
+monthly_statement_generator = MonthlyStatementGenerator()
+
+
+async def generate_monthly_statements() -> int:
+    async with SessionLocal() as db:
+        generated = await monthly_statement_generator.run(db)
+    if generated:
+        logger.info(f"Pre-generated {generated} monthly statements")
+    return generated
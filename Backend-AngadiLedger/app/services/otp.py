@@ -1,26 +1,181 @@
-import random
-from datetime import datetime, timedelta,timezone
-from sqlalchemy.orm import Session
+import hashlib
+import hmac
+import math
+import os
+import secrets
+from datetime import timedelta
+from typing import List, NamedTuple, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import SessionLocal
+from app.db.models.otp_code import OtpCode
 from app.db.models.user import User
+from app.logger import logger
+from app.services.mailer import send_email
+from app.services.payment_status_service import utc_now
 
-def generate_otp():
-    return str(random.randint(100000, 999999))
+OTP_EXPIRE_MINUTES = int(os.getenv("OTP_EXPIRE_MINUTES", "10"))
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5"))
+OTP_RESEND_COOLDOWN_SECONDS = int(os.getenv("OTP_RESEND_COOLDOWN_SECONDS", "60"))
+OTP_SWEEP_INTERVAL_SECONDS = int(os.getenv("OTP_SWEEP_INTERVAL_SECONDS", "300"))
+OTP_SWEEP_BATCH_SIZE = int(os.getenv("OTP_SWEEP_BATCH_SIZE", "1000"))
+# "email" delivers codes; "local" keeps them in memory for development.
+OTP_SINK = os.getenv("OTP_SINK", "email")
+VERIFY_ACCOUNT = "verify_account"
 
-def set_user_otp(db: Session, user: User):
-    otp_code = generate_otp()
-    user.otp_code = otp_code
-    user.otp_expiry = datetime.now(timezone.utc) + timedelta(minutes=10)
-    db.commit()
-    db.refresh(user)
-    return otp_code
 
-def verify_user_otp(db: Session, user: User, otp_code: str):
-    if user.otp_code != otp_code:
-        return False
-    if user.otp_expiry < datetime.utcnow():
+def generate_otp() -> str:
+    return f"{secrets.randbelow(1_000_000):06d}"
+
+
+def hash_otp(code: str) -> str:
+    # Keyed, because six digits are trivial to brute-force from a plain digest.
+    secret = (os.getenv("SECRET_KEY") or "").encode("utf-8")
+    return hmac.new(secret, code.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+class OtpMessage(NamedTuple):
+    user_id: int
+    email: str
+    phone_number: Optional[str]
+    purpose: str
+    code: str
+
+
+class EmailOtpSink:
+    # Mails the code to the user's address. Other senders, such as SMS, plug
+    # in with set_otp_sink().
+    async def send(self, message: OtpMessage):
+        await send_email(
+            message.email,
+            "Your verification code",
+            f"Your verification code is {message.code}. It expires in {OTP_EXPIRE_MINUTES} minutes."
+        )
+
+
+class LocalOtpSink:
+    # Keeps sent codes in memory instead of delivering them. Only for tests
+    # and local development, selected with OTP_SINK=local.
+    def __init__(self):
+        self.outbox: List[OtpMessage] = []
+
+    async def send(self, message: OtpMessage):
+        self.outbox.append(message)
+        logger.debug(f"OTP kept in memory for user_id={message.user_id} ({message.purpose})")
+
+    def last_code(self, email: str) -> Optional[str]:
+        for message in reversed(self.outbox):
+            if message.email == email:
+                return message.code
+        return None
+
+
+def _default_sink():
+    if OTP_SINK == "local":
+        logger.warning("OTP_SINK=local: verification codes are kept in memory and never delivered")
+        return LocalOtpSink()
+    if OTP_SINK != "email":
+        raise ValueError(f"Unknown OTP_SINK {OTP_SINK!r}; expected 'email' or 'local'")
+    return EmailOtpSink()
+
+
+otp_sink = _default_sink()
+
+
+def set_otp_sink(sink):
+    global otp_sink
+    otp_sink = sink
+
+
+async def _current_otp(db: AsyncSession, user_id: int, purpose: str) -> Optional[OtpCode]:
+    result = await db.execute(select(OtpCode).where(OtpCode.user_id == user_id, OtpCode.purpose == purpose))
+    return result.scalars().first()
+
+
+async def issue_otp(db: AsyncSession, user: User, purpose: str = VERIFY_ACCOUNT) -> Optional[str]:
+    # Replaces any earlier code for the same purpose, at most once per cooldown.
+    # Returns the code, or None when it could not be delivered.
+    now = utc_now()
+    current = await _current_otp(db, user.id, purpose)
+    if current is not None:
+        wait = OTP_RESEND_COOLDOWN_SECONDS - (now - current.created_at).total_seconds()
+        if wait > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="A code was sent recently. Please wait before requesting another.",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+        await db.delete(current)
+        await db.flush()
+
+    code = generate_otp()
+    db.add(OtpCode(
+        user_id=user.id,
+        purpose=purpose,
+        code_hash=hash_otp(code),
+        attempts=0,
+        created_at=now,
+        expires_at=now + timedelta(minutes=OTP_EXPIRE_MINUTES)
+    ))
+    await db.commit()
+    try:
+        await otp_sink.send(OtpMessage(user.id, user.email, user.phone_number, purpose, code))
+    except Exception:
+        # The account or request that asked for the code is already saved.
+        # Drop the undelivered code so the user can ask again at once instead
+        # of waiting out the cooldown.
+        logger.exception(f"Could not deliver OTP for user_id={user.id} ({purpose})")
+        await db.execute(delete(OtpCode).where(OtpCode.user_id == user.id, OtpCode.purpose == purpose))
+        await db.commit()
+        return None
+    return code
+
+
+async def verify_otp_code(db: AsyncSession, user: User, code: str, purpose: str = VERIFY_ACCOUNT) -> bool:
+    # A correct code is consumed; the caller commits whatever it unlocks.
+    # Every guess takes one of OTP_MAX_ATTEMPTS in a conditional UPDATE before
+    # the code is compared, so concurrent guesses cannot share an attempt, and
+    # once they are spent the code is dead even if the next guess is right.
+    current = await _current_otp(db, user.id, purpose)
+    if current is None or current.expires_at <= utc_now():
+        raise HTTPException(status_code=400, detail="OTP has expired or was not requested")
+    otp_id = current.id
+    result = await db.execute(
+        update(OtpCode)
+        .where(OtpCode.id == otp_id, OtpCode.attempts < OTP_MAX_ATTEMPTS)
+        .values(attempts=OtpCode.attempts + 1)
+    )
+    await db.commit()
+    if result.rowcount == 0:
+        raise HTTPException(status_code=400, detail="Too many wrong codes. Please request a new one.")
+    if not hmac.compare_digest(current.code_hash, hash_otp(code)):
         return False
-    user.is_verified = True
-    user.otp_code = None
-    user.otp_expiry = None
-    db.commit()
-    return True
+    # Only one request can consume the code.
+    result = await db.execute(delete(OtpCode).where(OtpCode.id == otp_id))
+    return result.rowcount == 1
+
+
+async def purge_expired_otps(db: AsyncSession, batch_size: int = OTP_SWEEP_BATCH_SIZE) -> int:
+    # Deletes in short batches so a backlog never holds a long write lock.
+    now = utc_now()
+    purged = 0
+    while True:
+        result = await db.execute(select(OtpCode.id).where(OtpCode.expires_at <= now).limit(batch_size))
+        ids = result.scalars().all()
+        if not ids:
+            break
+        await db.execute(delete(OtpCode).where(OtpCode.id.in_(ids)))
+        await db.commit()
+        purged += len(ids)
+        if len(ids) < batch_size:
+            break
+    return purged
+
+
+async def sweep_expired_otps() -> int:
+    async with SessionLocal() as db:
+        purged = await purge_expired_otps(db)
+    if purged:
+        logger.info(f"Deleted {purged} expired OTP codes")
+    return purged
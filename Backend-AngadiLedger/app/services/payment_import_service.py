@@ -0,0 +1,219 @@
+import os
+from datetime import datetime
+from decimal import Decimal
+from typing import AsyncIterator, Dict, List, Optional
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.customer import Customer
+from app.db.models.ledger_entry import LedgerEntry, PaymentLedgerEntry
+from app.db.models.payment import Payment
+from app.logger import logger
+from app.services.csv_import import iter_csv_records, normalise_phone, parse_amount, parse_datetime, pick_column
+from app.services.payment_status_service import initial_payment_status, utc_now
+
+PAYMENT_IMPORT_BATCH_SIZE = int(os.getenv("PAYMENT_IMPORT_BATCH_SIZE", "2000"))
+MAX_PAYMENT_AMOUNT = Decimal("9999999999.99")
+
+
+class CustomerLookup:
+    # Per-business customer ids and phones, loaded once per import.
+    def __init__(self, rows):
+        self.ids = set()
+        self.by_phone: Dict[str, Optional[int]] = {}
+        for customer_id, phone in rows:
+            self.ids.add(customer_id)
+            phone = normalise_phone(phone)
+            if phone:
+                # A phone shared by several customers cannot identify one of them.
+                self.by_phone[phone] = None if phone in self.by_phone else customer_id
+
+    def resolve(self, customer_id: Optional[str], phone: Optional[str]):
+        if customer_id:
+            try:
+                value = int(customer_id)
+            except ValueError:
+                return None, "Invalid customer_id"
+            if value not in self.ids:
+                return None, "Customer not found in this business"
+            return value, None
+        phone = normalise_phone(phone)
+        if not phone:
+            return None, "Missing customer_id or phone"
+        if phone not in self.by_phone:
+            return None, "No customer with this phone"
+        if self.by_phone[phone] is None:
+            return None, "Phone matches several customers"
+        return self.by_phone[phone], None
+
+
+async def load_customer_lookup(db: AsyncSession, business_id: int) -> CustomerLookup:
+    result = await db.stream(
+        select(Customer.id, Customer.phone_number)
+        .where(Customer.business_id == business_id)
+        .execution_options(yield_per=5000)
+    )
+    return CustomerLookup([row async for row in result])
+
+def parse_payment_row(row: Dict[str, str], lookup: CustomerLookup, now: datetime):
+    columns = row.keys()
+    customer_id, error = lookup.resolve(
+        row.get(pick_column(columns, "customer_id", "customer")),
+        row.get(pick_column(columns, "phone", "phone_number", "mobile", "customer_phone"))
+    )
+    if error:
+        return None, error
+
+    amount = parse_amount(row.get("amount"))
+    if amount is None:
+        return None, "Invalid amount"
+    if amount <= 0 or amount > MAX_PAYMENT_AMOUNT:
+        return None, "Amount must be positive and fit 12 digits"
+
+    paid_at = parse_datetime(row.get("paid_at")) if row.get("paid_at") else None
+    if row.get("paid_at") and paid_at is None:
+        return None, "Invalid paid_at"
+    due_at = parse_datetime(row.get("due_at")) if row.get("due_at") else None
+    if row.get("due_at") and due_at is None:
+        return None, "Invalid due_at"
+
+    try:
+        status = initial_payment_status((row.get("status") or "paid").lower(), due_at, now)
+    except HTTPException as exc:
+        return None, exc.detail
+    if status == "paid" and paid_at is None:
+        paid_at = now
+
+    ledger_entry_id = None
+    allocation_amount = None
+    if row.get("ledger_entry_id"):
+        try:
+            ledger_entry_id = int(row["ledger_entry_id"])
+        except ValueError:
+            return None, "Invalid ledger_entry_id"
+        allocation_amount = parse_amount(row.get("allocation_amount")) if row.get("allocation_amount") else amount
+        if allocation_amount is None or allocation_amount <= 0 or allocation_amount > amount:
+            return None, "Allocation amount must be positive and at most the payment amount"
+
+    return {
+        "customer_id": customer_id,
+        "amount": amount,
+        "status": status,
+        "paid_at": paid_at,
+        "due_at": due_at,
+        "ledger_entry_id": ledger_entry_id,
+        "allocation_amount": allocation_amount,
+    }, None
+
+
+class PaymentImporter:
+    def __init__(self, db: AsyncSession, current_user, dry_run: bool = False, batch_size: int = PAYMENT_IMPORT_BATCH_SIZE):
+        self.db = db
+        self.current_user = current_user
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.batch: List[tuple] = []
+        self.errors: List[Dict] = []
+        self.imported = 0
+        self.allocated = 0
+        self.created_at = utc_now()
+
+    async def add(self, row_number: int, payment: Dict):
+        self.batch.append((row_number, payment))
+        if len(self.batch) >= self.batch_size:
+            await self.flush()
+
+    def _payment_values(self, payment: Dict) -> Dict:
+        return {
+            "customer_id": payment["customer_id"],
+            "business_id": self.current_user.business_id,
+            "amount": payment["amount"],
+            "status": payment["status"],
+            "paid_at": payment["paid_at"],
+            "due_at": payment["due_at"],
+            "created_at": self.created_at,
+            "created_by_id": self.current_user.id,
+        }
+
+    async def flush(self):
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+
+        ledger_ids = {payment["ledger_entry_id"] for _, payment in batch if payment["ledger_entry_id"] is not None}
+        ledger_owner = {}
+        if ledger_ids:
+            result = await self.db.execute(
+                select(LedgerEntry.id, LedgerEntry.customer_id).where(
+                    LedgerEntry.id.in_(ledger_ids),
+                    LedgerEntry.business_id == self.current_user.business_id,
+                    LedgerEntry.entry_type == "debit"
+                )
+            )
+            ledger_owner = dict(result.all())
+
+        valid = []
+        for row_number, payment in batch:
+            ledger_entry_id = payment["ledger_entry_id"]
+            if ledger_entry_id is not None and ledger_owner.get(ledger_entry_id) != payment["customer_id"]:
+                self.errors.append({"row": row_number, "error": "Ledger entry not found for this customer"})
+                continue
+            valid.append(payment)
+
+        if valid and not self.dry_run:
+            # Only rows with an allocation need their new payment id back, so the
+            # rest go through a plain executemany without RETURNING. Core table
+            # inserts keep rows with and without NULLs in one batch; the ORM bulk
+            # path would split them into separate statements.
+            plain = [payment for payment in valid if payment["ledger_entry_id"] is None]
+            allocated = [payment for payment in valid if payment["ledger_entry_id"] is not None]
+            if plain:
+                await self.db.execute(insert(Payment.__table__), [self._payment_values(payment) for payment in plain])
+            if allocated:
+                result = await self.db.execute(
+                    insert(Payment.__table__).returning(Payment.id, sort_by_parameter_order=True),
+                    [self._payment_values(payment) for payment in allocated]
+                )
+                await self.db.execute(
+                    insert(PaymentLedgerEntry.__table__),
+                    [
+                        {
+                            "payment_id": payment_id,
+                            "ledger_entry_id": payment["ledger_entry_id"],
+                            "amount": payment["allocation_amount"],
+                        }
+                        for payment_id, payment in zip(result.scalars().all(), allocated)
+                    ]
+                )
+            await self.db.commit()
+            self.allocated += len(allocated)
+        self.imported += len(valid)
+
+
+async def import_payments_csv(chunks: AsyncIterator[bytes], current_user, db: AsyncSession, dry_run: bool = False) -> Dict:
+    lookup = await load_customer_lookup(db, current_user.business_id)
+    importer = PaymentImporter(db, current_user, dry_run)
+    now = utc_now()
+    rows = 0
+    async for row_number, record in iter_csv_records(chunks):
+        rows += 1
+        payment, error = parse_payment_row(record, lookup, now)
+        if error:
+            importer.errors.append({"row": row_number, "error": error})
+            continue
+        await importer.add(row_number, payment)
+    await importer.flush()
+
+    if rows == 0:
+        raise HTTPException(status_code=400, detail="Upload has no payment rows.")
+
+    importer.errors.sort(key=lambda error: error["row"])
+    logger.info(f"Payment import for business {current_user.business_id}: {importer.imported} of {rows} rows imported")
+    return {
+        "rows": rows,
+        "imported": importer.imported,
+        "allocations": importer.allocated,
+        "failed": len(importer.errors),
+        "dry_run": dry_run,
+        "errors": importer.errors,
+    }
@@ -1,6 +1,6 @@
-from datetime import datetime
+from datetime import date, datetime, time, timedelta
 import decimal
-from typing import Optional
+from typing import AsyncIterator, Optional
 from sqlalchemy import case, func, select
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
@@ -8,124 +8,241 @@ from app.db.models.customer import Customer
 from app.db.models.payment import Payment
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models.ledger_entry import LedgerEntry,PaymentLedgerEntry
-from app.db.schemas.payment import PaymentCreateRequest, PaymentAllocation
-import aiosmtplib
-from email.message import EmailMessage
+from app.db.schemas.payment import PaymentCreateRequest, PaymentAllocation, PaymentResponse
+from app.services.payment_status_service import apply_status_transition, initial_payment_status, to_naive_utc, utc_now
 
-async def get_payments_from_ledger_entries(db: AsyncSession, customer_id: int):
-    stmt = select(LedgerEntry).where(
+PAYMENTS_FROM_LEDGER_FETCH_SIZE = 1000
+
+def _payments_from_ledger_stmt(
+    customer_id: int,
+    business_id: int,
+    after_id: Optional[int] = None,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    limit: Optional[int] = None
+):
+    # Projects only the columns the response needs, so rows come back as plain
+    # Core rows and never enter the session identity map.
+    stmt = select(
+        LedgerEntry.id.label("ledger_entry_id"),
+        LedgerEntry.customer_id,
+        LedgerEntry.business_id,
+        LedgerEntry.amount,
+        LedgerEntry.description,
+        LedgerEntry.image_url,
+        LedgerEntry.created_at
+    ).where(
         LedgerEntry.customer_id == customer_id,
+        LedgerEntry.business_id == business_id,
         LedgerEntry.entry_type == "debit"
     )
-    result = await db.execute(stmt)
-    entries = result.scalars().all()
-
-    payments = []
-    for entry in entries:
-        payments.append({
-            "ledger_entry_id": entry.id,
-            "customer_id": entry.customer_id,
-            "business_id": entry.business_id,
-            "amount": entry.amount,
-            "status": "paid",  
-            "description": entry.description,
-            "image_url": entry.image_url,
-            "created_at": entry.created_at,
-            "paid_at": None
-        })
-    return payments
+    if after_id is not None:
+        stmt = stmt.where(LedgerEntry.id > after_id)
+    if from_date is not None:
+        stmt = stmt.where(LedgerEntry.created_at >= datetime.combine(from_date, time.min))
+    if to_date is not None:
+        stmt = stmt.where(LedgerEntry.created_at < datetime.combine(to_date + timedelta(days=1), time.min))
+    stmt = stmt.order_by(LedgerEntry.id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
 
-async def get_partial_settlements(current_user, db: AsyncSession):
-    stmt = (
-        select(
-            Customer.id,
-            Customer.name,
-            func.coalesce(
-                func.sum(
-                    case(
-                        (LedgerEntry.entry_type == "credit", LedgerEntry.amount),
-                        else_=-LedgerEntry.amount
-                    )
-                ), 0
-            ).label("balance")
+def _payment_from_ledger_row(row) -> dict:
+    return {
+        "ledger_entry_id": row.ledger_entry_id,
+        "customer_id": row.customer_id,
+        "business_id": row.business_id,
+        "amount": row.amount,
+        "status": "paid",
+        "description": row.description,
+        "image_url": row.image_url,
+        "created_at": row.created_at,
+        "paid_at": None
+    }
+
+async def get_payments_from_ledger_entries(
+    db: AsyncSession,
+    customer_id: int,
+    business_id: int,
+    after_id: Optional[int] = None,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    limit: Optional[int] = None
+):
+    result = await db.execute(_payments_from_ledger_stmt(customer_id, business_id, after_id, from_date, to_date, limit))
+    return [_payment_from_ledger_row(row) for row in result]
+
+async def iter_payments_from_ledger_entries(
+    db: AsyncSession,
+    customer_id: int,
+    business_id: int,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None
+) -> AsyncIterator[dict]:
+    stmt = _payments_from_ledger_stmt(customer_id, business_id, from_date=from_date, to_date=to_date)
+    result = await db.stream(stmt.execution_options(yield_per=PAYMENTS_FROM_LEDGER_FETCH_SIZE))
+    async for row in result:
+        yield _payment_from_ledger_row(row)
+
+async def create_payment(payment_in: PaymentCreateRequest, current_user, db: AsyncSession) -> PaymentResponse:
+    result = await db.execute(
+        select(Customer.id).where(
+            Customer.id == payment_in.customer_id,
+            Customer.business_id == current_user.business_id
         )
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Customer not found.")
+
+    # Payments are allocated to the customer's debit entries only, as in the
+    # payment import.
+    ledger_ids = [allocation.ledger_entry_id for allocation in payment_in.allocations]
+    if ledger_ids:
+        result = await db.execute(
+            select(LedgerEntry.id).where(
+                LedgerEntry.id.in_(ledger_ids),
+                LedgerEntry.customer_id == payment_in.customer_id,
+                LedgerEntry.business_id == current_user.business_id,
+                LedgerEntry.entry_type == "debit"
+            )
+        )
+        missing = set(ledger_ids) - set(result.scalars().all())
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Invalid ledger entries for allocation: {sorted(missing)}")
+    if sum(allocation.amount for allocation in payment_in.allocations) > payment_in.amount:
+        raise HTTPException(status_code=400, detail="Allocations exceed the payment amount.")
+
+    due_at = to_naive_utc(payment_in.due_at)
+    payment = Payment(
+        customer_id=payment_in.customer_id,
+        business_id=current_user.business_id,
+        amount=payment_in.amount,
+        status=initial_payment_status(payment_in.status, due_at),
+        due_at=due_at,
+        paid_at=to_naive_utc(payment_in.paid_at),
+        created_by_id=current_user.id
+    )
+    if payment.status == "paid" and payment.paid_at is None:
+        payment.paid_at = utc_now()
+    db.add(payment)
+    await db.flush()
+    db.add_all([
+        PaymentLedgerEntry(
+            payment_id=payment.id,
+            ledger_entry_id=allocation.ledger_entry_id,
+            amount=allocation.amount
+        )
+        for allocation in payment_in.allocations
+    ])
+    await db.commit()
+    await db.refresh(payment)
+
+    return PaymentResponse(
+        id=payment.id,
+        customer_id=payment.customer_id,
+        business_id=payment.business_id,
+        amount=float(payment.amount),
+        status=payment.status,
+        paid_at=payment.paid_at,
+        due_at=payment.due_at,
+        created_by_id=payment.created_by_id,
+        allocations=payment_in.allocations
+    )
+
+async def update_payment_status(payment_id: int, new_status: str, due_at: Optional[datetime], current_user, db: AsyncSession) -> Payment:
+    result = await db.execute(
+        select(Payment).where(
+            Payment.id == payment_id,
+            Payment.business_id == current_user.business_id
+        )
+    )
+    payment = result.scalars().first()
+    if not payment:
+        raise HTTPException(status_code=404, detail="Payment not found.")
+
+    if due_at is not None:
+        payment.due_at = to_naive_utc(due_at)
+    if new_status != payment.status:
+        apply_status_transition(payment, new_status)
+    # Moving a pending payment's deadline into the past is picked up here, not by the sweeper.
+    payment.status = initial_payment_status(payment.status, payment.due_at)
+    await db.commit()
+    await db.refresh(payment)
+    return payment
+
+CUSTOMER_BALANCE_FETCH_SIZE = 1000
+
+def _customer_balance():
+    return func.coalesce(
+        func.sum(
+            case(
+                (LedgerEntry.entry_type == "credit", LedgerEntry.amount),
+                else_=-LedgerEntry.amount
+            )
+        ), 0
+    )
+
+def _partial_settlements_stmt(business_id: int):
+    balance = _customer_balance()
+    return (
+        select(Customer.id, Customer.name, balance.label("balance"))
         .join(LedgerEntry, LedgerEntry.customer_id == Customer.id)
-        .where(Customer.business_id == current_user.business_id)
+        .where(Customer.business_id == business_id)
         .group_by(Customer.id)
+        .having(balance != 0)
+        .order_by(Customer.id)
     )
 
-    result = await db.execute(stmt)
-    rows = result.all()
-
-    settlements = []
-    for row in rows:
-        status = "paid" if row.balance == 0 else "pending"
-        if status == "pending":
-            settlements.append({
-                "customer_id": row.id,
-                "customer_name": row.name,
-                "balance": float(row.balance),
-                "status": status
-            })
-    return settlements
+def _partial_settlement_from_row(row) -> dict:
+    return {
+        "customer_id": row.id,
+        "customer_name": row.name,
+        "balance": float(row.balance),
+        "status": "pending"
+    }
 
-async def get_outstanding_balances(current_user, db: AsyncSession, threshold: float = 10000.0):
-    stmt = (
+def _outstanding_balances_stmt(business_id: int, threshold: float):
+    balance = _customer_balance()
+    return (
         select(
             Customer.id,
             Customer.name,
             Customer.email,
             Customer.phone_number,
-            func.coalesce(
-                func.sum(
-                    case(
-                        (LedgerEntry.entry_type == "credit", LedgerEntry.amount),
-                        else_=-LedgerEntry.amount
-                    )
-                ), 0
-            ).label("balance")
+            balance.label("balance")
         )
         .join(LedgerEntry, LedgerEntry.customer_id == Customer.id)
-        .where(Customer.business_id == current_user.business_id)
+        .where(Customer.business_id == business_id)
         .group_by(Customer.id)
-        .having(
-            func.coalesce(
-                func.sum(
-                    case(
-                        (LedgerEntry.entry_type == "credit", LedgerEntry.amount),
-                        else_=-LedgerEntry.amount
-                    )
-                ), 0
-            ) > threshold
-        )
+        .having(balance > threshold)
+        .order_by(Customer.id)
     )
 
-    result = await db.execute(stmt)
-    rows = result.all()
-
-    return [
-        {
-            "customer_id": row.id,
-            "customer_name": row.name,
-            "email": row.email,
-            "contact": row.phone_number,
-            "outstanding_balance": float(row.balance)
-        }
-        for row in rows
-    ]
-
-async def send_email_reminder(to_email: str, subject: str, body: str):
-    message = EmailMessage()
-    message["From"] = "abishekuvs@gmail.com"
-    message["To"] = to_email
-    message["Subject"] = subject
-    message.set_content(body)
-
-    await aiosmtplib.send(
-        message,
-        hostname="smtp.gmail.com",
-        port=587,
-        username="abishekuvs@gmail.com",
-        password="aqlyeeipytbbhune",
-        start_tls=True,
-    )
+def _outstanding_balance_from_row(row) -> dict:
+    return {
+        "customer_id": row.id,
+        "customer_name": row.name,
+        "email": row.email,
+        "contact": row.phone_number,
+        "outstanding_balance": float(row.balance)
+    }
+
+async def get_partial_settlements(current_user, db: AsyncSession):
+    result = await db.execute(_partial_settlements_stmt(current_user.business_id))
+    return [_partial_settlement_from_row(row) for row in result.all()]
+
+async def iter_partial_settlements(current_user, db: AsyncSession) -> AsyncIterator[dict]:
+    stmt = _partial_settlements_stmt(current_user.business_id)
+    result = await db.stream(stmt.execution_options(yield_per=CUSTOMER_BALANCE_FETCH_SIZE))
+    async for row in result:
+        yield _partial_settlement_from_row(row)
+
+async def get_outstanding_balances(current_user, db: AsyncSession, threshold: float = 10000.0):
+    result = await db.execute(_outstanding_balances_stmt(current_user.business_id, threshold))
+    return [_outstanding_balance_from_row(row) for row in result.all()]
+
+async def iter_outstanding_balances(current_user, db: AsyncSession, threshold: float = 10000.0) -> AsyncIterator[dict]:
+    stmt = _outstanding_balances_stmt(current_user.business_id, threshold)
+    result = await db.stream(stmt.execution_options(yield_per=CUSTOMER_BALANCE_FETCH_SIZE))
+    async for row in result:
+        yield _outstanding_balance_from_row(row)
@@ -0,0 +1,109 @@
+import os
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import SessionLocal
+from app.db.models.enums import PaymentStatusEnum
+from app.db.models.payment import Payment
+from app.logger import logger
+
+OVERDUE_SWEEP_INTERVAL_SECONDS = int(os.getenv("OVERDUE_SWEEP_INTERVAL_SECONDS", "300"))
+OVERDUE_SWEEP_BATCH_SIZE = int(os.getenv("OVERDUE_SWEEP_BATCH_SIZE", "1000"))
+
+ALLOWED_STATUS_TRANSITIONS = {
+    PaymentStatusEnum.pending: {PaymentStatusEnum.paid, PaymentStatusEnum.overdue, PaymentStatusEnum.disputed},
+    PaymentStatusEnum.overdue: {PaymentStatusEnum.paid, PaymentStatusEnum.disputed},
+    PaymentStatusEnum.disputed: {PaymentStatusEnum.pending, PaymentStatusEnum.paid},
+    PaymentStatusEnum.paid: {PaymentStatusEnum.disputed},
+}
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Payment timestamps are stored as naive UTC.
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def parse_payment_status(status: str) -> PaymentStatusEnum:
+    try:
+        return PaymentStatusEnum(status)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Unknown payment status: {status}")
+
+def validate_status_transition(current_status: str, new_status: str) -> PaymentStatusEnum:
+    current = parse_payment_status(current_status)
+    new = parse_payment_status(new_status)
+    if new not in ALLOWED_STATUS_TRANSITIONS[current]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot change payment status from {current.value} to {new.value}."
+        )
+    return new
+
+def initial_payment_status(status: str, due_at: Optional[datetime], now: Optional[datetime] = None) -> str:
+    # The sweeper only looks at deadlines crossed since its last run, so a payment
+    # created with a deadline already in the past is marked overdue straight away.
+    requested = parse_payment_status(status)
+    now = now or utc_now()
+    if requested == PaymentStatusEnum.pending and due_at is not None and due_at <= now:
+        return PaymentStatusEnum.overdue.value
+    return requested.value
+
+def apply_status_transition(payment: Payment, new_status: str, now: Optional[datetime] = None) -> Payment:
+    new = validate_status_transition(payment.status, new_status)
+    payment.status = new.value
+    if new == PaymentStatusEnum.paid and payment.paid_at is None:
+        payment.paid_at = now or utc_now()
+    return payment
+
+
+class OverdueSweeper:
+    def __init__(self, batch_size: int = OVERDUE_SWEEP_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.last_run_at: Optional[datetime] = None
+
+    async def run(self, db: AsyncSession, now: Optional[datetime] = None) -> int:
+        now = now or utc_now()
+        conditions = [
+            Payment.status == PaymentStatusEnum.pending.value,
+            Payment.due_at <= now,
+        ]
+        if self.last_run_at is not None:
+            conditions.append(Payment.due_at > self.last_run_at)
+
+        swept = 0
+        while True:
+            batch_ids = (
+                select(Payment.id)
+                .where(*conditions)
+                .order_by(Payment.due_at)
+                .limit(self.batch_size)
+            )
+            result = await db.execute(
+                update(Payment)
+                .where(Payment.id.in_(batch_ids), Payment.status == PaymentStatusEnum.pending.value)
+                .values(status=PaymentStatusEnum.overdue.value)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            swept += result.rowcount
+            if result.rowcount < self.batch_size:
+                break
+
+        self.last_run_at = now
+        return swept
+
+
+overdue_sweeper = OverdueSweeper()
+
+async def sweep_overdue_payments() -> int:
+    async with SessionLocal() as db:
+        swept = await overdue_sweeper.run(db)
+    if swept:
+        logger.info(f"Marked {swept} payments as overdue")
+    return swept
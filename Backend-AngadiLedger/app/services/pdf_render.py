@@ -0,0 +1,81 @@
+from typing import Iterable, Sequence, Tuple
+
+# Runs inside the PDF worker processes. Kept free of app, database and web
+# imports so a spawned worker starts quickly; reportlab is imported lazily.
+
+PAGE_MARGIN = 36
+LINE_HEIGHT = 14
+FONT_SIZE = 8
+
+Column = Tuple[str, float, str]
+
+
+def _truncate(canvas, text: str, width: float, font: str) -> str:
+    if canvas.stringWidth(text, font, FONT_SIZE) <= width:
+        return text
+    while text and canvas.stringWidth(text + "...", font, FONT_SIZE) > width:
+        text = text[:-1]
+    return text + "..."
+
+
+def render_table_pdf(
+    path: str,
+    title: str,
+    subtitle_lines: Sequence[str],
+    columns: Sequence[Column],
+    rows: Iterable[Sequence[str]]
+) -> str:
+    # columns are (label, width in points, "left" | "right"). Pages are drawn
+    # directly on the canvas; platypus tables are far too slow for long ledgers.
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen.canvas import Canvas
+
+    # invariant drops the creation timestamp and random document id, so the
+    # same rows always produce the same bytes.
+    canvas = Canvas(path, pagesize=A4, pageCompression=1, invariant=1)
+    page_width, page_height = A4
+    positions = []
+    x = PAGE_MARGIN
+    for _, width, _ in columns:
+        positions.append(x)
+        x += width
+    page_number = 0
+
+    def start_page() -> float:
+        nonlocal page_number
+        page_number += 1
+        y = page_height - PAGE_MARGIN
+        if page_number == 1:
+            canvas.setFont("Helvetica-Bold", 14)
+            canvas.drawString(PAGE_MARGIN, y - 14, title)
+            y -= 22
+            canvas.setFont("Helvetica", 9)
+            for line in subtitle_lines:
+                y -= 12
+                canvas.drawString(PAGE_MARGIN, y, line)
+            y -= 10
+        canvas.setFont("Helvetica", 7)
+        canvas.drawRightString(page_width - PAGE_MARGIN, PAGE_MARGIN / 2, f"Page {page_number}")
+        y -= LINE_HEIGHT
+        draw_row([label for label, _, _ in columns], y, "Helvetica-Bold")
+        canvas.line(PAGE_MARGIN, y - 4, x, y - 4)
+        return y - LINE_HEIGHT
+
+    def draw_row(cells, y, font="Helvetica"):
+        canvas.setFont(font, FONT_SIZE)
+        for cell, left, (_, width, align) in zip(cells, positions, columns):
+            text = _truncate(canvas, str(cell), width - 4, font)
+            if align == "right":
+                canvas.drawRightString(left + width - 4, y, text)
+            else:
+                canvas.drawString(left, y, text)
+
+    y = start_page()
+    for row in rows:
+        if y < PAGE_MARGIN + LINE_HEIGHT:
+            canvas.showPage()
+            y = start_page()
+        draw_row(row, y)
+        y -= LINE_HEIGHT
+    canvas.save()
+    return path
@@ -0,0 +1,207 @@
+import asyncio
+import glob
+import hashlib
+import importlib.util
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from typing import Dict, Optional
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.ledger_entry import LedgerEntry
+from app.logger import logger
+from app.services.payment_service import iter_outstanding_balances
+from app.services.payment_status_service import utc_now
+from app.services.pdf_render import render_table_pdf
+from app.services.statement_services import get_statement_balances, iter_statement_entries, statement_period
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+PDF_MAX_PENDING = int(os.getenv("PDF_MAX_PENDING", "8"))
+PDF_JOB_TIMEOUT_SECONDS = float(os.getenv("PDF_JOB_TIMEOUT_SECONDS", "30"))
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join("cache", "pdf"))
+
+STATEMENT_COLUMNS = [
+    ("Date", 80, "left"),
+    ("Entry", 45, "right"),
+    ("Description", 190, "left"),
+    ("Debit", 70, "right"),
+    ("Credit", 70, "right"),
+    ("Balance", 70, "right"),
+]
+OUTSTANDING_BALANCE_COLUMNS = [
+    ("Customer", 50, "right"),
+    ("Name", 190, "left"),
+    ("Contact", 100, "left"),
+    ("Email", 110, "left"),
+    ("Outstanding", 75, "right"),
+]
+
+
+def pdf_rendering_available() -> bool:
+    return importlib.util.find_spec("reportlab") is not None
+
+
+class PdfRenderPool:
+    # CPU-bound rendering runs in worker processes so it never blocks the event
+    # loop. At most max_pending jobs are queued or running; beyond that callers
+    # get a 503 instead of piling up behind a long queue.
+    def __init__(self, workers: int, max_pending: int, timeout_seconds: float):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout_seconds = timeout_seconds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, not fork: forking a process that runs an event loop and
+            # database driver threads can deadlock the child.
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _recycle(self, executor: ProcessPoolExecutor):
+        # A job past its deadline cannot be cancelled once a worker picked it up,
+        # so the workers are terminated and a fresh pool is started on demand.
+        # Only the pool the job ran on is touched; if another job already
+        # replaced it, the new pool is left alone.
+        if executor is not self._executor:
+            return
+        self._executor = None
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def render(self, path: str, render, *args) -> str:
+        # Concurrent requests for the same cache file share one rendering job.
+        if path in self._inflight:
+            return await asyncio.shield(self._inflight[path])
+        if self._pending >= self.max_pending:
+            raise HTTPException(
+                status_code=503,
+                detail="PDF rendering is busy. Please try again shortly.",
+                headers={"Retry-After": "5"}
+            )
+        self._pending += 1
+        job = asyncio.ensure_future(self._run(path, render, args))
+        self._inflight[path] = job
+        return await asyncio.shield(job)
+
+    async def _run(self, path: str, render, args) -> str:
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            future = loop.run_in_executor(executor, render, tmp_path, *args)
+            await asyncio.wait_for(future, self.timeout_seconds)
+            os.replace(tmp_path, path)
+            return path
+        except asyncio.TimeoutError:
+            logger.error(f"PDF rendering for {path} exceeded {self.timeout_seconds}s")
+            self._recycle(executor)
+            raise HTTPException(status_code=504, detail="PDF rendering timed out.")
+        except BrokenProcessPool:
+            if self._executor is executor:
+                self._executor = None
+            raise HTTPException(status_code=503, detail="PDF rendering was interrupted. Please try again.")
+        finally:
+            self._pending -= 1
+            self._inflight.pop(path, None)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+pdf_pool = PdfRenderPool(PDF_WORKERS, PDF_MAX_PENDING, PDF_JOB_TIMEOUT_SECONDS)
+
+
+async def ledger_data_version(db: AsyncSession, *criteria) -> str:
+    # Any insert, update or delete of the matching ledger entries changes the
+    # row count, the highest id or the latest updated_at.
+    result = await db.execute(
+        select(func.count(LedgerEntry.id), func.max(LedgerEntry.id), func.max(LedgerEntry.updated_at)).where(*criteria)
+    )
+    return repr(tuple(result.one()))
+
+
+def pdf_cache_path(kind: str, scope: str, *version_parts) -> str:
+    directory = os.path.join(PDF_CACHE_DIR, kind)
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256(repr(version_parts).encode()).hexdigest()[:20]
+    return os.path.join(directory, f"{scope}_{digest}.pdf")
+
+
+def remove_stale_pdfs(path: str, scope: str):
+    for stale in glob.glob(os.path.join(os.path.dirname(path), f"{glob.escape(scope)}_*.pdf")):
+        if stale != path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def _money(value) -> str:
+    return f"{value:,.2f}"
+
+
+async def render_statement_pdf(db: AsyncSession, customer, from_date: Optional[date], to_date: date, path: str) -> str:
+    opening_balance, closing_balance = await get_statement_balances(db, customer.id, from_date, to_date)
+    rows = [(str(from_date or ""), "", "Opening balance", "", "", _money(opening_balance))]
+    async for entry in iter_statement_entries(db, customer.id, from_date, to_date, opening_balance):
+        rows.append((
+            entry["created_at"].strftime("%Y-%m-%d %H:%M"),
+            str(entry["ledger_entry_id"]),
+            entry["description"] or "",
+            _money(entry["debit"]) if entry["debit"] else "",
+            _money(entry["credit"]) if entry["credit"] else "",
+            _money(entry["balance"]),
+        ))
+    rows.append((str(to_date), "", "Closing balance", "", "", _money(closing_balance)))
+
+    period = f"{from_date.isoformat() if from_date else 'Start'} to {to_date.isoformat()}"
+    return await pdf_pool.render(
+        path, render_table_pdf, "Statement of account", [customer.name, period], STATEMENT_COLUMNS, rows
+    )
+
+
+async def customer_statement_pdf(db: AsyncSession, customer, from_date: Optional[date], to_date: date) -> str:
+    _, end = statement_period(from_date, to_date)
+    scope = f"customer_{customer.id}_{from_date or 'start'}_{to_date}"
+    version = await ledger_data_version(db, LedgerEntry.customer_id == customer.id, LedgerEntry.created_at < end)
+    path = pdf_cache_path("statements", scope, customer.name, version)
+    if os.path.exists(path):
+        return path
+
+    await render_statement_pdf(db, customer, from_date, to_date, path)
+    remove_stale_pdfs(path, scope)
+    return path
+
+
+async def outstanding_balances_pdf(db: AsyncSession, current_user, threshold: float) -> Optional[str]:
+    scope = f"business_{current_user.business_id}_{threshold}"
+    version = await ledger_data_version(db, LedgerEntry.business_id == current_user.business_id)
+    path = pdf_cache_path("outstanding_balances", scope, version)
+    if os.path.exists(path):
+        return path
+
+    rows = [
+        (str(row["customer_id"]), row["customer_name"], row["contact"] or "", row["email"] or "", _money(row["outstanding_balance"]))
+        async for row in iter_outstanding_balances(current_user, db, threshold)
+    ]
+    if not rows:
+        return None
+
+    subtitle = [f"Balances above {_money(threshold)}", f"Generated {utc_now().strftime('%Y-%m-%d %H:%M')} UTC"]
+    await pdf_pool.render(
+        path, render_table_pdf, "Outstanding balances", subtitle, OUTSTANDING_BALANCE_COLUMNS, rows
+    )
+    remove_stale_pdfs(path, scope)
+    return path
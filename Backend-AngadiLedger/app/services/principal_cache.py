@@ -0,0 +1,198 @@
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from sqlalchemy import delete, func, or_, select
+from app.database import SessionLocal
+from app.db.models.principal_invalidation import PrincipalInvalidation
+from app.logger import logger
+from app.services.payment_status_service import utc_now
+
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+PRINCIPAL_CACHE_MAX_SIZE = int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", "10000"))
+PRINCIPAL_CACHE_POLL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_POLL_SECONDS", "2"))
+# "local" for a single worker; "database" announces changes to every worker
+# sharing the database.
+PRINCIPAL_CACHE_NOTIFIER = os.getenv("PRINCIPAL_CACHE_NOTIFIER", "local")
+# How far back pollers re-read rows; longer than any transaction that writes them.
+POLL_OVERLAP_SECONDS = float(os.getenv("POLL_OVERLAP_SECONDS", "60"))
+
+
+class Principal(NamedTuple):
+    id: int
+    email: str
+    role: str
+    business_id: Optional[int]
+    staff_role: Optional[str]
+    is_active: bool
+    token_version: int = 0
+    # Only API keys carry scopes; users are limited by role instead.
+    scopes: Tuple[str, ...] = ()
+
+
+class PrincipalCache:
+    # Resolved principals by token subject, dropped after ttl_seconds or when
+    # the least recently used entry makes room. A principal read before an
+    # invalidation is not stored: set() compares the generation it was
+    # loaded under. A user can have several subjects: their email and the
+    # API keys they issued, which are dropped along with them.
+    def __init__(self, ttl_seconds: float = PRINCIPAL_CACHE_TTL_SECONDS, max_size: int = PRINCIPAL_CACHE_MAX_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.generation = 0
+        self._entries: "OrderedDict[str, Tuple[float, Principal]]" = OrderedDict()
+        self._subjects: Dict[int, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, subject: str) -> Optional[Principal]:
+        entry = self._entries.get(subject)
+        if entry is None:
+            return None
+        expires_at, principal = entry
+        if expires_at <= time.monotonic():
+            self._discard(subject)
+            return None
+        self._entries.move_to_end(subject)
+        return principal
+
+    def set(self, subject: str, principal: Principal, generation: int):
+        if generation != self.generation or self.max_size <= 0:
+            return
+        self._discard(subject)
+        self._entries[subject] = (time.monotonic() + self.ttl_seconds, principal)
+        self._subjects.setdefault(principal.id, set()).add(subject)
+        while len(self._entries) > self.max_size:
+            self._discard(next(iter(self._entries)))
+
+    def _discard(self, subject: str):
+        entry = self._entries.pop(subject, None)
+        if entry is None:
+            return
+        subjects = self._subjects.get(entry[1].id)
+        if subjects is not None:
+            subjects.discard(subject)
+            if not subjects:
+                del self._subjects[entry[1].id]
+
+    def invalidate(self, user_ids: Iterable[int]):
+        self.generation += 1
+        for user_id in user_ids:
+            for subject in list(self._subjects.get(user_id, ())):
+                self._discard(subject)
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self._subjects.clear()
+
+
+class PolledRows:
+    # Tracks what a poller has read from a table that only grows by id. Ids
+    # are handed out when a row is inserted but become visible when its
+    # transaction commits, so a row can appear below ids already read. Each
+    # poll therefore also re-reads rows created within the overlap window,
+    # and rows already seen are filtered out.
+    def __init__(self, overlap_seconds: float = POLL_OVERLAP_SECONDS):
+        self.overlap_seconds = overlap_seconds
+        self.last_id: Optional[int] = None
+        self._seen: Dict[int, datetime] = {}
+
+    def window_start(self) -> datetime:
+        return utc_now() - timedelta(seconds=self.overlap_seconds)
+
+    def condition(self, model):
+        return or_(model.id > self.last_id, model.created_at >= self.window_start())
+
+    def unseen(self, rows: list) -> list:
+        fresh = [row for row in rows if row.id not in self._seen]
+        for row in fresh:
+            self._seen[row.id] = row.created_at
+            self.last_id = max(self.last_id or 0, row.id)
+        # Rows older than the window are never read again.
+        window_start = self.window_start()
+        self._seen = {
+            row_id: created_at for row_id, created_at in self._seen.items()
+            if created_at is not None and created_at >= window_start
+        }
+        return fresh
+
+
+class PrincipalNotifier:
+    # Carries invalidations to other workers. This default reaches no one,
+    # which is right for a single worker.
+    async def publish(self, user_ids: List[int]):
+        pass
+
+    async def poll(self) -> List[int]:
+        return []
+
+
+class DatabasePrincipalNotifier(PrincipalNotifier):
+    # Invalidations are rows in principal_invalidations; every worker polls
+    # for rows it has not seen yet. Rows older than twice the cache TTL and
+    # the overlap window are pruned, since entries cached before them have
+    # expired anyway and no poll reads them again.
+    def __init__(self, retention_seconds: float = PRINCIPAL_CACHE_TTL_SECONDS):
+        self.retention_seconds = retention_seconds
+        self.rows = PolledRows()
+
+    async def publish(self, user_ids: List[int]):
+        async with SessionLocal() as db:
+            db.add_all([PrincipalInvalidation(user_id=user_id) for user_id in user_ids])
+            await db.commit()
+
+    async def poll(self) -> List[int]:
+        async with SessionLocal() as db:
+            if self.rows.last_id is None:
+                # Entries cached from now on are newer than anything already announced.
+                recent = await db.execute(
+                    select(PrincipalInvalidation.id, PrincipalInvalidation.created_at)
+                    .where(PrincipalInvalidation.created_at >= self.rows.window_start())
+                )
+                self.rows.unseen(recent.all())
+                self.rows.last_id = (await db.execute(select(func.coalesce(func.max(PrincipalInvalidation.id), 0)))).scalar_one()
+                return []
+            result = await db.execute(
+                select(PrincipalInvalidation.id, PrincipalInvalidation.user_id, PrincipalInvalidation.created_at)
+                .where(self.rows.condition(PrincipalInvalidation))
+                .order_by(PrincipalInvalidation.id)
+            )
+            rows = self.rows.unseen(result.all())
+            retention = max(2 * self.retention_seconds, self.rows.overlap_seconds)
+            await db.execute(
+                delete(PrincipalInvalidation)
+                .where(PrincipalInvalidation.created_at < utc_now() - timedelta(seconds=retention))
+            )
+            await db.commit()
+        return [row.user_id for row in rows]
+
+
+principal_cache = PrincipalCache()
+principal_notifier: PrincipalNotifier = (
+    DatabasePrincipalNotifier() if PRINCIPAL_CACHE_NOTIFIER == "database" else PrincipalNotifier()
+)
+
+
+def set_principal_notifier(notifier: PrincipalNotifier):
+    global principal_notifier
+    principal_notifier = notifier
+
+
+async def principals_changed(*user_ids: int):
+    # Call after the change is committed, so no worker can reload the old row.
+    principal_cache.invalidate(user_ids)
+    try:
+        await principal_notifier.publish(list(user_ids))
+    except Exception as exc:
+        # Other workers still drop the entry when its TTL runs out.
+        logger.warning(f"Could not announce principal change for users {list(user_ids)}: {exc}")
+
+
+async def poll_principal_invalidations() -> int:
+    user_ids = await principal_notifier.poll()
+    if user_ids:
+        principal_cache.invalidate(user_ids)
+    return len(user_ids)
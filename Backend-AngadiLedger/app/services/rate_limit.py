@@ -0,0 +1,157 @@
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Tuple
+from fastapi import HTTPException, Request, status
+from app.logger import logger
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
+
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+
+class RateLimit(NamedTuple):
+    capacity: int
+    period_seconds: float
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.capacity / self.period_seconds
+
+
+def parse_rate_limit(value: str) -> RateLimit:
+    # "20/60" allows bursts of 20 and refills 20 attempts every 60 seconds.
+    count, _, seconds = value.partition("/")
+    return RateLimit(int(count), float(seconds))
+
+
+LOGIN_RATE_LIMIT_PER_IP = parse_rate_limit(os.getenv("LOGIN_RATE_LIMIT_PER_IP", "20/60"))
+LOGIN_RATE_LIMIT_PER_ACCOUNT = parse_rate_limit(os.getenv("LOGIN_RATE_LIMIT_PER_ACCOUNT", "5/300"))
+OTP_RATE_LIMIT_PER_IP = parse_rate_limit(os.getenv("OTP_RATE_LIMIT_PER_IP", "20/60"))
+OTP_RATE_LIMIT_PER_ACCOUNT = parse_rate_limit(os.getenv("OTP_RATE_LIMIT_PER_ACCOUNT", "5/600"))
+
+
+def _refill(tokens: float, elapsed: float, limit: RateLimit, cost: int) -> Tuple[float, float]:
+    # Returns the tokens left and, when the bucket is short, the seconds until
+    # it is not. A negative cost gives attempts back, up to the capacity.
+    tokens = min(limit.capacity, tokens + max(elapsed, 0.0) * limit.refill_per_second)
+    if cost < 0:
+        return min(limit.capacity, tokens - cost), 0.0
+    needed = max(cost, 1)
+    if tokens >= needed:
+        return tokens - cost, 0.0
+    return tokens, (needed - tokens) / limit.refill_per_second
+
+
+class MemoryRateLimitBackend:
+    # Token buckets for this process only. The least recently touched keys are
+    # dropped beyond max_keys; a dropped bucket starts full again.
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, limit: RateLimit, cost: int = 1) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(key, (float(limit.capacity), now))
+        tokens, retry_after = _refill(tokens, now - updated_at, limit, cost)
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+
+# Same bucket arithmetic as _refill, run atomically inside Redis.
+_TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local needed = math.max(cost, 1)
+local retry = 0
+if cost < 0 then
+    tokens = math.min(capacity, tokens - cost)
+elseif tokens >= needed then
+    tokens = tokens - cost
+else
+    retry = (needed - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry)
+"""
+
+
+class RedisRateLimitBackend:
+    # Buckets shared by every worker using the same Redis.
+    def __init__(self, client, prefix: str = "ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def take(self, key: str, limit: RateLimit, cost: int = 1) -> float:
+        retry_after = await self.client.eval(
+            _TOKEN_BUCKET_SCRIPT, 1, self.prefix + key,
+            limit.capacity, limit.refill_per_second, cost, time.time()
+        )
+        return float(retry_after)
+
+
+class RateLimiter:
+    # If the shared backend fails, limits fall back to this process's buckets
+    # rather than locking everyone out or letting everyone through.
+    def __init__(self, backend):
+        self.backend = backend
+        self.fallback = MemoryRateLimitBackend()
+
+    async def _take(self, key: str, limit: RateLimit, cost: int) -> float:
+        try:
+            return await self.backend.take(key, limit, cost)
+        except Exception as exc:
+            logger.warning(f"Rate limit backend failed, using local buckets: {exc}")
+            return await self.fallback.take(key, limit, cost)
+
+    async def hit(self, key: str, limit: RateLimit):
+        # Counts one attempt, refusing it when the bucket is empty.
+        self._raise_if_limited(await self._take(key, limit, 1))
+
+    async def refund(self, key: str, limit: RateLimit):
+        # Gives back an attempt taken by hit() that turned out not to count.
+        # Charging first and refunding later keeps concurrent attempts from
+        # all passing a check before any of them is recorded.
+        await self._take(key, limit, -1)
+
+    @staticmethod
+    def _raise_if_limited(retry_after: float):
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many attempts. Please try again later.",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+            )
+
+
+def _default_backend():
+    if RATE_LIMIT_REDIS_URL and redis_asyncio is not None:
+        return RedisRateLimitBackend(redis_asyncio.from_url(RATE_LIMIT_REDIS_URL))
+    if RATE_LIMIT_REDIS_URL:
+        logger.warning("RATE_LIMIT_REDIS_URL is set but redis is not installed; using in-process rate limits")
+    return MemoryRateLimitBackend()
+
+
+rate_limiter = RateLimiter(_default_backend())
+
+
+def set_rate_limit_backend(backend):
+    rate_limiter.backend = backend
+
+
+def client_address(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
@@ -0,0 +1,351 @@
+import os
+import re
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.customer import Customer
+from app.db.models.ledger_entry import LedgerEntry
+from app.db.models.payment import Payment
+from app.db.models.reconciliation import ReconciliationMatch
+from app.logger import logger
+from app.services.csv_import import iter_csv_records, normalise_phone, parse_amount, parse_date, pick_column
+from app.services.payment_status_service import utc_now
+
+RECONCILIATION_DATE_WINDOW_DAYS = int(os.getenv("RECONCILIATION_DATE_WINDOW_DAYS", "2"))
+RECONCILIATION_AMOUNT_TOLERANCE = Decimal(os.getenv("RECONCILIATION_AMOUNT_TOLERANCE", "1.00"))
+RECONCILIATION_INSERT_BATCH_SIZE = 2000
+CANDIDATE_FETCH_SIZE = 5000
+MAX_REPORTED_CANDIDATES = 10
+REFERENCE_MAX_LENGTH = ReconciliationMatch.reference.type.length
+
+_UPI_REFERENCE = re.compile(r"(?<!\d)\d{12}(?!\d)")
+_PHONE_IN_TEXT = re.compile(r"(?<!\d)(?:\+?91)?([6-9]\d{9})(?!\d)")
+_REFERENCE_TOKEN = re.compile(r"[a-z0-9]{6,}")
+
+
+class StatementRow(NamedTuple):
+    row_number: int
+    txn_date: date
+    amount: int  # paise
+    reference: Optional[str]
+    phone: Optional[str]
+    narration: str
+
+
+class Candidate(NamedTuple):
+    kind: str  # "payment" or "ledger_entry"
+    id: int
+    customer_id: int
+    amount: int  # paise
+    day: int  # date ordinal
+    phone: Optional[str]
+    text: str
+
+
+def to_paise(amount: Decimal) -> int:
+    return int((amount * 100).to_integral_value())
+
+def from_paise(amount: int) -> Decimal:
+    return (Decimal(amount) / 100).quantize(Decimal("0.01"))
+
+class StatementColumns(NamedTuple):
+    date: Optional[str]
+    credit: Optional[str]
+    amount: Optional[str]
+    debit: Optional[str]
+    narration: Optional[str]
+    reference: Optional[str]
+    phone: Optional[str]
+
+def resolve_statement_columns(header: Iterable[str]) -> StatementColumns:
+    header = list(header)
+    return StatementColumns(
+        date=pick_column(header, "date", "txn_date", "transaction_date", "value_date", "posting_date"),
+        credit=pick_column(header, "credit", "deposit", "deposit_amount", "credit_amount", "cr"),
+        amount=pick_column(header, "amount", "transaction_amount", "txn_amount"),
+        debit=pick_column(header, "debit", "withdrawal", "withdrawal_amount", "dr"),
+        narration=pick_column(header, "description", "narration", "particulars", "remarks", "details"),
+        reference=pick_column(header, "reference", "ref_no", "reference_no", "utr", "utr_no", "chq_ref_no", "cheque_ref_no", "transaction_id"),
+        phone=pick_column(header, "phone", "mobile", "phone_number"),
+    )
+
+def normalise_statement_row(row_number: int, row: Dict[str, str], columns: Optional[StatementColumns] = None) -> Tuple[Optional[StatementRow], Optional[str]]:
+    # Returns (row, None) for a usable credit, (None, error) for an unreadable
+    # row and (None, None) for a debit, which is skipped.
+    columns = columns or resolve_statement_columns(row.keys())
+    txn_date = parse_date(row.get(columns.date)) if columns.date else None
+    if txn_date is None:
+        return None, "Unreadable date"
+
+    amount = parse_amount(row.get(columns.credit)) if columns.credit else None
+    if amount is None and columns.amount:
+        amount = parse_amount(row.get(columns.amount))
+    if amount is None:
+        if columns.debit and row.get(columns.debit):
+            return None, None
+        return None, "Unreadable amount"
+    if amount <= 0:
+        return None, None
+
+    narration = (row.get(columns.narration) or "") if columns.narration else ""
+    reference = row.get(columns.reference) if columns.reference else None
+    if not reference:
+        found = _UPI_REFERENCE.search(narration)
+        reference = found.group(0) if found else None
+    phone = normalise_phone(row.get(columns.phone)) if columns.phone else None
+    if phone is None:
+        found = _PHONE_IN_TEXT.search(narration)
+        phone = found.group(1) if found else None
+
+    return StatementRow(
+        row_number=row_number,
+        txn_date=txn_date,
+        amount=to_paise(amount),
+        reference=reference.strip().lower()[:REFERENCE_MAX_LENGTH] if reference else None,
+        phone=phone,
+        narration=narration
+    ), None
+
+
+class ReconciliationIndex:
+    # In-memory hash join of statement rows against unreconciled candidates.
+    # The primary key is (amount, day); phone and reference indexes serve the
+    # fuzzy fallbacks when no exact amount/date pair exists.
+    def __init__(self, candidates: Iterable[Candidate], window_days: int, tolerance_paise: int):
+        self.window_days = window_days
+        self.tolerance_paise = tolerance_paise
+        self.by_amount_day: Dict[Tuple[int, int], List[Candidate]] = defaultdict(list)
+        self.by_phone: Dict[str, List[Candidate]] = defaultdict(list)
+        self.by_reference: Dict[str, List[Candidate]] = defaultdict(list)
+        self.claimed = set()
+        for candidate in candidates:
+            self.by_amount_day[(candidate.amount, candidate.day)].append(candidate)
+            if candidate.phone:
+                self.by_phone[candidate.phone].append(candidate)
+            for token in set(_REFERENCE_TOKEN.findall(candidate.text)):
+                self.by_reference[token].append(candidate)
+
+    def _available(self, candidates: Iterable[Candidate]) -> List[Candidate]:
+        return [c for c in candidates if (c.kind, c.id) not in self.claimed]
+
+    def _claim(self, candidate: Candidate):
+        self.claimed.add((candidate.kind, candidate.id))
+
+    def _narrow(self, row: StatementRow, options: List[Candidate]) -> Tuple[Optional[Candidate], Optional[str]]:
+        if len(options) == 1:
+            return options[0], None
+        if row.reference:
+            by_reference = [c for c in options if row.reference in c.text]
+            if len(by_reference) == 1:
+                return by_reference[0], "reference"
+            if by_reference:
+                options = by_reference
+        if row.phone:
+            by_phone = [c for c in options if c.phone == row.phone]
+            if len(by_phone) == 1:
+                return by_phone[0], "phone"
+        # Payments are the more specific record of money received, so a single
+        # payment among ledger debits of the same amount wins.
+        payments = [c for c in options if c.kind == "payment"]
+        if len(payments) == 1 and len({c.customer_id for c in options}) == 1:
+            return payments[0], "exact"
+        return None, None
+
+    def match(self, row: StatementRow) -> Tuple[str, List[Candidate], Optional[str]]:
+        day = row.txn_date.toordinal()
+        exact = self._available(
+            candidate
+            for offset in range(-self.window_days, self.window_days + 1)
+            for candidate in self.by_amount_day.get((row.amount, day + offset), ())
+        )
+        if exact:
+            chosen, method = self._narrow(row, exact)
+            if chosen is not None:
+                self._claim(chosen)
+                return "matched", [chosen], method or "exact"
+            return "ambiguous", exact, None
+
+        def near(candidates: Iterable[Candidate], window: int) -> List[Candidate]:
+            return self._available(
+                c for c in candidates
+                if abs(c.day - day) <= window and abs(c.amount - row.amount) <= self.tolerance_paise
+            )
+
+        if row.phone and row.phone in self.by_phone:
+            options = near(self.by_phone[row.phone], self.window_days)
+            if len(options) == 1:
+                self._claim(options[0])
+                return "matched", options, "phone_fuzzy"
+            if options:
+                return "ambiguous", options, None
+
+        if row.reference and row.reference in self.by_reference:
+            options = near(self.by_reference[row.reference], self.window_days * 3)
+            if len(options) == 1:
+                self._claim(options[0])
+                return "matched", options, "reference_fuzzy"
+            if options:
+                return "ambiguous", options, None
+
+        return "unmatched", [], None
+
+
+async def load_candidates(db: AsyncSession, business_id: int, start: date, end: date) -> List[Candidate]:
+    start_at = datetime.combine(start, datetime.min.time())
+    end_at = datetime.combine(end + timedelta(days=1), datetime.min.time())
+    candidates: List[Candidate] = []
+
+    paid_on = func.coalesce(Payment.paid_at, Payment.created_at)
+    payment_stmt = (
+        select(Payment.id, Payment.customer_id, Payment.amount, paid_on, Customer.phone_number)
+        .join(Customer, Customer.id == Payment.customer_id)
+        .where(
+            Payment.business_id == business_id,
+            Payment.status != "disputed",
+            paid_on >= start_at,
+            paid_on < end_at,
+            ~select(ReconciliationMatch.id).where(ReconciliationMatch.payment_id == Payment.id).exists()
+        )
+        .execution_options(yield_per=CANDIDATE_FETCH_SIZE)
+    )
+    result = await db.stream(payment_stmt)
+    async for payment_id, customer_id, amount, when, phone in result:
+        candidates.append(Candidate("payment", payment_id, customer_id, to_paise(amount), when.date().toordinal(), normalise_phone(phone), ""))
+
+    ledger_stmt = (
+        select(LedgerEntry.id, LedgerEntry.customer_id, LedgerEntry.amount, LedgerEntry.created_at, LedgerEntry.description, Customer.phone_number)
+        .join(Customer, Customer.id == LedgerEntry.customer_id)
+        .where(
+            LedgerEntry.business_id == business_id,
+            LedgerEntry.entry_type == "debit",
+            LedgerEntry.created_at >= start_at,
+            LedgerEntry.created_at < end_at,
+            ~select(ReconciliationMatch.id).where(ReconciliationMatch.ledger_entry_id == LedgerEntry.id).exists()
+        )
+        .execution_options(yield_per=CANDIDATE_FETCH_SIZE)
+    )
+    result = await db.stream(ledger_stmt)
+    async for entry_id, customer_id, amount, created_at, description, phone in result:
+        candidates.append(Candidate("ledger_entry", entry_id, customer_id, to_paise(amount), created_at.date().toordinal(), normalise_phone(phone), (description or "").lower()))
+
+    return candidates
+
+def _row_summary(row: StatementRow) -> Dict[str, object]:
+    return {
+        "row": row.row_number,
+        "date": row.txn_date.isoformat(),
+        "amount": str(from_paise(row.amount)),
+        "reference": row.reference,
+    }
+
+async def reconcile_statement(
+    chunks: AsyncIterator[bytes],
+    current_user,
+    db: AsyncSession,
+    window_days: int = RECONCILIATION_DATE_WINDOW_DAYS,
+    dry_run: bool = False
+) -> Dict[str, object]:
+    rows: List[StatementRow] = []
+    errors = []
+    skipped = 0
+    columns = None
+    async for row_number, record in iter_csv_records(chunks):
+        if columns is None:
+            columns = resolve_statement_columns(record.keys())
+        row, error = normalise_statement_row(row_number, record, columns)
+        if row is not None:
+            rows.append(row)
+        elif error:
+            errors.append({"row": row_number, "error": error})
+        else:
+            skipped += 1
+
+    if not rows and not errors:
+        raise HTTPException(status_code=400, detail="Statement has no credit rows to reconcile.")
+
+    matched, ambiguous, unmatched = [], [], []
+    new_matches = []
+    if rows:
+        start = min(row.txn_date for row in rows) - timedelta(days=window_days * 3)
+        end = max(row.txn_date for row in rows) + timedelta(days=window_days * 3)
+        candidates = await load_candidates(db, current_user.business_id, start, end)
+        index = ReconciliationIndex(candidates, window_days, to_paise(RECONCILIATION_AMOUNT_TOLERANCE))
+
+        for row in rows:
+            outcome, options, method = index.match(row)
+            summary = _row_summary(row)
+            if outcome == "matched":
+                chosen = options[0]
+                matched.append({**summary, "match_type": chosen.kind, "match_id": chosen.id, "customer_id": chosen.customer_id, "method": method})
+                new_matches.append({
+                    "business_id": current_user.business_id,
+                    "ledger_entry_id": chosen.id if chosen.kind == "ledger_entry" else None,
+                    "payment_id": chosen.id if chosen.kind == "payment" else None,
+                    "statement_date": row.txn_date,
+                    "amount": from_paise(row.amount),
+                    "reference": row.reference,
+                    "narration": row.narration,
+                    "match_method": method,
+                    "matched_by_id": current_user.id,
+                })
+            elif outcome == "ambiguous":
+                ambiguous.append({
+                    **summary,
+                    "candidates": [
+                        {"match_type": c.kind, "match_id": c.id, "customer_id": c.customer_id}
+                        for c in options[:MAX_REPORTED_CANDIDATES]
+                    ],
+                })
+            else:
+                unmatched.append({**summary, "narration": row.narration})
+
+    if new_matches and not dry_run:
+        try:
+            for offset in range(0, len(new_matches), RECONCILIATION_INSERT_BATCH_SIZE):
+                # Core table insert: matches mix NULL ledger_entry_id/payment_id, which
+                # the ORM bulk path would split into one statement per run of rows.
+                await db.execute(insert(ReconciliationMatch.__table__), new_matches[offset:offset + RECONCILIATION_INSERT_BATCH_SIZE])
+            matched_payment_ids = [m["payment_id"] for m in new_matches if m["payment_id"] is not None]
+            for offset in range(0, len(matched_payment_ids), RECONCILIATION_INSERT_BATCH_SIZE):
+                await db.execute(
+                    update(Payment)
+                    .where(
+                        Payment.id.in_(matched_payment_ids[offset:offset + RECONCILIATION_INSERT_BATCH_SIZE]),
+                        Payment.status.in_(["pending", "overdue"])
+                    )
+                    .values(status="paid", paid_at=func.coalesce(Payment.paid_at, utc_now()))
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+        except IntegrityError:
+            # An import running at the same time matched some of the same
+            # entries first. Nothing from this run is kept; re-running skips
+            # whatever the other import already reconciled.
+            await db.rollback()
+            logger.warning(f"Concurrent statement import for business {current_user.business_id}; rolled back")
+            raise HTTPException(status_code=409, detail="Another statement import matched some of these entries. Please run the import again.")
+
+    logger.info(
+        f"Reconciled statement for business {current_user.business_id}: "
+        f"{len(matched)} matched, {len(ambiguous)} ambiguous, {len(unmatched)} unmatched"
+    )
+    return {
+        "summary": {
+            "rows": len(rows) + len(errors) + skipped,
+            "matched": len(matched),
+            "ambiguous": len(ambiguous),
+            "unmatched": len(unmatched),
+            "skipped": skipped,
+            "errors": len(errors),
+            "dry_run": dry_run,
+        },
+        "matched": matched,
+        "ambiguous": ambiguous,
+        "unmatched": unmatched,
+        "errors": errors,
+    }
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import secrets
+import uuid
+from datetime import timedelta
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import SessionLocal
+from app.db.models.refresh_token import RefreshToken
+from app.db.models.user import User
+from app.logger import logger
+from app.services.payment_status_service import utc_now
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS = int(os.getenv("REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS", "3600"))
+
+
+def hash_refresh_token(token: str) -> str:
+    # The tokens are 256 random bits, so a plain digest is enough; no salt or
+    # slow hash is needed to make the stored value useless to an attacker.
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def issue_refresh_token(db: AsyncSession, user_id: int, family_id: Optional[str] = None) -> str:
+    # Added to the session; the caller commits.
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        user_id=user_id,
+        family_id=family_id or uuid.uuid4().hex,
+        token_hash=hash_refresh_token(token),
+        expires_at=utc_now() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    return token
+
+
+def _invalid_refresh_token(detail: str = "Invalid refresh token") -> HTTPException:
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=detail)
+
+
+async def revoke_refresh_token_family(db: AsyncSession, family_id: str) -> int:
+    result = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=utc_now())
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def revoke_refresh_token(db: AsyncSession, token: str, user_id: int) -> int:
+    # Signing out ends the whole login: every token rotated from it.
+    result = await db.execute(
+        select(RefreshToken.family_id)
+        .where(RefreshToken.token_hash == hash_refresh_token(token), RefreshToken.user_id == user_id)
+    )
+    family_id = result.scalar_one_or_none()
+    if family_id is None:
+        return 0
+    return await revoke_refresh_token_family(db, family_id)
+
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> Tuple[User, str]:
+    # Each refresh token works once and is replaced by a new one in the same
+    # family. Presenting a used or revoked token means it was copied, so the
+    # whole family is revoked and both holders have to log in again.
+    result = await db.execute(
+        select(RefreshToken, User)
+        .join(User, User.id == RefreshToken.user_id)
+        .where(RefreshToken.token_hash == hash_refresh_token(token))
+    )
+    row = result.first()
+    if row is None:
+        raise _invalid_refresh_token()
+    stored, user = row
+    now = utc_now()
+    if stored.revoked_at is not None or stored.used_at is not None:
+        revoked = await revoke_refresh_token_family(db, stored.family_id)
+        logger.warning(f"Refresh token reuse for user_id={user.id}; revoked {revoked} tokens")
+        raise _invalid_refresh_token("Refresh token has already been used")
+    if stored.expires_at <= now:
+        raise _invalid_refresh_token("Refresh token has expired")
+
+    # Conditional so that two concurrent refreshes cannot both succeed.
+    claimed = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == stored.id, RefreshToken.used_at.is_(None), RefreshToken.revoked_at.is_(None))
+        .values(used_at=now)
+    )
+    if claimed.rowcount != 1:
+        family_id = stored.family_id
+        await db.rollback()
+        await revoke_refresh_token_family(db, family_id)
+        raise _invalid_refresh_token("Refresh token has already been used")
+    new_token = issue_refresh_token(db, user.id, stored.family_id)
+    await db.commit()
+    return user, new_token
+
+
+async def purge_refresh_tokens(db: AsyncSession) -> int:
+    result = await db.execute(delete(RefreshToken).where(RefreshToken.expires_at <= utc_now()))
+    await db.commit()
+    return result.rowcount
+
+
+async def sweep_refresh_tokens() -> int:
+    async with SessionLocal() as db:
+        purged = await purge_refresh_tokens(db)
+    if purged:
+        logger.info(f"Purged {purged} expired refresh tokens")
+    return purged
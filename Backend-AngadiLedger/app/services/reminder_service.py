@@ -0,0 +1,83 @@
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Set, Tuple
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.business import Business
+from app.db.models.payment_reminder import PaymentReminder
+
+REMINDER_THROTTLE_HOURS = int(os.getenv("REMINDER_THROTTLE_HOURS", "24"))
+REMINDER_HOURLY_QUOTA = int(os.getenv("REMINDER_HOURLY_QUOTA", "200"))
+
+
+async def get_recently_reminded_customer_ids(db: AsyncSession, customer_ids: Iterable[int], since: datetime) -> Set[int]:
+    customer_ids = list(customer_ids)
+    if not customer_ids:
+        return set()
+    result = await db.execute(
+        select(PaymentReminder.customer_id)
+        .where(
+            PaymentReminder.customer_id.in_(customer_ids),
+            PaymentReminder.sent_at >= since,
+            # A "sending" row is a claim by a run that has not finished (or
+            # crashed mid-send); treat it like a delivered reminder.
+            PaymentReminder.status.in_(("sending", "sent"))
+        )
+        .distinct()
+    )
+    return set(result.scalars().all())
+
+async def count_business_reminders_since(db: AsyncSession, business_id: int, since: datetime) -> int:
+    result = await db.execute(
+        select(func.count(PaymentReminder.id)).where(
+            PaymentReminder.business_id == business_id,
+            PaymentReminder.sent_at >= since
+        )
+    )
+    return result.scalar_one()
+
+def plan_reminders(
+    customers: List[Dict],
+    recently_reminded: Set[int],
+    remaining_quota: int,
+    window_hours: int
+) -> Tuple[List[Dict], List[Dict]]:
+    to_send, skipped = [], []
+    for customer in customers:
+        if customer["customer_id"] in recently_reminded:
+            skipped.append({"customer": customer.get("customer_name"), "reason": f"Already reminded in the last {window_hours} hours"})
+        elif len(to_send) >= remaining_quota:
+            skipped.append({"customer": customer.get("customer_name"), "reason": "Hourly reminder quota reached"})
+        else:
+            to_send.append(customer)
+    return to_send, skipped
+
+async def lock_business_reminders(db: AsyncSession, business_id: int):
+    # Concurrent runs for one business wait here until the earlier run has
+    # committed its claims, so both never plan the same customers.
+    await db.execute(select(Business.id).where(Business.id == business_id).with_for_update())
+
+async def claim_reminders(db: AsyncSession, business_id: int, customer_ids: List[int], method: str, sent_at: datetime) -> List[int]:
+    if not customer_ids:
+        await db.commit()
+        return []
+    result = await db.execute(
+        insert(PaymentReminder).returning(PaymentReminder.id, sort_by_parameter_order=True),
+        [
+            {
+                "customer_id": customer_id,
+                "business_id": business_id,
+                "method": method,
+                "status": "sending",
+                "sent_at": sent_at
+            }
+            for customer_id in customer_ids
+        ]
+    )
+    reminder_ids = list(result.scalars().all())
+    await db.commit()
+    return reminder_ids
+
+async def finish_reminder(db: AsyncSession, reminder_id: int, status: str):
+    await db.execute(update(PaymentReminder).where(PaymentReminder.id == reminder_id).values(status=status))
+    await db.commit()
@@ -0,0 +1,83 @@
+from typing import Optional, Type, TypeVar
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.db.models.business import Business
+from app.db.models.customer import Customer
+from app.db.models.ledger_entry import LedgerEntry
+from app.deps import get_db
+from app.services.auth import cashier_or_owner_required
+from app.services.principal_cache import Principal
+
+Model = TypeVar("Model")
+
+_NOT_FOUND = {
+    Business: "Business not found.",
+    Customer: "Customer not found.",
+    LedgerEntry: "Ledger entry not found.",
+}
+
+
+def _business_column(model):
+    return model.id if model is Business else model.business_id
+
+
+def _request_resources(request: Optional[Request]) -> dict:
+    if request is None:
+        return {}
+    resources = getattr(request.state, "resources", None)
+    if resources is None:
+        resources = request.state.resources = {}
+    return resources
+
+
+async def load_business_resource(
+    db: AsyncSession,
+    model: Type[Model],
+    resource_id: int,
+    business_id: Optional[int],
+    request: Optional[Request] = None
+) -> Model:
+    # One query, already limited to the caller's business; a row of another
+    # business is reported exactly like a missing one. Given the request, a
+    # second load of the same row in that request reuses the first.
+    resources = _request_resources(request)
+    resource = resources.get((model, resource_id))
+    if resource is not None:
+        return resource
+    if business_id is not None:
+        result = await db.execute(
+            select(model).where(model.id == resource_id, _business_column(model) == business_id)
+        )
+        resource = result.scalars().first()
+    if resource is None:
+        raise HTTPException(status_code=404, detail=_NOT_FOUND[model])
+    resources[(model, resource_id)] = resource
+    return resource
+
+
+async def business_customer_access_required(
+    customer_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(cashier_or_owner_required)
+) -> Customer:
+    return await load_business_resource(db, Customer, customer_id, current_user.business_id, request)
+
+
+async def business_ledger_access_required(
+    ledger_entry_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(cashier_or_owner_required)
+) -> LedgerEntry:
+    return await load_business_resource(db, LedgerEntry, ledger_entry_id, current_user.business_id, request)
+
+
+async def business_access_required(
+    business_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(cashier_or_owner_required)
+) -> Business:
+    return await load_business_resource(db, Business, business_id, current_user.business_id, request)
@@ -0,0 +1,27 @@
+import asyncio
+from typing import Awaitable, Callable, List
+from app.logger import logger
+
+_periodic_tasks: List[asyncio.Task] = []
+
+async def _run_periodically(name: str, interval_seconds: float, job: Callable[[], Awaitable[object]]):
+    while True:
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception(f"Periodic job {name} failed")
+        await asyncio.sleep(interval_seconds)
+
+def start_periodic_job(name: str, interval_seconds: float, job: Callable[[], Awaitable[object]]) -> asyncio.Task:
+    task = asyncio.create_task(_run_periodically(name, interval_seconds, job), name=name)
+    _periodic_tasks.append(task)
+    logger.info(f"Started periodic job {name} every {interval_seconds}s")
+    return task
+
+async def stop_periodic_jobs():
+    for task in _periodic_tasks:
+        task.cancel()
+    await asyncio.gather(*_periodic_tasks, return_exceptions=True)
+    _periodic_tasks.clear()
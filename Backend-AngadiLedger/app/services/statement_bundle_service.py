@@ -0,0 +1,157 @@
+import re
+import zipfile
+from datetime import date
+from decimal import Decimal
+from typing import AsyncIterator, Callable, Optional
+from sqlalchemy import func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.customer import Customer
+from app.db.models.ledger_entry import LedgerEntry
+from app.services.statement_services import (
+    CENT,
+    STATEMENT_FETCH_SIZE,
+    ZERO,
+    ChunkSink,
+    _signed_amount,
+    statement_csv_rows,
+    statement_period,
+    stream_csv,
+    stream_statement_html,
+)
+
+_FILENAME_CHARACTERS = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def _customer_balances_stmt(business_id: int, start, end):
+    signed = _signed_amount()
+    opening = func.sum(signed).filter(LedgerEntry.created_at < start) if start is not None else literal(0)
+    balances = (
+        select(
+            LedgerEntry.customer_id,
+            func.coalesce(opening, 0).label("opening_balance"),
+            func.sum(signed).label("closing_balance")
+        )
+        .where(LedgerEntry.business_id == business_id, LedgerEntry.created_at < end)
+        .group_by(LedgerEntry.customer_id)
+        .subquery()
+    )
+    return (
+        select(
+            Customer.id,
+            Customer.name,
+            func.coalesce(balances.c.opening_balance, 0).label("opening_balance"),
+            func.coalesce(balances.c.closing_balance, 0).label("closing_balance")
+        )
+        .outerjoin(balances, balances.c.customer_id == Customer.id)
+        .where(Customer.business_id == business_id)
+        .order_by(Customer.id)
+    )
+
+
+def _business_entries_stmt(business_id: int, start, end):
+    stmt = select(
+        LedgerEntry.customer_id,
+        LedgerEntry.id.label("ledger_entry_id"),
+        LedgerEntry.created_at,
+        LedgerEntry.entry_type,
+        LedgerEntry.description,
+        LedgerEntry.amount
+    ).where(LedgerEntry.business_id == business_id, LedgerEntry.created_at < end)
+    if start is not None:
+        stmt = stmt.where(LedgerEntry.created_at >= start)
+    return stmt.order_by(LedgerEntry.customer_id, LedgerEntry.created_at, LedgerEntry.id)
+
+
+class _EntryCursor:
+    # Wraps the business-wide entry stream, ordered by customer, so each
+    # customer's statement consumes just its own run of rows. Rows are pulled
+    # a partition at a time rather than one by one.
+    def __init__(self, result):
+        self._partitions = result.partitions().__aiter__()
+        self._batch = []
+        self._index = 0
+        self.current = None
+
+    async def advance(self):
+        if self._index >= len(self._batch):
+            try:
+                self._batch = await self._partitions.__anext__()
+            except StopAsyncIteration:
+                self.current = None
+                return
+            self._index = 0
+        self.current = self._batch[self._index]
+        self._index += 1
+
+    async def entries_for(self, customer_id: int, opening_balance: Decimal) -> AsyncIterator[dict]:
+        balance = opening_balance
+        while self.current is not None and self.current.customer_id <= customer_id:
+            row = self.current
+            if row.customer_id == customer_id:
+                is_credit = row.entry_type == "credit"
+                balance += row.amount if is_credit else -row.amount
+                yield {
+                    "ledger_entry_id": row.ledger_entry_id,
+                    "created_at": row.created_at,
+                    "entry_type": row.entry_type,
+                    "description": row.description,
+                    "debit": ZERO if is_credit else row.amount,
+                    "credit": row.amount if is_credit else ZERO,
+                    "balance": balance.quantize(CENT),
+                }
+            await self.advance()
+
+
+def _entry_name(customer, statement_format: str) -> str:
+    name = _FILENAME_CHARACTERS.sub("_", customer.name or "").strip("._-")[:60]
+    return f"statement_{customer.id}_{name}.{statement_format}" if name else f"statement_{customer.id}.{statement_format}"
+
+
+async def iter_bundle_customers(db: AsyncSession, business_id: int, from_date: Optional[date], to_date: date):
+    start, end = statement_period(from_date, to_date)
+    result = await db.stream(_customer_balances_stmt(business_id, start, end).execution_options(yield_per=STATEMENT_FETCH_SIZE))
+    async for row in result:
+        yield row
+
+
+async def stream_statement_bundle(
+    db: AsyncSession,
+    business_id: int,
+    customers: AsyncIterator,
+    from_date: Optional[date],
+    to_date: date,
+    statement_format: str,
+    progress: Optional[Callable[[int], None]] = None
+) -> AsyncIterator[bytes]:
+    # Two ordered cursors, customers with their balances and every ledger entry
+    # of the period, are merged one customer at a time. Each statement is
+    # written straight into its ZIP entry, and the compressed bytes are sent
+    # as they are produced, so neither the archive nor a statement is held.
+    start, end = statement_period(from_date, to_date)
+    entries = await db.stream(_business_entries_stmt(business_id, start, end).execution_options(yield_per=STATEMENT_FETCH_SIZE))
+    cursor = _EntryCursor(entries)
+    await cursor.advance()
+
+    sink = ChunkSink()
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED)
+    async for customer in customers:
+        opening_balance = Decimal(customer.opening_balance).quantize(CENT)
+        closing_balance = Decimal(customer.closing_balance).quantize(CENT)
+        customer_entries = cursor.entries_for(customer.id, opening_balance)
+        if statement_format == "html":
+            chunks = stream_statement_html(customer, customer_entries, from_date, to_date, opening_balance, closing_balance)
+        else:
+            chunks = stream_csv(statement_csv_rows(customer_entries, from_date, to_date, opening_balance, closing_balance))
+        with archive.open(_entry_name(customer, statement_format), mode="w") as entry:
+            async for chunk in chunks:
+                entry.write(chunk)
+                data = sink.drain()
+                if data:
+                    yield data
+        if progress is not None:
+            progress(1)
+        data = sink.drain()
+        if data:
+            yield data
+    archive.close()
+    yield sink.drain()
@@ -1,19 +1,223 @@
 import csv
+import html
 import io
+import os
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
 from fastapi.responses import StreamingResponse
+from sqlalchemy import Numeric, case, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.ledger_entry import LedgerEntry
 
-def list_of_dicts_to_csv(data: list) -> io.StringIO:
-    output = io.StringIO()
-    if not data:
-        output.write("No data available.\n")
-        output.seek(0)
-        return output
-    if hasattr(data[0], "dict"):
-        data = [item.dict() for item in data]
-    fieldnames = data[0].keys()
-    writer = csv.DictWriter(output, fieldnames=fieldnames)
-    writer.writeheader()
-    for row in data:
-        writer.writerow(row)
-    output.seek(0)
-    return output
+CSV_CHUNK_SIZE = int(os.getenv("CSV_CHUNK_SIZE", "65536"))
+STATEMENT_FETCH_SIZE = 1000
+STATEMENT_HTML_ROWS_PER_CHUNK = 500
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+
+class ChunkSink:
+    # Write-only file object for archive and columnar writers. Having no
+    # seek/tell makes zipfile produce a streamable archive (data descriptors
+    # after each entry); whatever was written so far is handed out by drain().
+    closed = False
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+async def peek_rows(rows: AsyncIterator[dict]) -> Optional[AsyncIterator[dict]]:
+    # Pulls the first row so callers can answer 404 before the response starts;
+    # returns None for an empty result, otherwise an iterator over all rows.
+    try:
+        first = await rows.__anext__()
+    except StopAsyncIteration:
+        return None
+
+    async def replay():
+        yield first
+        async for row in rows:
+            yield row
+
+    return replay()
+
+async def stream_csv(
+    rows: AsyncIterator[dict],
+    fieldnames: Optional[Sequence[str]] = None,
+    chunk_size: int = CSV_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    # Rows are written into a small buffer that is encoded and emptied every
+    # chunk_size characters, so memory stays flat however many rows there are.
+    # The header and first row go out straight away.
+    buffer = io.StringIO()
+    writer = None
+    async for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=fieldnames or list(row.keys()), extrasaction="ignore")
+            writer.writeheader()
+            writer.writerow(row)
+        else:
+            writer.writerow(row)
+            if buffer.tell() < chunk_size:
+                continue
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+    if writer is None:
+        buffer.write("No data available.\n")
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def csv_streaming_response(rows: AsyncIterator[dict], filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream_csv(rows),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+def statement_period(from_date: Optional[date], to_date: date) -> Tuple[Optional[datetime], datetime]:
+    start = datetime.combine(from_date, time.min) if from_date is not None else None
+    return start, datetime.combine(to_date + timedelta(days=1), time.min)
+
+def _signed_amount():
+    return case((LedgerEntry.entry_type == "credit", LedgerEntry.amount), else_=-LedgerEntry.amount)
+
+async def get_statement_balances(
+    db: AsyncSession,
+    customer_id: int,
+    from_date: Optional[date],
+    to_date: date
+) -> Tuple[Decimal, Decimal]:
+    # One aggregate over (customer_id, created_at) gives both the opening and the
+    # closing balance. It reads every entry of the customer up to the end of the
+    # period, so its cost grows with their history; only the entry listing is
+    # limited to the requested range.
+    start, end = statement_period(from_date, to_date)
+    signed = _signed_amount()
+    opening = func.sum(signed).filter(LedgerEntry.created_at < start) if start is not None else literal(0)
+    result = await db.execute(
+        select(func.coalesce(opening, 0), func.coalesce(func.sum(signed), 0)).where(
+            LedgerEntry.customer_id == customer_id,
+            LedgerEntry.created_at < end
+        )
+    )
+    opening_balance, closing_balance = result.one()
+    return Decimal(opening_balance).quantize(CENT), Decimal(closing_balance).quantize(CENT)
+
+def _statement_entries_stmt(customer_id: int, start: Optional[datetime], end: datetime, opening_balance: Decimal):
+    order = (LedgerEntry.created_at, LedgerEntry.id)
+    running = func.sum(_signed_amount()).over(order_by=order, rows=(None, 0))
+    stmt = select(
+        LedgerEntry.id.label("ledger_entry_id"),
+        LedgerEntry.created_at,
+        LedgerEntry.entry_type,
+        LedgerEntry.description,
+        LedgerEntry.amount,
+        (literal(opening_balance, Numeric(14, 2)) + running).label("balance")
+    ).where(
+        LedgerEntry.customer_id == customer_id,
+        LedgerEntry.created_at < end
+    )
+    if start is not None:
+        stmt = stmt.where(LedgerEntry.created_at >= start)
+    return stmt.order_by(*order)
+
+def _statement_entry_from_row(row) -> dict:
+    is_credit = row.entry_type == "credit"
+    return {
+        "ledger_entry_id": row.ledger_entry_id,
+        "created_at": row.created_at,
+        "entry_type": row.entry_type,
+        "description": row.description,
+        "debit": ZERO if is_credit else row.amount,
+        "credit": row.amount if is_credit else ZERO,
+        "balance": Decimal(row.balance).quantize(CENT),
+    }
+
+async def iter_statement_entries(
+    db: AsyncSession,
+    customer_id: int,
+    from_date: Optional[date],
+    to_date: date,
+    opening_balance: Decimal
+) -> AsyncIterator[dict]:
+    start, end = statement_period(from_date, to_date)
+    stmt = _statement_entries_stmt(customer_id, start, end, opening_balance)
+    result = await db.stream(stmt.execution_options(yield_per=STATEMENT_FETCH_SIZE))
+    async for row in result:
+        yield _statement_entry_from_row(row)
+
+async def statement_csv_rows(
+    entries: AsyncIterator[dict],
+    from_date: Optional[date],
+    to_date: date,
+    opening_balance: Decimal,
+    closing_balance: Decimal
+) -> AsyncIterator[dict]:
+    yield {"date": from_date or "", "ledger_entry_id": "", "entry_type": "", "description": "Opening balance",
+           "debit": "", "credit": "", "balance": opening_balance}
+    async for entry in entries:
+        yield {
+            "date": entry["created_at"],
+            "ledger_entry_id": entry["ledger_entry_id"],
+            "entry_type": entry["entry_type"],
+            "description": entry["description"] or "",
+            "debit": entry["debit"],
+            "credit": entry["credit"],
+            "balance": entry["balance"],
+        }
+    yield {"date": to_date, "ledger_entry_id": "", "entry_type": "", "description": "Closing balance",
+           "debit": "", "credit": "", "balance": closing_balance}
+
+def _html_row(*cells) -> str:
+    return "<tr>" + "".join(f"<td>{html.escape(str(cell))}</td>" for cell in cells) + "</tr>\n"
+
+async def stream_statement_html(
+    customer,
+    entries: AsyncIterator[dict],
+    from_date: Optional[date],
+    to_date: date,
+    opening_balance: Decimal,
+    closing_balance: Decimal
+) -> AsyncIterator[bytes]:
+    period = f"{from_date.isoformat() if from_date else 'Start'} to {to_date.isoformat()}"
+    yield (
+        "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+        f"<title>Statement - {html.escape(customer.name)}</title>"
+        "<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;width:100%}"
+        "th,td{border:1px solid #999;padding:4px 8px;font-size:12px}td:nth-child(n+4){text-align:right}"
+        "thead{display:table-header-group}tr{page-break-inside:avoid}</style></head><body>\n"
+        f"<h2>Statement of account</h2><p>{html.escape(customer.name)}<br>{html.escape(period)}</p>\n"
+        "<table><thead><tr><th>Date</th><th>Entry</th><th>Description</th><th>Debit</th><th>Credit</th><th>Balance</th></tr></thead><tbody>\n"
+        + _html_row(from_date or "", "", "Opening balance", "", "", opening_balance)
+    ).encode("utf-8")
+    rows = []
+    async for entry in entries:
+        rows.append(_html_row(
+            entry["created_at"].strftime("%Y-%m-%d %H:%M"),
+            entry["ledger_entry_id"],
+            entry["description"] or "",
+            entry["debit"] or "",
+            entry["credit"] or "",
+            entry["balance"]
+        ))
+        if len(rows) >= STATEMENT_HTML_ROWS_PER_CHUNK:
+            yield "".join(rows).encode("utf-8")
+            rows = []
+    rows.append(_html_row(to_date, "", "Closing balance", "", "", closing_balance))
+    rows.append("</tbody></table></body></html>\n")
+    yield "".join(rows).encode("utf-8")
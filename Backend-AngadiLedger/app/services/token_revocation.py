@@ -0,0 +1,113 @@
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import SessionLocal
+from app.db.models.refresh_token import RefreshToken
+from app.db.models.token_revocation import TokenRevocation
+from app.db.models.user import User
+from app.logger import logger
+from app.services.payment_status_service import utc_now
+from app.services.principal_cache import PolledRows, principals_changed
+
+TOKEN_REVOCATION_POLL_SECONDS = float(os.getenv("TOKEN_REVOCATION_POLL_SECONDS", "2"))
+# Reactivations only have to reach workers that are already running; a
+# worker that starts later loads the current deactivations instead.
+TOKEN_REVOCATION_REACTIVATION_RETENTION_SECONDS = int(os.getenv("TOKEN_REVOCATION_REACTIVATION_RETENTION_SECONDS", "3600"))
+
+
+class RevocationList:
+    # In-process copy of token_revocations: revoked token ids with their
+    # expiry, and deactivated user ids. Access tokens live minutes, so the
+    # token set only ever holds tokens revoked within that window and a
+    # check is a set lookup. Rows are applied in id order, first all of
+    # them and then those not seen before.
+    def __init__(self):
+        self.rows = PolledRows()
+        self._tokens: Dict[str, datetime] = {}
+        self._users: Set[int] = set()
+
+    def is_revoked(self, jti: Optional[str], user_id: int) -> bool:
+        return user_id in self._users or (jti is not None and jti in self._tokens)
+
+    def apply(self, kind: str, jti: Optional[str], user_id: int, expires_at: Optional[datetime]):
+        if kind == "token":
+            self._tokens[jti] = expires_at
+        elif kind == "deactivate":
+            self._users.add(user_id)
+        elif kind == "reactivate":
+            self._users.discard(user_id)
+
+    def prune(self, now: datetime):
+        expired = [jti for jti, expires_at in self._tokens.items() if expires_at <= now]
+        for jti in expired:
+            del self._tokens[jti]
+
+    async def refresh(self, db: AsyncSession) -> int:
+        stmt = select(
+            TokenRevocation.id, TokenRevocation.kind, TokenRevocation.jti, TokenRevocation.user_id,
+            TokenRevocation.expires_at, TokenRevocation.created_at
+        ).order_by(TokenRevocation.id)
+        if self.rows.last_id is not None:
+            stmt = stmt.where(self.rows.condition(TokenRevocation))
+        rows = self.rows.unseen((await db.execute(stmt)).all())
+        for row in rows:
+            self.apply(row.kind, row.jti, row.user_id, row.expires_at)
+        if self.rows.last_id is None:
+            self.rows.last_id = 0
+        self.prune(utc_now())
+        return len(rows)
+
+
+revocation_list = RevocationList()
+
+
+async def revoke_access_token(db: AsyncSession, jti: str, user_id: int, expires_at: datetime):
+    db.add(TokenRevocation(kind="token", jti=jti, user_id=user_id, expires_at=expires_at))
+    await db.commit()
+    # Other workers pick the row up on their next poll.
+    revocation_list.apply("token", jti, user_id, expires_at)
+
+
+async def deactivate_user(db: AsyncSession, user: User):
+    # Bumping the token version keeps tokens issued before the deactivation
+    # dead even if the user is reactivated before they expire.
+    user.is_active = False
+    user.token_version = (user.token_version or 0) + 1
+    db.add(TokenRevocation(kind="deactivate", user_id=user.id))
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == user.id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=utc_now())
+    )
+    await db.commit()
+    revocation_list.apply("deactivate", None, user.id, None)
+    await principals_changed(user.id)
+
+
+async def reactivate_user(db: AsyncSession, user: User):
+    user.is_active = True
+    await db.execute(
+        delete(TokenRevocation).where(TokenRevocation.user_id == user.id, TokenRevocation.kind == "deactivate")
+    )
+    expires_at = utc_now() + timedelta(seconds=TOKEN_REVOCATION_REACTIVATION_RETENTION_SECONDS)
+    db.add(TokenRevocation(kind="reactivate", user_id=user.id, expires_at=expires_at))
+    await db.commit()
+    revocation_list.apply("reactivate", None, user.id, expires_at)
+    await principals_changed(user.id)
+
+
+async def purge_token_revocations(db: AsyncSession) -> int:
+    result = await db.execute(delete(TokenRevocation).where(TokenRevocation.expires_at <= utc_now()))
+    await db.commit()
+    return result.rowcount
+
+
+async def poll_token_revocations() -> int:
+    async with SessionLocal() as db:
+        applied = await revocation_list.refresh(db)
+        purged = await purge_token_revocations(db)
+    if purged:
+        logger.info(f"Purged {purged} expired token revocations")
+    return applied
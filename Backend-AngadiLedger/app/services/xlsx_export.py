@@ -0,0 +1,163 @@
+import math
+import os
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import AsyncIterator, List, Sequence
+from xml.sax.saxutils import escape
+from fastapi.responses import StreamingResponse
+from app.services.statement_services import ChunkSink
+
+XLSX_ROWS_PER_CHUNK = int(os.getenv("XLSX_ROWS_PER_CHUNK", "1000"))
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Cell styles defined in _STYLES below.
+_STYLE_MONEY = 1
+_STYLE_DATE = 2
+_STYLE_DATETIME = 3
+_STYLE_HEADER = 4
+_MONEY_COLUMNS = {"amount", "balance", "debit", "credit", "outstanding_balance", "allocation_amount"}
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+_EXCEL_EPOCH_DATE = _EXCEL_EPOCH.date()
+# XML 1.0 forbids these control characters; Excel rejects files containing them.
+_ILLEGAL_CHARACTERS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_SHEET_NAME_CHARACTERS = re.compile(r"[\[\]:*?/\\]")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="3"><numFmt numFmtId="164" formatCode="#,##0.00"/>'
+    '<numFmt numFmtId="165" formatCode="yyyy-mm-dd"/><numFmt numFmtId="166" formatCode="yyyy-mm-dd hh:mm"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="5"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="166" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+    '</sheetView></sheetViews><sheetData>'
+)
+_SHEET_END = '</sheetData></worksheet>'
+
+
+def _text_cell(value: str, style: int = 0) -> str:
+    if _ILLEGAL_CHARACTERS.search(value):
+        value = _ILLEGAL_CHARACTERS.sub("", value)
+    style_attr = f' s="{style}"' if style else ""
+    return f'<c t="inlineStr"{style_attr}><is><t xml:space="preserve">{escape(value)}</t></is></c>'
+
+
+def _cell(value, is_money: bool) -> str:
+    if value is None or value == "":
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        if isinstance(value, float) and not math.isfinite(value):
+            return _text_cell(str(value))
+        number = format(value, "f") if isinstance(value, Decimal) else repr(value)
+        return f'<c s="{_STYLE_MONEY}"><v>{number}</v></c>' if is_money else f"<c><v>{number}</v></c>"
+    if isinstance(value, datetime):
+        serial = (value.replace(tzinfo=None) - _EXCEL_EPOCH).total_seconds() / 86400
+        return f'<c s="{_STYLE_DATETIME}"><v>{serial!r}</v></c>'
+    if isinstance(value, date):
+        return f'<c s="{_STYLE_DATE}"><v>{(value - _EXCEL_EPOCH_DATE).days}</v></c>'
+    return _text_cell(str(value))
+
+
+def _sheet_name(title: str) -> str:
+    return escape(_SHEET_NAME_CHARACTERS.sub("", title)[:31] or "Sheet1", {'"': "&quot;"})
+
+
+def _rows_xml(rows: Sequence[dict], columns: Sequence[str], money: Sequence[bool]) -> bytes:
+    parts = []
+    for row in rows:
+        parts.append("<row>")
+        parts.extend(_cell(row.get(name), is_money) for name, is_money in zip(columns, money))
+        parts.append("</row>")
+    return "".join(parts).encode("utf-8")
+
+
+async def stream_xlsx(rows: AsyncIterator[dict], sheet_title: str) -> AsyncIterator[bytes]:
+    # Writes a single-sheet workbook as rows arrive: cells are inline strings or
+    # native numbers/dates, so nothing is kept per row and the archive is sent
+    # as it is compressed. Column names come from the first row.
+    sink = ChunkSink()
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED)
+    archive.writestr("[Content_Types].xml", _CONTENT_TYPES)
+    archive.writestr("_rels/.rels", _ROOT_RELS)
+    archive.writestr("xl/workbook.xml", _WORKBOOK.format(name=_sheet_name(sheet_title)))
+    archive.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+    archive.writestr("xl/styles.xml", _STYLES)
+    yield sink.drain()
+
+    with archive.open("xl/worksheets/sheet1.xml", mode="w") as sheet:
+        sheet.write(_SHEET_START.encode("utf-8"))
+        columns = None
+        money: List[bool] = []
+        batch: List[dict] = []
+        async for row in rows:
+            if columns is None:
+                columns = list(row.keys())
+                money = [name in _MONEY_COLUMNS for name in columns]
+                header = "".join(_text_cell(name, _STYLE_HEADER) for name in columns)
+                sheet.write(f"<row>{header}</row>".encode("utf-8"))
+            batch.append(row)
+            if len(batch) >= XLSX_ROWS_PER_CHUNK:
+                sheet.write(_rows_xml(batch, columns, money))
+                batch = []
+                data = sink.drain()
+                if data:
+                    yield data
+        if batch:
+            sheet.write(_rows_xml(batch, columns, money))
+        sheet.write(_SHEET_END.encode("utf-8"))
+    archive.close()
+    yield sink.drain()
+
+
+def xlsx_streaming_response(rows: AsyncIterator[dict], sheet_title: str, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream_xlsx(rows, sheet_title),
+        media_type=XLSX_MEDIA_TYPE,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
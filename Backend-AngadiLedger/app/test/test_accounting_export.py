@@ -0,0 +1,120 @@
+import csv
+import io
+import pytest
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from datetime import date, datetime
+from decimal import Decimal
+
+from app.db.models.business import Business
+from app.db.models.customer import Customer
+from app.db.models.ledger_entry import LedgerEntry
+from app.db.models.payment import Payment
+from app.db.models.user import User
+from app.services import accounting_export
+from app.services.accounting_export import _voucher_from_row, journal_rows, party_ledger_name, stream_journal_csv, stream_tally_xml
+
+VoucherRow = namedtuple("VoucherRow", "source source_id entry_type voucher_at amount description customer_id customer_name")
+
+async def iter_rows(rows):
+    for row in rows:
+        yield row
+
+def vouchers(rows):
+    return iter_rows([_voucher_from_row(row) for row in rows])
+
+ROWS = [
+    VoucherRow("ledger", 1, "credit", datetime(2024, 4, 1, 9, 0), Decimal("100.5"), "Rice <5kg> & oil\x01", 7, "Ravi & Sons"),
+    VoucherRow("ledger", 2, "debit", datetime(2024, 4, 2, 9, 0), Decimal("40"), None, 7, "Ravi & Sons"),
+    VoucherRow("payment", 3, "payment", datetime(2024, 4, 3, 9, 0), Decimal("60.00"), None, 8, "Meena"),
+]
+
+class TestVoucherMapping:
+    """Test mapping ledger entries and payments to vouchers."""
+
+    @pytest.mark.unit
+    def test_credit_is_sales_voucher(self):
+        """Test a ledger credit, a sale on account, debits the customer and credits sales."""
+        voucher = _voucher_from_row(ROWS[0])
+
+        assert voucher["voucher_type"] == "Sales"
+        assert voucher["voucher_number"] == "LE-1"
+        assert voucher["debit_account"] == party_ledger_name(7, "Ravi & Sons")
+        assert voucher["credit_account"] == accounting_export.TALLY_SALES_LEDGER
+        assert voucher["amount"] == Decimal("100.50")
+
+    @pytest.mark.unit
+    def test_debits_and_payments_are_receipts(self):
+        """Test ledger debits, payments received, and paid payments credit the customer."""
+        debit = _voucher_from_row(ROWS[1])
+        payment = _voucher_from_row(ROWS[2])
+
+        assert debit["voucher_type"] == payment["voucher_type"] == "Receipt"
+        assert debit["debit_account"] == accounting_export.TALLY_CASH_LEDGER
+        assert debit["credit_account"] == "Ravi & Sons [7]"
+        assert payment["credit_account"] == "Meena [8]"
+        assert payment["voucher_number"] == "PAY-3"
+
+    @pytest.mark.unit
+    def test_payment_backed_debits_are_not_booked_twice(self):
+        """Test debits allocated to a paid payment are left to the payment's voucher."""
+        with_payments = str(accounting_export._vouchers_stmt(1, None, date(2024, 4, 30), True))
+        without_payments = str(accounting_export._vouchers_stmt(1, None, date(2024, 4, 30), False))
+
+        assert "payment_ledger_entry" in with_payments and "NOT (EXISTS" in with_payments
+        assert "payment_ledger_entry" not in without_payments
+
+class TestTallyXml:
+    """Test the streamed Tally import file."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_vouchers_parse_and_balance(self):
+        """Test the file parses and each voucher has a negative debit line."""
+        body = b"".join([chunk async for chunk in stream_tally_xml(vouchers(ROWS), "Angadi & Co")])
+        root = ET.fromstring(body)
+
+        assert root.findtext("HEADER/TALLYREQUEST") == "Import Data"
+        assert root.findtext(".//SVCURRENTCOMPANY") == "Angadi & Co"
+        found = root.findall(".//VOUCHER")
+        assert [voucher.get("VCHTYPE") for voucher in found] == ["Sales", "Receipt", "Receipt"]
+        assert found[0].findtext("NARRATION") == "Rice <5kg> & oil"
+        assert found[0].findtext("DATE") == "20240401"
+        lines = found[0].findall("ALLLEDGERENTRIES.LIST")
+        assert [line.findtext("LEDGERNAME") for line in lines] == ["Ravi & Sons [7]", "Sales"]
+        assert [line.findtext("ISDEEMEDPOSITIVE") for line in lines] == ["Yes", "No"]
+        assert [line.findtext("AMOUNT") for line in lines] == ["-100.50", "100.50"]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_streams_in_chunks(self, monkeypatch):
+        """Test vouchers are sent in chunks rather than as one document."""
+        monkeypatch.setattr(accounting_export, "ACCOUNTING_VOUCHERS_PER_CHUNK", 1)
+
+        chunks = [chunk async for chunk in stream_tally_xml(vouchers(ROWS), "Shop")]
+
+        assert len(chunks) == 4
+        assert len(ET.fromstring(b"".join(chunks)).findall(".//VOUCHER")) == 3
+
+class TestJournalCsv:
+    """Test the generic double-entry journal."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_two_lines_per_voucher(self):
+        """Test every voucher becomes one debit and one credit line."""
+        rows = [row async for row in journal_rows(vouchers(ROWS))]
+
+        assert len(rows) == 6
+        assert sum(row["debit"] for row in rows if row["debit"] != "") == sum(row["credit"] for row in rows if row["credit"] != "")
+        assert rows[0]["account"] == "Ravi & Sons [7]" and rows[1]["account"] == "Sales"
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_csv_header(self):
+        """Test the CSV starts with the journal columns."""
+        body = b"".join([chunk async for chunk in stream_journal_csv(vouchers(ROWS))]).decode("utf-8")
+        records = list(csv.DictReader(io.StringIO(body)))
+
+        assert list(records[0]) == accounting_export.JOURNAL_FIELDS
+        assert records[4]["voucher_number"] == "PAY-3"
@@ -0,0 +1,163 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+from fastapi import HTTPException
+
+from app.db.models.api_key import ApiKey
+from app.db.models.business import Business
+from app.db.models.customer import Customer
+from app.db.models.ledger_entry import LedgerEntry
+from app.db.models.payment import Payment
+from app.services import api_keys, auth, principal_cache as cache_module
+from app.services.api_keys import api_key_prefix, hash_api_key, issue_api_key, resolve_api_key, revoke_api_key
+from app.services.auth import cashier_or_owner_required, get_current_user, owner_required, supervisor_or_owner_required, user_required
+from app.services.payment_status_service import utc_now
+from app.services.principal_cache import Principal, PrincipalCache, PrincipalNotifier
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    """Replace the process-wide principal cache and notifier."""
+    cache = PrincipalCache(ttl_seconds=60, max_size=10)
+    monkeypatch.setattr(cache_module, "principal_cache", cache)
+    monkeypatch.setattr(cache_module, "principal_notifier", PrincipalNotifier())
+    monkeypatch.setattr(api_keys, "principal_cache", cache)
+    monkeypatch.setattr(auth, "principal_cache", cache)
+    return cache
+
+def stored_key(key, scopes="ledger:write", **overrides):
+    values = dict(
+        id=3, business_id=10, created_by_id=1, prefix=api_key_prefix(key), key_hash=hash_api_key(key),
+        scopes=scopes, revoked_at=None
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+def mock_db(row):
+    db = Mock()
+    db.commit = AsyncMock()
+    db.execute = AsyncMock(side_effect=[Mock(first=Mock(return_value=row)), Mock()])
+    return db
+
+def key_principal(*scopes):
+    return Principal(1, "api_key:abc", "api_key", 10, None, True, 0, scopes)
+
+class TestIssueApiKey:
+    """Test minting API keys."""
+
+    @pytest.mark.unit
+    def test_only_the_hash_is_stored(self):
+        """Test the row holds the prefix and a SHA-256 of the key, never the key."""
+        db = Mock()
+
+        api_key, key = issue_api_key(db, 10, 1, "Counter 1", ["ledger:write", "ledger:read"])
+
+        assert isinstance(api_key, ApiKey)
+        assert db.add.call_args.args[0] is api_key
+        assert key.startswith(f"al_{api_key.prefix}_")
+        assert api_key.key_hash == hash_api_key(key)
+        assert key not in (api_key.key_hash, api_key.prefix)
+        assert api_key.scopes == "ledger:read ledger:write"
+
+    @pytest.mark.unit
+    def test_malformed_keys_have_no_prefix(self):
+        """Test keys without the al_<prefix>_<secret> shape are rejected."""
+        assert api_key_prefix("al_abc_secret_with_underscores") == "abc"
+        assert api_key_prefix("al_abc") is None
+        assert api_key_prefix("xx_abc_secret") is None
+
+class TestResolveApiKey:
+    """Test resolving keys to principals."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_second_use_is_served_from_cache(self, fresh_cache):
+        """Test a checked key resolves without a query until it is invalidated."""
+        key = "al_abc_secret"
+        db = mock_db(SimpleNamespace(ApiKey=stored_key(key), is_active=True))
+
+        first = await resolve_api_key(db, key)
+        second = await resolve_api_key(db, key)
+
+        assert first == second
+        assert (first.id, first.role, first.business_id, first.scopes) == (1, "api_key", 10, ("ledger:write",))
+        assert db.execute.await_count == 2
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_wrong_secret_is_rejected(self, fresh_cache):
+        """Test a key whose prefix matches but whose secret differs is a 401."""
+        db = mock_db(SimpleNamespace(ApiKey=stored_key("al_abc_secret"), is_active=True))
+
+        with pytest.raises(HTTPException) as exc:
+            await resolve_api_key(db, "al_abc_guess")
+
+        assert exc.value.status_code == 401
+        assert len(fresh_cache) == 0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_revoked_key_is_rejected(self, fresh_cache):
+        """Test a revoked key is a 401 once its cache entry is dropped."""
+        key = "al_abc_secret"
+        row = SimpleNamespace(ApiKey=stored_key(key), is_active=True)
+        await resolve_api_key(mock_db(row), key)
+        api_key = SimpleNamespace(revoked_at=None, created_by_id=1)
+
+        await revoke_api_key(Mock(commit=AsyncMock()), api_key)
+        row.ApiKey.revoked_at = api_key.revoked_at
+        with pytest.raises(HTTPException) as exc:
+            await resolve_api_key(mock_db(row), key)
+
+        assert exc.value.detail == "API key has been revoked"
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_bearer_and_header_keys_are_accepted(self, fresh_cache):
+        """Test get_current_user takes a key as X-API-Key or as the bearer token."""
+        key = "al_abc_secret"
+        db = mock_db(SimpleNamespace(ApiKey=stored_key(key), is_active=True))
+
+        from_header = await get_current_user(None, db, key)
+        from_bearer = await get_current_user(SimpleNamespace(credentials=key), db, None)
+
+        assert from_header == from_bearer
+        with pytest.raises(HTTPException) as exc:
+            await get_current_user(None, db, None)
+        assert exc.value.status_code == 401
+
+class TestApiKeyScopes:
+    """Test keys against the role dependencies."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_read_scope_allows_only_safe_methods(self):
+        """Test ledger:read passes cashier checks for GET but not for POST."""
+        reader = key_principal("ledger:read")
+
+        assert await cashier_or_owner_required(reader, SimpleNamespace(method="GET")) is reader
+        with pytest.raises(HTTPException):
+            await cashier_or_owner_required(reader, SimpleNamespace(method="POST"))
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_scopes_map_onto_roles(self):
+        """Test write keys act as cashiers, analytics keys as supervisors and none as owners."""
+        writer = key_principal("ledger:write")
+        analyst = key_principal("analytics:read")
+
+        assert await cashier_or_owner_required(writer, SimpleNamespace(method="POST")) is writer
+        assert await supervisor_or_owner_required(analyst, SimpleNamespace(method="GET")) is analyst
+        with pytest.raises(HTTPException):
+            await supervisor_or_owner_required(writer, SimpleNamespace(method="GET"))
+        with pytest.raises(HTTPException):
+            owner_required(writer)
+
+    @pytest.mark.unit
+    def test_keys_are_not_users(self):
+        """Test user endpoints such as the profile and logout refuse keys but accept people."""
+        owner = Principal(1, "owner@example.com", "owner", 10, None, True)
+
+        assert user_required(owner) is owner
+        with pytest.raises(HTTPException) as exc:
+            user_required(key_principal("ledger:write"))
+        assert exc.value.status_code == 403
@@ -0,0 +1,125 @@
+import gzip
+import zlib
+import pytest
+
+from app import compression
+from app.compression import CompressionMiddleware, negotiate_encoding
+
+def make_app(chunks, content_type=b"text/csv", status=200, extra_headers=()):
+    async def app(scope, receive, send):
+        headers = [(b"content-type", content_type), *extra_headers]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        for index, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": index < len(chunks) - 1})
+    return app
+
+async def call(app, accept_encoding="gzip", **options):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    await CompressionMiddleware(app, **options)(scope, None, send)
+    headers = dict(messages[0]["headers"])
+    bodies = [message["body"] for message in messages[1:]]
+    return messages[0]["status"], headers, bodies
+
+class TestNegotiateEncoding:
+    """Test Accept-Encoding negotiation."""
+
+    @pytest.mark.unit
+    def test_quality_values(self, monkeypatch):
+        """Test the highest q-value wins and q=0 disables a coding."""
+        monkeypatch.setattr(compression, "_supported_encodings", lambda: ["zstd", "gzip"])
+
+        assert negotiate_encoding("gzip, zstd") == "zstd"
+        assert negotiate_encoding("gzip;q=0.8, zstd;q=0.5") == "gzip"
+        assert negotiate_encoding("zstd;q=0, gzip") == "gzip"
+        assert negotiate_encoding("*;q=0.1") == "zstd"
+        assert negotiate_encoding("br") is None
+        assert negotiate_encoding("") is None
+
+    @pytest.mark.unit
+    def test_zstd_needs_zstandard(self, monkeypatch):
+        """Test zstd is not offered when zstandard is missing."""
+        monkeypatch.setattr(compression, "zstandard", None)
+
+        assert negotiate_encoding("zstd, gzip;q=0.1") == "gzip"
+        assert negotiate_encoding("zstd") is None
+
+class TestCompressionMiddleware:
+    """Test streaming response compression."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_streams_one_compressed_chunk_per_chunk(self):
+        """Test every body chunk is flushed so streamed exports stay streamed."""
+        chunks = [f"{i},row {i}\n".encode() * 200 for i in range(5)]
+
+        status, headers, bodies = await call(make_app(chunks), minimum_size=100)
+
+        assert headers[b"content-encoding"] == b"gzip"
+        assert headers[b"vary"] == b"Accept-Encoding"
+        assert b"content-length" not in headers
+        assert len(bodies) == 5
+        decompressor = zlib.decompressobj(31)
+        assert decompressor.decompress(bodies[0]) == chunks[0]
+        assert gzip.decompress(b"".join(bodies)) == b"".join(chunks)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_small_response_is_not_compressed(self):
+        """Test bodies under the minimum size are sent unchanged."""
+        status, headers, bodies = await call(make_app([b"id\n", b"1\n"]), minimum_size=100)
+
+        assert b"content-encoding" not in headers
+        assert headers[b"vary"] == b"Accept-Encoding"
+        assert bodies == [b"id\n1\n"]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_single_body_gets_content_length_and_weak_etag(self):
+        """Test a complete body gets its compressed length and a weak ETag."""
+        body = b'{"name": "Rice"}' * 100
+        app = make_app([body], b"application/json", extra_headers=[(b"content-length", b"1600"), (b"etag", b'"abc"')])
+
+        status, headers, bodies = await call(app, minimum_size=100)
+
+        assert headers[b"content-length"] == str(len(bodies[0])).encode()
+        assert headers[b"etag"] == b'W/"abc"'
+        assert gzip.decompress(bodies[0]) == body
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_binary_and_not_modified_pass_through(self):
+        """Test PDFs and 304 responses are never re-encoded."""
+        _, pdf_headers, pdf_bodies = await call(make_app([b"%PDF" * 1000], b"application/pdf"), minimum_size=100)
+        _, etag_headers, _ = await call(make_app([b""], status=304), minimum_size=100)
+
+        assert b"content-encoding" not in pdf_headers
+        assert pdf_bodies == [b"%PDF" * 1000]
+        assert b"content-encoding" not in etag_headers
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_range_capable_files_pass_through(self):
+        """Test file responses that accept byte ranges stay resumable."""
+        app = make_app([b"id,amount\n" * 500], extra_headers=[(b"accept-ranges", b"bytes")])
+
+        _, headers, bodies = await call(app, minimum_size=100)
+
+        assert b"content-encoding" not in headers
+        assert bodies == [b"id,amount\n" * 500]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_zstd(self):
+        """Test zstd output decodes back to the original stream."""
+        zstandard = pytest.importorskip("zstandard")
+        chunks = [b"date,amount\n" * 500, b"2024-01-01,10.00\n" * 500]
+
+        _, headers, bodies = await call(make_app(chunks), accept_encoding="zstd", minimum_size=100)
+
+        assert headers[b"content-encoding"] == b"zstd"
+        assert zstandard.ZstdDecompressor().decompressobj().decompress(b"".join(bodies)) == b"".join(chunks)
@@ -0,0 +1,183 @@
+import asyncio
+import pytest
+from datetime import timedelta
+from unittest.mock import AsyncMock, Mock, patch
+
+from fastapi import HTTPException
+
+from app.db.models.business import Business
+from app.db.models.customer import Customer
+from app.db.models.export_job import ExportJob
+from app.db.models.ledger_entry import LedgerEntry
+from app.db.models.payment import Payment
+from app.db.models.user import User
+from app.services import export_job_service
+from app.services.export_job_service import (
+    ExportProgress,
+    ExportWorker,
+    _claim_job_stmt,
+    artifact_filename,
+    artifact_media_type,
+    estimate_progress,
+    validate_export_request,
+)
+from app.services.payment_status_service import utc_now
+
+def make_job(**values):
+    fields = {"id": 5, "business_id": 2, "kind": "ledger_entries", "format": "csv", "status": "running", "started_at": utc_now()}
+    fields.update(values)
+    return ExportJob(**fields)
+
+class FakeSession:
+    """Async context manager standing in for SessionLocal()."""
+    def __init__(self, db):
+        self.db = db
+
+    async def __aenter__(self):
+        return self.db
+
+    async def __aexit__(self, *exc):
+        return False
+
+class TestExportRequests:
+    """Test which export kinds and formats can be requested."""
+
+    @pytest.mark.unit
+    def test_unsupported_format_is_rejected(self):
+        """Test a format a kind cannot produce is a 400."""
+        with pytest.raises(HTTPException) as exc:
+            validate_export_request("payments", "csv")
+
+        assert exc.value.status_code == 400
+        assert "arrow, parquet" in exc.value.detail
+
+    @pytest.mark.unit
+    def test_columnar_needs_pyarrow(self):
+        """Test Parquet jobs are refused up front when pyarrow is missing."""
+        with patch("app.services.export_job_service.arrow_export_available", return_value=False):
+            with pytest.raises(HTTPException) as exc:
+                validate_export_request("ledger_entries", "parquet")
+
+        assert exc.value.status_code == 501
+        validate_export_request("ledger_entries", "xlsx")
+
+    @pytest.mark.unit
+    def test_artifact_names_and_types(self):
+        """Test bundles are ZIPs and other artifacts keep their format."""
+        bundle = make_job(kind="statement_bundle", format="html")
+        parquet = make_job(format="parquet")
+
+        assert artifact_filename(bundle) == "statement_bundle_business_2_5.zip"
+        assert artifact_media_type(bundle) == "application/zip"
+        assert artifact_filename(parquet) == "ledger_entries_business_2_5.parquet"
+        assert artifact_media_type(make_job()) == "text/csv"
+
+class TestExportProgress:
+    """Test progress and ETA reporting."""
+
+    @pytest.mark.unit
+    def test_eta_from_average_rate(self):
+        """Test the ETA extrapolates the rate observed so far."""
+        job = make_job(started_at=utc_now() - timedelta(seconds=10))
+
+        progress, eta = estimate_progress(job, 250, 1000)
+
+        assert progress == 0.25
+        assert 29 <= eta <= 31
+
+    @pytest.mark.unit
+    def test_no_eta_before_first_rows(self):
+        """Test no ETA is guessed before any rows are written."""
+        assert estimate_progress(make_job(), 0, 1000) == (0.0, None)
+        assert estimate_progress(make_job(status="queued", started_at=None), 0, None) == (None, None)
+        assert estimate_progress(make_job(status="completed"), 10, 10) == (1.0, 0.0)
+
+    @pytest.mark.unit
+    def test_progress_counter(self):
+        """Test the live counter accumulates rows from the writers."""
+        progress = ExportProgress(total_rows=10)
+        progress.add(4)
+        progress.add(1)
+
+        assert progress.rows == 5
+
+class TestExportWorker:
+    """Test claiming jobs and shutting the worker down."""
+
+    @pytest.mark.unit
+    def test_claim_counts_running_jobs_of_the_business(self):
+        """Test a job is claimed only while its business is under the cap, in the same UPDATE."""
+        stmt = str(_claim_job_stmt(5, 2))
+
+        assert stmt.startswith("UPDATE export_jobs SET status=")
+        assert "export_jobs_1.business_id = export_jobs.business_id" in stmt
+        assert "export_jobs_1.status = " in stmt
+        assert "export_jobs.status = " in stmt
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_shutdown_does_not_start_more_jobs(self):
+        """Test cancelled jobs and later wake-ups start no new dispatch once shutdown begins."""
+        worker = ExportWorker()
+        started = asyncio.Event()
+
+        async def running():
+            started.set()
+            await asyncio.Event().wait()
+
+        worker._tasks[1] = asyncio.create_task(running())
+        await started.wait()
+
+        await worker.shutdown()
+        worker.wake()
+
+        assert worker._dispatching is None
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_worker_writes_only_running_jobs(self, monkeypatch):
+        """Test the worker's updates skip a job the stale sweep already failed."""
+        db = Mock(execute=AsyncMock(return_value=Mock(rowcount=0)), commit=AsyncMock())
+        monkeypatch.setattr(export_job_service, "SessionLocal", lambda: FakeSession(db))
+
+        assert await ExportWorker()._save(5, status="completed") is False
+
+        stmt = str(db.execute.await_args.args[0])
+        assert "export_jobs.id = " in stmt and "export_jobs.status = " in stmt
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_heartbeat_runs_without_output(self, monkeypatch):
+        """Test a running job touches its row on a timer, whether or not chunks are written."""
+        monkeypatch.setattr(export_job_service, "EXPORT_HEARTBEAT_SECONDS", 0.01)
+        worker = ExportWorker()
+        worker._save = AsyncMock(return_value=True)
+
+        heartbeat = asyncio.create_task(worker._heartbeat(5))
+        await asyncio.sleep(0.05)
+        heartbeat.cancel()
+
+        assert worker._save.await_count >= 2
+        worker._save.assert_awaited_with(5)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_job_failed_meanwhile_is_not_completed(self, monkeypatch, tmp_path):
+        """Test a job the sweep failed keeps its status and its artifact is discarded."""
+        async def chunks(*args):
+            yield b"id\r\n"
+
+        db = Mock(get=AsyncMock(return_value=make_job()))
+        monkeypatch.setattr(export_job_service, "SessionLocal", lambda: FakeSession(db))
+        monkeypatch.setattr(export_job_service, "EXPORT_DIR", str(tmp_path))
+        monkeypatch.setattr(export_job_service, "_count_rows", AsyncMock(return_value=1))
+        monkeypatch.setattr(export_job_service, "_artifact_chunks", chunks)
+        worker = ExportWorker()
+        worker._closing = True
+        worker._save = AsyncMock(side_effect=lambda job_id, **values: values.get("status") != "completed")
+        worker.progress[5] = ExportProgress()
+
+        await worker._run(5)
+
+        assert [call.kwargs.get("status") for call in worker._save.await_args_list] == [None, "completed"]
+        assert list(tmp_path.iterdir()) == []
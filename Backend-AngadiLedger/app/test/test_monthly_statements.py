@@ -0,0 +1,115 @@
+import os
+import pytest
+from datetime import date, datetime
+
+from starlette.requests import Request
+
+from app.services import monthly_statement_service
+from app.services.monthly_statement_service import (
+    _store,
+    cached_file_response,
+    cached_statement,
+    closed_month_for_period,
+    invalidate_monthly_statements,
+    last_closed_month,
+)
+
+@pytest.fixture
+def statement_dir(tmp_path, monkeypatch):
+    """Point the monthly statement cache at a temporary directory."""
+    monkeypatch.setattr(monthly_statement_service, "MONTHLY_STATEMENT_DIR", str(tmp_path))
+    return tmp_path
+
+def store(customer_id, key, fmt, content):
+    directory = os.path.join(monthly_statement_service.MONTHLY_STATEMENT_DIR, f"customer_{customer_id}")
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, ".upload.tmp")
+    with open(tmp_path, "w") as handle:
+        handle.write(content)
+    return _store(customer_id, key, fmt, tmp_path)
+
+def make_request(headers=None):
+    raw = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+class TestClosedMonths:
+    """Test which periods count as closed calendar months."""
+
+    @pytest.mark.unit
+    def test_last_closed_month_wraps_year(self):
+        """Test January's last closed month is December of the previous year."""
+        assert last_closed_month(datetime(2025, 1, 15)) == (2024, 12)
+        assert last_closed_month(datetime(2025, 7, 1)) == (2025, 6)
+
+    @pytest.mark.unit
+    def test_closed_month_for_period(self):
+        """Test only whole, closed calendar months map to the cache."""
+        assert closed_month_for_period(date(2024, 2, 1), date(2024, 2, 29)) == (2024, 2)
+        assert closed_month_for_period(date(2024, 2, 1), date(2024, 2, 28)) is None
+        assert closed_month_for_period(None, date(2024, 2, 29)) is None
+        assert closed_month_for_period(date(9998, 1, 1), date(9998, 1, 31)) is None
+
+class TestStatementCache:
+    """Test the content-addressed statement files."""
+
+    @pytest.mark.unit
+    def test_store_names_file_by_content_hash(self, statement_dir):
+        """Test identical content gets the same name and replaces older versions."""
+        path, digest = store(1, "2024-03", "csv", "a,b\n")
+        again, same = store(1, "2024-03", "csv", "a,b\n")
+        changed, other = store(1, "2024-03", "csv", "a,c\n")
+
+        assert (again, same) == (path, digest)
+        assert other != digest
+        assert cached_statement(1, "2024-03", "csv") == (changed, other)
+        assert os.listdir(statement_dir / "customer_1") == [os.path.basename(changed)]
+
+    @pytest.mark.unit
+    def test_invalidate_drops_month_and_later(self, statement_dir):
+        """Test a write drops its month and later months but keeps earlier ones."""
+        store(1, "2024-01", "csv", "jan")
+        store(1, "2024-02", "pdf", "feb")
+        store(1, "2024-03", "csv", "mar")
+        store(2, "2024-03", "csv", "other customer")
+
+        invalidate_monthly_statements(1, datetime(2024, 2, 10, 12, 0))
+
+        assert cached_statement(1, "2024-01", "csv") is not None
+        assert cached_statement(1, "2024-02", "pdf") is None
+        assert cached_statement(1, "2024-03", "csv") is None
+        assert cached_statement(2, "2024-03", "csv") is not None
+
+    @pytest.mark.unit
+    def test_invalidate_without_month_drops_everything(self, statement_dir):
+        """Test customer changes drop every cached month."""
+        store(1, "2024-01", "csv", "jan")
+
+        invalidate_monthly_statements(1)
+
+        assert cached_statement(1, "2024-01", "csv") is None
+
+class TestCachedFileResponse:
+    """Test conditional responses for cached statements."""
+
+    @pytest.mark.unit
+    def test_matching_etag_returns_304(self, statement_dir):
+        """Test If-None-Match with the current hash returns 304 without a body."""
+        path, digest = store(1, "2024-01", "csv", "jan")
+
+        response = cached_file_response(make_request({"If-None-Match": f'W/"x", "{digest}"'}), path, digest, "csv", "jan.csv")
+
+        assert response.status_code == 304
+        assert response.headers["etag"] == f'"{digest}"'
+        assert response.body == b""
+
+    @pytest.mark.unit
+    def test_stale_etag_returns_file(self, statement_dir):
+        """Test a different ETag gets the file with its length and hash."""
+        path, digest = store(1, "2024-01", "csv", "jan")
+
+        response = cached_file_response(make_request({"If-None-Match": '"old"'}), path, digest, "csv", "jan.csv")
+
+        assert response.status_code == 200
+        assert response.path == path
+        assert response.headers["etag"] == f'"{digest}"'
+        assert response.headers["content-length"] == "3"
@@ -0,0 +1,229 @@
+import asyncio
+import pytest
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+from fastapi import HTTPException
+from sqlalchemy.sql.dml import Delete, Update
+
+from app.db.models.business import Business
+from app.db.models.customer import Customer
+from app.db.models.ledger_entry import LedgerEntry
+from app.db.models.otp_code import OtpCode
+from app.db.models.payment import Payment
+from app.services import otp
+from app.services.otp import EmailOtpSink, LocalOtpSink, OtpMessage, hash_otp, issue_otp, purge_expired_otps, verify_otp_code
+from app.services.payment_status_service import utc_now
+
+USER = SimpleNamespace(id=1, email="new@example.com", phone_number="9999999999")
+
+def mock_db(current=None):
+    db = Mock()
+    db.add = Mock()
+    db.commit = AsyncMock()
+    db.flush = AsyncMock()
+    db.delete = AsyncMock()
+    db.execute = AsyncMock(return_value=Mock(scalars=Mock(return_value=Mock(first=Mock(return_value=current)))))
+    return db
+
+def guessing_db(current):
+    # Applies the attempt UPDATE and the consuming DELETE to the stored code.
+    db = mock_db(current)
+    state = {"deleted": False}
+
+    async def execute(stmt, *args):
+        if isinstance(stmt, Update):
+            allowed = not state["deleted"] and current.attempts < otp.OTP_MAX_ATTEMPTS
+            current.attempts += allowed
+            return Mock(rowcount=int(allowed))
+        if isinstance(stmt, Delete):
+            deleted, state["deleted"] = state["deleted"], True
+            return Mock(rowcount=0 if deleted else 1)
+        row = None if state["deleted"] else current
+        return Mock(scalars=Mock(return_value=Mock(first=Mock(return_value=row))))
+
+    db.execute = AsyncMock(side_effect=execute)
+    return db
+
+def stored_code(code="123456", **overrides):
+    values = dict(id=1, code_hash=hash_otp(code), attempts=0, created_at=utc_now() - timedelta(minutes=5), expires_at=utc_now() + timedelta(minutes=5))
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+@pytest.fixture
+def sink(monkeypatch):
+    """Collect sent codes instead of delivering them."""
+    sink = LocalOtpSink()
+    monkeypatch.setattr(otp, "otp_sink", sink)
+    return sink
+
+class TestIssueOtp:
+    """Test creating and sending codes."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_code_is_sent_and_stored_hashed(self, sink):
+        """Test the sink gets the code and the table only its keyed hash."""
+        db = mock_db()
+
+        code = await issue_otp(db, USER)
+        stored = db.add.call_args.args[0]
+
+        assert len(code) == 6 and code.isdigit()
+        assert isinstance(stored, OtpCode)
+        assert stored.code_hash == hash_otp(code) != code
+        assert stored.expires_at - stored.created_at == timedelta(minutes=otp.OTP_EXPIRE_MINUTES)
+        assert sink.last_code("new@example.com") == code
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_resend_cooldown(self, sink):
+        """Test a second code inside the cooldown is refused with Retry-After."""
+        db = mock_db(stored_code(created_at=utc_now() - timedelta(seconds=10)))
+
+        with pytest.raises(HTTPException) as exc:
+            await issue_otp(db, USER)
+
+        assert exc.value.status_code == 429
+        assert 0 < int(exc.value.headers["Retry-After"]) <= otp.OTP_RESEND_COOLDOWN_SECONDS
+        assert sink.outbox == []
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_resend_replaces_old_code(self, sink):
+        """Test a code past the cooldown is replaced."""
+        old = stored_code()
+        db = mock_db(old)
+
+        await issue_otp(db, USER)
+
+        db.delete.assert_awaited_once_with(old)
+        db.add.assert_called_once()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_local_sink_does_not_log_codes(self, sink, caplog):
+        """Test the in-memory sink keeps the code but never writes it to the log."""
+        await sink.send(OtpMessage(1, "new@example.com", None, otp.VERIFY_ACCOUNT, "654321"))
+
+        assert sink.last_code("new@example.com") == "654321"
+        assert "654321" not in caplog.text
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_email_sink_mails_the_code(self, monkeypatch):
+        """Test the default sink sends the code to the user's address."""
+        send = AsyncMock()
+        monkeypatch.setattr(otp, "send_email", send)
+
+        await EmailOtpSink().send(OtpMessage(1, "new@example.com", None, otp.VERIFY_ACCOUNT, "654321"))
+
+        assert send.await_args.args[0] == "new@example.com"
+        assert "654321" in send.await_args.args[2]
+
+    @pytest.mark.unit
+    def test_default_sink_is_explicit(self, monkeypatch):
+        """Test the in-memory sink is opt-in and unknown sinks are refused."""
+        monkeypatch.setattr(otp, "OTP_SINK", "email")
+        assert isinstance(otp._default_sink(), EmailOtpSink)
+        monkeypatch.setattr(otp, "OTP_SINK", "local")
+        assert isinstance(otp._default_sink(), LocalOtpSink)
+        monkeypatch.setattr(otp, "OTP_SINK", "sms")
+        with pytest.raises(ValueError):
+            otp._default_sink()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_failed_delivery_is_logged_and_dropped(self, monkeypatch):
+        """Test a sink failure does not raise and removes the undelivered code so a resend is not held back."""
+        monkeypatch.setattr(otp, "otp_sink", Mock(send=AsyncMock(side_effect=ConnectionError("smtp down"))))
+        db = mock_db()
+
+        assert await issue_otp(db, USER) is None
+
+        assert "DELETE FROM otp_codes" in str(db.execute.await_args.args[0])
+        assert db.commit.await_count == 2
+
+class TestVerifyOtpCode:
+    """Test checking codes."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_right_code_is_consumed(self):
+        """Test a correct code is accepted once and deleted."""
+        db = guessing_db(stored_code())
+
+        assert await verify_otp_code(db, USER, "123456") is True
+        assert "DELETE FROM otp_codes" in str(db.execute.await_args_list[2].args[0])
+        with pytest.raises(HTTPException):
+            await verify_otp_code(db, USER, "123456")
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_wrong_codes_are_counted(self):
+        """Test wrong guesses count and lock the code after the limit."""
+        current = stored_code()
+        db = guessing_db(current)
+        for _ in range(otp.OTP_MAX_ATTEMPTS):
+            assert await verify_otp_code(db, USER, "000000") is False
+
+        with pytest.raises(HTTPException) as exc:
+            await verify_otp_code(db, USER, "123456")
+
+        assert current.attempts == otp.OTP_MAX_ATTEMPTS
+        assert exc.value.status_code == 400
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_attempts_are_counted_in_one_conditional_update(self):
+        """Test a guess is charged with a guarded UPDATE before the code is compared."""
+        db = guessing_db(stored_code())
+
+        await verify_otp_code(db, USER, "000000")
+
+        stmt = str(db.execute.await_args_list[1].args[0])
+        assert "UPDATE otp_codes SET attempts=(otp_codes.attempts + " in stmt
+        assert "otp_codes.attempts < " in stmt
+        db.commit.assert_awaited_once()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_concurrent_guesses_share_the_limit(self):
+        """Test guesses that all read the code before any is counted still stop at the limit."""
+        current = stored_code()
+        db = guessing_db(current)
+
+        results = await asyncio.gather(
+            *(verify_otp_code(db, USER, "000000") for _ in range(otp.OTP_MAX_ATTEMPTS + 3)), return_exceptions=True
+        )
+
+        assert results.count(False) == otp.OTP_MAX_ATTEMPTS
+        assert sum(isinstance(result, HTTPException) for result in results) == 3
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("current", [None, stored_code(expires_at=utc_now() - timedelta(seconds=1))])
+    async def test_missing_or_expired(self, current):
+        """Test expired and missing codes are rejected."""
+        with pytest.raises(HTTPException) as exc:
+            await verify_otp_code(mock_db(current), USER, "123456")
+
+        assert exc.value.detail == "OTP has expired or was not requested"
+
+class TestPurgeExpiredOtps:
+    """Test the batched sweeper."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_deletes_in_batches(self):
+        """Test expired rows are deleted a batch at a time until none are left."""
+        db = mock_db()
+        batches = [[1, 2], [3, 4], [5]]
+        db.execute = AsyncMock(side_effect=[
+            Mock(scalars=Mock(return_value=Mock(all=Mock(return_value=batches[0])))), Mock(),
+            Mock(scalars=Mock(return_value=Mock(all=Mock(return_value=batches[1])))), Mock(),
+            Mock(scalars=Mock(return_value=Mock(all=Mock(return_value=batches[2])))), Mock(),
+        ])
+
+        assert await purge_expired_otps(db, batch_size=2) == 5
+        assert db.commit.await_count == 3
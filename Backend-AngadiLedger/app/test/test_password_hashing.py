@@ -0,0 +1,63 @@
+import pytest
+import threading
+from fastapi import HTTPException
+
+from app.services.auth import PasswordHasher, password_context
+
+@pytest.fixture
+def hasher():
+    """Password hasher at the lowest bcrypt cost."""
+    hasher = PasswordHasher(2, 4, password_context(4))
+    yield hasher
+    hasher.shutdown()
+
+class TestPasswordHasher:
+    """Test bcrypt hashing on the password thread pool."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_hash_and_verify(self, hasher):
+        """Test a hash made at the configured cost verifies."""
+        hashed = await hasher.hash("secret")
+
+        assert hashed.startswith("$2b$04$")
+        assert await hasher.verify("secret", hashed) is True
+        assert await hasher.verify("wrong", hashed) is False
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_runs_off_the_event_loop(self, hasher, monkeypatch):
+        """Test bcrypt is called from a pool thread."""
+        threads = []
+        original = hasher.context.hash
+        monkeypatch.setattr(hasher.context, "hash", lambda password: threads.append(threading.current_thread().name) or original(password))
+
+        await hasher.hash("secret")
+
+        assert threads[0].startswith("password-hash")
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_rehash_when_cost_changes(self, hasher):
+        """Test a hash of another cost is replaced after a successful check."""
+        old_hash = password_context(5).hash("secret")
+
+        valid, new_hash = await hasher.verify_and_update("secret", old_hash)
+        current = await hasher.verify_and_update("secret", new_hash)
+
+        assert valid is True
+        assert new_hash.startswith("$2b$04$")
+        assert current == (True, None)
+        assert await hasher.verify_and_update("wrong", old_hash) == (False, None)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_busy_pool_returns_503(self):
+        """Test calls beyond max_pending are refused with Retry-After."""
+        hasher = PasswordHasher(1, 0, password_context(4))
+
+        with pytest.raises(HTTPException) as exc:
+            await hasher.hash("secret")
+
+        assert exc.value.status_code == 503
+        assert exc.value.headers["Retry-After"] == "1"
@@ -0,0 +1,120 @@
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock
+
+from fastapi import HTTPException
+
+from app.db.models.business import Business
+from app.db.models.customer import Customer
+from app.db.models.ledger_entry import LedgerEntry
+from app.db.models.user import User
+from app.services.payment_import_service import CustomerLookup, PaymentImporter, import_payments_csv, parse_payment_row
+
+NOW = datetime(2024, 3, 1, 12, 0)
+
+async def chunked(data: bytes, size: int):
+    for offset in range(0, len(data), size):
+        yield data[offset:offset + size]
+
+async def iter_rows(rows):
+    for row in rows:
+        yield row
+
+def lookup():
+    return CustomerLookup([(1, "+91 98450 00001"), (2, "9845000002"), (3, "9845000002")])
+
+class TestParsePaymentRow:
+    """Test validation of uploaded payment rows."""
+
+    @pytest.mark.unit
+    def test_resolves_customer_by_id_or_phone(self):
+        """Test rows resolve customers by id or by normalised phone."""
+        by_id, error = parse_payment_row({"customer_id": "1", "amount": "100"}, lookup(), NOW)
+        assert error is None
+        assert by_id["customer_id"] == 1
+        assert by_id["status"] == "paid"
+        assert by_id["paid_at"] == NOW
+
+        by_phone, error = parse_payment_row({"phone": "9845000001", "amount": "1,250.50"}, lookup(), NOW)
+        assert error is None
+        assert by_phone["customer_id"] == 1
+        assert by_phone["amount"] == Decimal("1250.50")
+
+    @pytest.mark.unit
+    def test_rejects_invalid_rows(self):
+        """Test unknown customers, shared phones and bad values are reported."""
+        cases = [
+            ({"customer_id": "9", "amount": "10"}, "Customer not found in this business"),
+            ({"phone": "9845000002", "amount": "10"}, "Phone matches several customers"),
+            ({"customer_id": "1", "amount": "-5"}, "Amount must be positive and fit 12 digits"),
+            ({"customer_id": "1", "amount": "abc"}, "Invalid amount"),
+            ({"customer_id": "1", "amount": "10", "status": "weird"}, "Unknown payment status: weird"),
+            ({"customer_id": "1", "amount": "10", "ledger_entry_id": "4", "allocation_amount": "20"},
+             "Allocation amount must be positive and at most the payment amount"),
+        ]
+        for row, expected in cases:
+            payment, error = parse_payment_row(row, lookup(), NOW)
+            assert payment is None
+            assert error == expected
+
+    @pytest.mark.unit
+    def test_pending_row_keeps_due_date(self):
+        """Test pending rows keep their due date and have no paid_at."""
+        payment, error = parse_payment_row(
+            {"customer_id": "1", "amount": "10", "status": "pending", "due_at": "2024-04-01"}, lookup(), NOW
+        )
+        assert error is None
+        assert payment["status"] == "pending"
+        assert payment["paid_at"] is None
+        assert payment["due_at"] == datetime(2024, 4, 1)
+
+class TestPaymentImporter:
+    """Test batched payment inserts."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_flush_rejects_foreign_ledger_entries(self):
+        """Test allocations to ledger entries of another customer are reported per row."""
+        db = AsyncMock()
+        owners = MagicMock()
+        owners.all.return_value = [(4, 2)]
+        db.execute.return_value = owners
+        importer = PaymentImporter(db, MagicMock(id=1, business_id=1), dry_run=True, batch_size=10)
+
+        payment, _ = parse_payment_row({"customer_id": "1", "amount": "10", "ledger_entry_id": "4"}, lookup(), NOW)
+        await importer.add(7, payment)
+        await importer.flush()
+
+        assert importer.imported == 0
+        assert importer.errors == [{"row": 7, "error": "Ledger entry not found for this customer"}]
+        db.commit.assert_not_called()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_flush_inserts_whole_batch_at_once(self):
+        """Test plain payments are written with one executemany per batch."""
+        db = AsyncMock()
+        importer = PaymentImporter(db, MagicMock(id=1, business_id=1), batch_size=2)
+
+        for row_number in range(1, 4):
+            payment, _ = parse_payment_row({"customer_id": "1", "amount": "10"}, lookup(), NOW)
+            await importer.add(row_number, payment)
+        await importer.flush()
+
+        assert importer.imported == 3
+        assert db.execute.await_count == 2
+        assert len(db.execute.await_args_list[0].args[1]) == 2
+        assert db.commit.await_count == 2
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_empty_upload(self):
+        """Test an upload without data rows is rejected."""
+        db = AsyncMock()
+        db.stream.return_value = MagicMock(__aiter__=lambda self: iter_rows([]))
+
+        with pytest.raises(HTTPException) as exc:
+            await import_payments_csv(chunked(b"customer_id,amount\r\n", 4), MagicMock(id=1, business_id=1), db)
+
+        assert exc.value.status_code == 400
@@ -0,0 +1,115 @@
+import pytest
+from unittest.mock import Mock, AsyncMock
+from fastapi import HTTPException
+from datetime import datetime, timedelta, timezone
+
+from app.db.models.payment import Payment
+from app.db.models.customer import Customer
+from app.db.models.ledger_entry import LedgerEntry
+from app.db.models.user import User
+from app.db.models.business import Business
+from app.services.payment_status_service import (
+    OverdueSweeper,
+    apply_status_transition,
+    initial_payment_status,
+    to_naive_utc,
+    validate_status_transition,
+)
+
+@pytest.fixture
+def pending_payment():
+    """Create a pending payment object for testing."""
+    payment = Mock(spec=Payment)
+    payment.id = 1
+    payment.status = "pending"
+    payment.paid_at = None
+    payment.due_at = datetime(2024, 1, 10)
+    return payment
+
+class TestStatusTransitions:
+    """Test payment status transition rules."""
+
+    @pytest.mark.unit
+    def test_pending_to_paid_allowed(self):
+        """Test a pending payment can be marked as paid."""
+        assert validate_status_transition("pending", "paid").value == "paid"
+
+    @pytest.mark.unit
+    def test_paid_to_pending_rejected(self):
+        """Test a paid payment cannot go back to pending."""
+        with pytest.raises(HTTPException) as exc:
+            validate_status_transition("paid", "pending")
+        assert exc.value.status_code == 400
+        assert "Cannot change payment status" in exc.value.detail
+
+    @pytest.mark.unit
+    def test_unknown_status_rejected(self):
+        """Test unknown statuses are rejected."""
+        with pytest.raises(HTTPException) as exc:
+            validate_status_transition("pending", "refunded")
+        assert exc.value.status_code == 400
+        assert "Unknown payment status" in exc.value.detail
+
+    @pytest.mark.unit
+    def test_apply_paid_sets_paid_at(self, pending_payment):
+        """Test marking a payment as paid stamps paid_at."""
+        now = datetime(2024, 1, 5)
+        apply_status_transition(pending_payment, "paid", now=now)
+        assert pending_payment.status == "paid"
+        assert pending_payment.paid_at == now
+
+class TestInitialStatus:
+    """Test status assigned to newly created payments."""
+
+    @pytest.mark.unit
+    def test_past_due_pending_becomes_overdue(self):
+        """Test a pending payment created past its deadline is overdue."""
+        now = datetime(2024, 1, 10)
+        assert initial_payment_status("pending", now - timedelta(days=1), now=now) == "overdue"
+
+    @pytest.mark.unit
+    def test_future_due_pending_stays_pending(self):
+        """Test a pending payment with a future deadline stays pending."""
+        now = datetime(2024, 1, 10)
+        assert initial_payment_status("pending", now + timedelta(days=1), now=now) == "pending"
+
+    @pytest.mark.unit
+    def test_aware_due_date_normalised_to_utc(self):
+        """Test timezone-aware deadlines are stored as naive UTC."""
+        ist = timezone(timedelta(hours=5, minutes=30))
+        assert to_naive_utc(datetime(2024, 1, 10, 5, 30, tzinfo=ist)) == datetime(2024, 1, 10)
+
+class TestOverdueSweeper:
+    """Test the batched overdue sweeper."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_sweeper_loops_until_short_batch(self):
+        """Test the sweeper keeps updating while batches come back full."""
+        mock_db = AsyncMock()
+        mock_db.execute.side_effect = [Mock(rowcount=2), Mock(rowcount=2), Mock(rowcount=1)]
+        sweeper = OverdueSweeper(batch_size=2)
+        now = datetime(2024, 1, 10)
+
+        swept = await sweeper.run(mock_db, now=now)
+
+        assert swept == 5
+        assert mock_db.execute.await_count == 3
+        assert mock_db.commit.await_count == 3
+        assert sweeper.last_run_at == now
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_sweeper_only_scans_since_last_run(self):
+        """Test later runs only consider deadlines crossed since the previous run."""
+        mock_db = AsyncMock()
+        mock_db.execute.return_value = Mock(rowcount=0)
+        sweeper = OverdueSweeper(batch_size=10)
+        sweeper.last_run_at = datetime(2024, 1, 9)
+
+        await sweeper.run(mock_db, now=datetime(2024, 1, 10))
+
+        statement = mock_db.execute.await_args.args[0]
+        compiled = str(statement.compile(compile_kwargs={"literal_binds": True}))
+        assert "payments.due_at > '2024-01-09 00:00:00'" in compiled
+        assert "payments.due_at <= '2024-01-10 00:00:00'" in compiled
@@ -1,3 +1,4 @@
+import httpx
 import pytest
 from unittest.mock import Mock, AsyncMock
 from fastapi import HTTPException
@@ -9,6 +10,13 @@ from app.db.models.user import User
 from app.db.models.customer import Customer
 from app.db.models.business import Business
 from app.db.models.ledger_entry import LedgerEntry
+from app.db.models.payment import Payment
+from app.db.schemas.payment import PaymentAllocation, PaymentCreateRequest
+from app.deps import get_db
+from app.main import app
+from app.services.auth import cashier_or_owner_required
+from app.services.payment_service import _payment_from_ledger_row, _payments_from_ledger_stmt, create_payment
+from app.services.principal_cache import Principal
 
 @pytest.fixture
 def owner_user():
@@ -360,3 +368,101 @@ class TestSimplePayments:
         
         balances = await mock_get_outstanding_balances(mock_db)
         assert len(balances) == 1
+
+
+class TestPaymentsFromLedgerQuery:
+    """Test the projected, keyset-paginated payments-from-ledger query."""
+
+    @pytest.mark.unit
+    def test_query_projects_columns_only(self):
+        """Test only the response columns are selected."""
+        stmt = _payments_from_ledger_stmt(1, 3)
+        columns = [column.name for column in stmt.selected_columns]
+
+        assert columns == ["ledger_entry_id", "customer_id", "business_id", "amount", "description", "image_url", "created_at"]
+
+    @pytest.mark.unit
+    def test_query_keyset_and_date_filters(self):
+        """Test keyset and date filters are applied in SQL."""
+        stmt = _payments_from_ledger_stmt(1, 3, after_id=10, from_date=datetime(2024, 1, 1).date(), to_date=datetime(2024, 1, 31).date(), limit=50)
+        compiled = str(stmt.compile(compile_kwargs={"literal_binds": True}))
+
+        assert "ledger_entries.business_id = 3" in compiled
+        assert "ledger_entries.id > 10" in compiled
+        assert "ledger_entries.created_at >= '2024-01-01 00:00:00'" in compiled
+        assert "ledger_entries.created_at < '2024-02-01 00:00:00'" in compiled
+        assert "ORDER BY ledger_entries.id" in compiled
+        assert "LIMIT 50" in compiled
+
+    @pytest.mark.unit
+    def test_row_mapping(self):
+        """Test a projected row maps to the payment response shape."""
+        row = Mock(
+            ledger_entry_id=1,
+            customer_id=2,
+            business_id=3,
+            amount=Decimal("100.00"),
+            description="Test",
+            image_url=None,
+            created_at=datetime(2024, 1, 1)
+        )
+
+        result = _payment_from_ledger_row(row)
+
+        assert result["ledger_entry_id"] == 1
+        assert result["status"] == "paid"
+        assert result["paid_at"] is None
+
+class TestCreatePaymentAllocations:
+    """Test which ledger entries a new payment can be allocated to."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_allocations_must_be_debit_entries(self, owner_user):
+        """Test an allocation to a credit entry is refused before anything is written."""
+        db = Mock()
+        db.add = Mock()
+        db.execute = AsyncMock(side_effect=[
+            Mock(scalar_one_or_none=Mock(return_value=1)),
+            Mock(scalars=Mock(return_value=Mock(all=Mock(return_value=[])))),
+        ])
+        payment_in = PaymentCreateRequest(
+            customer_id=1, business_id=1, amount=100.0, status="paid", created_by_id=1,
+            allocations=[PaymentAllocation(ledger_entry_id=7, amount=100.0)]
+        )
+
+        with pytest.raises(HTTPException) as exc:
+            await create_payment(payment_in, owner_user, db)
+
+        assert exc.value.status_code == 400
+        assert "ledger_entries.entry_type = " in str(db.execute.await_args_list[1].args[0])
+        db.add.assert_not_called()
+
+class TestPaymentsFromLedgerAccess:
+    """Test payments-from-ledger routes are limited to the caller's business."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("path", [
+        "/payments/customers/5/payments-from-ledger/",
+        "/download/customers/5/payments-from-ledger/download-csv/",
+        "/download/customers/5/payments-from-ledger/download-xlsx/",
+    ])
+    async def test_customer_of_another_business_is_not_found(self, path):
+        """Test a customer outside the caller's business is a 404 before any payments are read."""
+        db = Mock()
+        db.execute = AsyncMock(return_value=Mock(scalars=Mock(return_value=Mock(first=Mock(return_value=None)))))
+        db.stream = AsyncMock()
+        cashier = Principal(2, "cashier@example.com", "staff", 10, "cashier", True)
+        app.dependency_overrides[get_db] = lambda: db
+        app.dependency_overrides[cashier_or_owner_required] = lambda: cashier
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.get(path)
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Customer not found."
+        assert "customers.business_id = " in str(db.execute.await_args.args[0])
+        db.stream.assert_not_awaited()
@@ -0,0 +1,130 @@
+import os
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+from app.services import pdf_service
+from app.services.pdf_service import PdfRenderPool, pdf_cache_path, remove_stale_pdfs
+
+def write_file(path, content):
+    with open(path, "w") as handle:
+        handle.write(content)
+    return path
+
+def slow_write(path, seconds):
+    time.sleep(seconds)
+    return write_file(path, "late")
+
+@pytest.fixture
+def thread_pool():
+    """Create a render pool backed by threads instead of worker processes."""
+    pool = PdfRenderPool(workers=1, max_pending=2, timeout_seconds=5)
+    pool._executor = ThreadPoolExecutor(1)
+    yield pool
+    pool.shutdown()
+
+class TestPdfCache:
+    """Test the on-disk PDF cache layout."""
+
+    @pytest.mark.unit
+    def test_cache_path_changes_with_data_version(self, tmp_path, monkeypatch):
+        """Test the cache file name depends on the data version."""
+        monkeypatch.setattr(pdf_service, "PDF_CACHE_DIR", str(tmp_path))
+
+        first = pdf_cache_path("statements", "customer_1_start_2024-01-31", "(3, 7, None)")
+        again = pdf_cache_path("statements", "customer_1_start_2024-01-31", "(3, 7, None)")
+        changed = pdf_cache_path("statements", "customer_1_start_2024-01-31", "(4, 8, None)")
+
+        assert first == again
+        assert first != changed
+        assert os.path.dirname(first) == str(tmp_path / "statements")
+
+    @pytest.mark.unit
+    def test_remove_stale_pdfs_keeps_other_scopes(self, tmp_path):
+        """Test older versions are removed without touching other customers."""
+        current = write_file(str(tmp_path / "customer_1_start_2024-01-31_new.pdf"), "")
+        stale = write_file(str(tmp_path / "customer_1_start_2024-01-31_old.pdf"), "")
+        other = write_file(str(tmp_path / "customer_12_start_2024-01-31_old.pdf"), "")
+
+        remove_stale_pdfs(current, "customer_1_start_2024-01-31")
+
+        assert os.path.exists(current)
+        assert not os.path.exists(stale)
+        assert os.path.exists(other)
+
+class TestPdfRenderPool:
+    """Test bounded, time-limited PDF rendering."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_render_writes_file_atomically(self, thread_pool, tmp_path):
+        """Test the rendered file only appears at its final path."""
+        path = str(tmp_path / "statement.pdf")
+
+        result = await thread_pool.render(path, write_file, "pdf")
+
+        assert result == path
+        assert open(path).read() == "pdf"
+        assert os.listdir(tmp_path) == ["statement.pdf"]
+        assert thread_pool._pending == 0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_render_rejects_when_queue_is_full(self, thread_pool, tmp_path):
+        """Test callers get a 503 with Retry-After once the queue is full."""
+        thread_pool._pending = thread_pool.max_pending
+
+        with pytest.raises(HTTPException) as exc:
+            await thread_pool.render(str(tmp_path / "statement.pdf"), write_file, "pdf")
+
+        assert exc.value.status_code == 503
+        assert exc.value.headers["Retry-After"] == "5"
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_render_timeout(self, thread_pool, tmp_path):
+        """Test a job over its deadline fails with 504 and resets the pool."""
+        thread_pool.timeout_seconds = 0.05
+
+        with pytest.raises(HTTPException) as exc:
+            await thread_pool.render(str(tmp_path / "statement.pdf"), slow_write, 0.3)
+
+        assert exc.value.status_code == 504
+        assert thread_pool._executor is None
+        assert thread_pool._pending == 0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_failed_job_keeps_a_replacement_pool(self, thread_pool, tmp_path):
+        """Test a job that times out on an old pool leaves the pool that replaced it running."""
+        thread_pool.timeout_seconds = 0.05
+        replacement = ThreadPoolExecutor(1)
+
+        def swap_then_wait(path, seconds):
+            thread_pool._executor = replacement
+            return slow_write(path, seconds)
+
+        with pytest.raises(HTTPException) as exc:
+            await thread_pool.render(str(tmp_path / "statement.pdf"), swap_then_wait, 0.3)
+
+        assert exc.value.status_code == 504
+        assert thread_pool._executor is replacement
+
+class TestPdfRendering:
+    """Test the table renderer used by the worker processes."""
+
+    @pytest.mark.unit
+    def test_render_table_pdf_paginates(self, tmp_path):
+        """Test long tables are split across pages."""
+        pytest.importorskip("reportlab")
+        from app.services.pdf_render import render_table_pdf
+
+        path = str(tmp_path / "table.pdf")
+        rows = [(str(i), f"Customer {i}", "1,000.00") for i in range(200)]
+        render_table_pdf(path, "Outstanding balances", ["Balances above 10,000.00"], [("Id", 50, "right"), ("Name", 200, "left"), ("Balance", 80, "right")], rows)
+
+        content = open(path, "rb").read()
+        assert content.startswith(b"%PDF-")
+        assert b"/Count 4" in content
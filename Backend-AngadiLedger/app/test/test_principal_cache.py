@@ -0,0 +1,197 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+from fastapi import HTTPException
+
+from app.services import auth, principal_cache as cache_module
+from app.services.auth import access_token_claims, cashier_or_owner_required, get_current_user, principal_from_claims, supervisor_or_owner_required
+from app.services.principal_cache import Principal, PrincipalCache, PrincipalNotifier, poll_principal_invalidations, principals_changed
+
+def principal(user_id=1, email="owner@example.com", role="owner", staff_role=None):
+    return Principal(user_id, email, role, 10, staff_role, True)
+
+class RecordingNotifier(PrincipalNotifier):
+    def __init__(self, incoming=()):
+        self.published = []
+        self.incoming = list(incoming)
+
+    async def publish(self, user_ids):
+        self.published.append(user_ids)
+
+    async def poll(self):
+        incoming, self.incoming = self.incoming, []
+        return incoming
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    """Replace the process-wide principal cache and notifier."""
+    cache = PrincipalCache(ttl_seconds=60, max_size=2)
+    notifier = RecordingNotifier()
+    monkeypatch.setattr(cache_module, "principal_cache", cache)
+    monkeypatch.setattr(cache_module, "principal_notifier", notifier)
+    monkeypatch.setattr(auth, "principal_cache", cache)
+    return cache, notifier
+
+class TestPrincipalCache:
+    """Test the TTL and LRU principal cache."""
+
+    @pytest.mark.unit
+    def test_expired_entries_are_dropped(self, monkeypatch):
+        """Test an entry past its TTL is a miss."""
+        now = [100.0]
+        monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+        cache = PrincipalCache(ttl_seconds=30, max_size=10)
+        cache.set("owner@example.com", principal(), cache.generation)
+
+        assert cache.get("owner@example.com") == principal()
+        now[0] = 131.0
+        assert cache.get("owner@example.com") is None
+        assert len(cache) == 0
+
+    @pytest.mark.unit
+    def test_least_recently_used_is_evicted(self):
+        """Test the oldest unused subject makes room for a new one."""
+        cache = PrincipalCache(ttl_seconds=60, max_size=2)
+        cache.set("a@example.com", principal(1, "a@example.com"), cache.generation)
+        cache.set("b@example.com", principal(2, "b@example.com"), cache.generation)
+        cache.get("a@example.com")
+        cache.set("c@example.com", principal(3, "c@example.com"), cache.generation)
+
+        assert cache.get("b@example.com") is None
+        assert cache.get("a@example.com").id == 1
+        assert cache.get("c@example.com").id == 3
+
+    @pytest.mark.unit
+    def test_load_before_invalidation_is_not_stored(self):
+        """Test a principal read before an invalidation is discarded."""
+        cache = PrincipalCache(ttl_seconds=60, max_size=10)
+        generation = cache.generation
+        cache.invalidate([1])
+        cache.set("owner@example.com", principal(), generation)
+
+        assert cache.get("owner@example.com") is None
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_changes_are_published_and_polled(self, fresh_cache):
+        """Test local changes are announced and remote ones applied."""
+        cache, notifier = fresh_cache
+        cache.set("a@example.com", principal(1, "a@example.com"), cache.generation)
+        cache.set("b@example.com", principal(2, "b@example.com"), cache.generation)
+
+        await principals_changed(1)
+        notifier.incoming = [2]
+        applied = await poll_principal_invalidations()
+
+        assert notifier.published == [[1]]
+        assert applied == 1
+        assert len(cache) == 0
+
+class TestGetCurrentUser:
+    """Test resolving the principal behind a bearer token."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_second_request_skips_the_database(self, fresh_cache, monkeypatch):
+        """Test a cached principal is returned without a query."""
+        monkeypatch.setattr(auth.jwt, "decode", lambda *args, **kwargs: {"sub": "owner@example.com", "role": "owner"})
+        row = SimpleNamespace(id=1, email="owner@example.com", role="owner", business_id=10, assigned_role=None, is_active=True, token_version=0)
+        db = Mock()
+        db.execute = AsyncMock(return_value=Mock(first=Mock(return_value=row)))
+        credentials = SimpleNamespace(credentials="token")
+
+        first = await get_current_user(credentials, db)
+        second = await get_current_user(credentials, db)
+
+        assert first == second == principal()
+        assert db.execute.await_count == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_unknown_subject_is_rejected(self, fresh_cache, monkeypatch):
+        """Test a token for a missing user is a 401 and is not cached."""
+        monkeypatch.setattr(auth.jwt, "decode", lambda *args, **kwargs: {"sub": "gone@example.com", "role": "owner"})
+        db = Mock()
+        db.execute = AsyncMock(return_value=Mock(first=Mock(return_value=None)))
+
+        with pytest.raises(HTTPException) as exc:
+            await get_current_user(SimpleNamespace(credentials="token"), db)
+
+        assert exc.value.status_code == 401
+        assert len(fresh_cache[0]) == 0
+
+class TestRoleDependencies:
+    """Test staff roles are checked from the principal."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_staff_roles(self):
+        """Test cashiers and supervisors pass only their own checks."""
+        cashier = principal(2, "cashier@example.com", "staff", "cashier")
+        supervisor = principal(3, "supervisor@example.com", "staff", "supervisor")
+
+        assert await cashier_or_owner_required(cashier) is cashier
+        assert await supervisor_or_owner_required(supervisor) is supervisor
+        assert await cashier_or_owner_required(principal()) == principal()
+        with pytest.raises(HTTPException) as exc:
+            await cashier_or_owner_required(supervisor)
+        assert exc.value.status_code == 403
+
+class TestTokenClaims:
+    """Test authorising from signed token claims."""
+
+    @pytest.mark.unit
+    def test_claims_round_trip(self):
+        """Test a principal survives being written to and read from claims."""
+        cashier = Principal(2, "cashier@example.com", "staff", 10, "cashier", True, 3)
+
+        payload = access_token_claims(cashier)
+
+        assert payload["srole"] == "cashier" and payload["bid"] == 10 and payload["ver"] == 3
+        assert principal_from_claims(payload, cashier) == cashier
+
+    @pytest.mark.unit
+    def test_superseded_version_is_rejected(self):
+        """Test a token minted before a role change stops working."""
+        old = Principal(2, "cashier@example.com", "staff", 10, "cashier", True, 0)
+        current = old._replace(staff_role="supervisor", token_version=1)
+
+        with pytest.raises(HTTPException) as exc:
+            principal_from_claims(access_token_claims(old), current)
+
+        assert exc.value.status_code == 401
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_role_check_uses_only_the_token(self, fresh_cache, monkeypatch):
+        """Test a cached user passes the cashier check with no queries."""
+        cashier = Principal(2, "cashier@example.com", "staff", 10, "cashier", True, 0)
+        fresh_cache[0].set(cashier.email, cashier, fresh_cache[0].generation)
+        monkeypatch.setattr(auth.jwt, "decode", lambda *args, **kwargs: access_token_claims(cashier))
+        db = Mock()
+        db.execute = AsyncMock()
+
+        current_user = await get_current_user(SimpleNamespace(credentials="token"), db)
+
+        assert await cashier_or_owner_required(current_user) == cashier
+        db.execute.assert_not_awaited()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_newer_token_reloads_the_cached_principal(self, fresh_cache, monkeypatch):
+        """Test a token newer than the cached principal reloads it instead of being refused."""
+        stale = Principal(2, "cashier@example.com", "staff", 10, "cashier", True, 0)
+        fresh_cache[0].set(stale.email, stale, fresh_cache[0].generation)
+        promoted = stale._replace(staff_role="supervisor", token_version=1)
+        monkeypatch.setattr(auth.jwt, "decode", lambda *args, **kwargs: access_token_claims(promoted))
+        row = SimpleNamespace(
+            id=2, email="cashier@example.com", role="staff", business_id=10, assigned_role="supervisor", is_active=True, token_version=1
+        )
+        db = Mock()
+        db.execute = AsyncMock(return_value=Mock(first=Mock(return_value=row)))
+
+        current_user = await get_current_user(SimpleNamespace(credentials="token"), db)
+
+        assert current_user == promoted
+        assert fresh_cache[0].get(stale.email) == promoted
+        db.execute.assert_awaited_once()
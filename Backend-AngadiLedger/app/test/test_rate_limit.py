@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+
+from app.services import rate_limit
+from app.services.rate_limit import MemoryRateLimitBackend, RateLimit, RateLimiter, parse_rate_limit
+
+LIMIT = RateLimit(3, 30)
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable monotonic clock for the bucket arithmetic."""
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+class SharedFakeBackend:
+    """Stands in for a shared store: one bucket table behind several limiters."""
+    def __init__(self):
+        self.memory = MemoryRateLimitBackend()
+        self.calls = []
+
+    async def take(self, key, limit, cost=1):
+        self.calls.append((key, cost))
+        return await self.memory.take(key, limit, cost)
+
+class BrokenBackend:
+    async def take(self, key, limit, cost=1):
+        raise ConnectionError("backend down")
+
+class TestRateLimiter:
+    """Test token-bucket throttling."""
+
+    @pytest.mark.unit
+    def test_parse_rate_limit(self):
+        """Test count/seconds strings become limits."""
+        assert parse_rate_limit("20/60") == RateLimit(20, 60.0)
+        assert parse_rate_limit("5/300").refill_per_second == pytest.approx(1 / 60)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_burst_then_429_then_refill(self, clock):
+        """Test a full bucket allows a burst, then refuses until refilled."""
+        limiter = RateLimiter(MemoryRateLimitBackend())
+        for _ in range(3):
+            await limiter.hit("login:ip:1.2.3.4", LIMIT)
+
+        with pytest.raises(HTTPException) as exc:
+            await limiter.hit("login:ip:1.2.3.4", LIMIT)
+        assert exc.value.status_code == 429
+        assert exc.value.headers["Retry-After"] == "10"
+
+        clock[0] += 10
+        await limiter.hit("login:ip:1.2.3.4", LIMIT)
+        await limiter.hit("login:ip:5.6.7.8", LIMIT)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_refund_gives_attempts_back(self, clock):
+        """Test refunded attempts are available again but never beyond the capacity."""
+        limiter = RateLimiter(MemoryRateLimitBackend())
+        for _ in range(5):
+            await limiter.hit("login:account:a@example.com", LIMIT)
+            await limiter.refund("login:account:a@example.com", LIMIT)
+        await limiter.refund("login:account:a@example.com", LIMIT)
+        for _ in range(3):
+            await limiter.hit("login:account:a@example.com", LIMIT)
+
+        with pytest.raises(HTTPException):
+            await limiter.hit("login:account:a@example.com", LIMIT)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_concurrent_attempts_are_capped(self, clock):
+        """Test attempts in flight at once cannot exceed the account's limit."""
+        limiter = RateLimiter(MemoryRateLimitBackend())
+        release = asyncio.Event()
+
+        async def attempt():
+            await limiter.hit("login:account:a@example.com", LIMIT)
+            await release.wait()
+
+        attempts = [asyncio.create_task(attempt()) for _ in range(10)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*attempts, return_exceptions=True)
+
+        assert sum(not isinstance(result, HTTPException) for result in results) == 3
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_shared_backend_is_shared_between_workers(self, clock):
+        """Test two limiters on one backend draw from the same bucket."""
+        backend = SharedFakeBackend()
+        first, second = RateLimiter(backend), RateLimiter(backend)
+        await first.hit("otp:ip:1.2.3.4", LIMIT)
+        await second.hit("otp:ip:1.2.3.4", LIMIT)
+        await first.hit("otp:ip:1.2.3.4", LIMIT)
+
+        with pytest.raises(HTTPException):
+            await second.hit("otp:ip:1.2.3.4", LIMIT)
+        assert backend.calls[-1] == ("otp:ip:1.2.3.4", 1)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_backend_failure_falls_back_to_local_buckets(self, clock):
+        """Test limits still apply in process when the shared backend fails."""
+        limiter = RateLimiter(BrokenBackend())
+        for _ in range(3):
+            await limiter.hit("login:ip:1.2.3.4", LIMIT)
+
+        with pytest.raises(HTTPException):
+            await limiter.hit("login:ip:1.2.3.4", LIMIT)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_memory_backend_is_bounded(self, clock):
+        """Test the least recently used buckets are dropped beyond max_keys."""
+        backend = MemoryRateLimitBackend(max_keys=2)
+        for key in ("a", "b", "c"):
+            await backend.take(key, LIMIT)
+
+        assert list(backend._buckets) == ["b", "c"]
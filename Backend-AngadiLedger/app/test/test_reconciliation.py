@@ -0,0 +1,179 @@
+import pytest
+from datetime import date
+from decimal import Decimal
+from unittest.mock import AsyncMock, Mock
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+
+from app.db.models.business import Business
+from app.db.models.customer import Customer
+from app.db.models.ledger_entry import LedgerEntry
+from app.db.models.payment import Payment
+from app.db.models.user import User
+from app.services import reconciliation_service
+from app.services.csv_import import iter_csv_records, parse_amount, parse_date, normalise_phone
+from app.services.reconciliation_service import (
+    REFERENCE_MAX_LENGTH,
+    Candidate,
+    ReconciliationIndex,
+    StatementRow,
+    normalise_statement_row,
+    reconcile_statement,
+)
+
+async def chunked(data: bytes, size: int):
+    for offset in range(0, len(data), size):
+        yield data[offset:offset + size]
+
+def statement_row(amount=10000, txn_date=date(2024, 1, 10), reference=None, phone=None):
+    return StatementRow(1, txn_date, amount, reference, phone, "")
+
+def candidate(id, amount=10000, day=date(2024, 1, 10), phone=None, text="", kind="ledger_entry", customer_id=1):
+    return Candidate(kind, id, customer_id, amount, day.toordinal(), phone, text)
+
+class TestCsvParsing:
+    """Test incremental CSV parsing of uploaded statements."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_records_split_across_chunks(self):
+        """Test records are reassembled across chunk boundaries and quoted newlines."""
+        data = 'Txn Date,Credit,Narration\r\n01/02/2024,"1,200.00","UPI/ref\nsecond line"\r\n\r\n02/02/2024,50,cash'.encode()
+
+        rows = [row async for row in iter_csv_records(chunked(data, 5))]
+
+        assert len(rows) == 2
+        assert rows[0] == (1, {"txn_date": "01/02/2024", "credit": "1,200.00", "narration": "UPI/ref\nsecond line"})
+        assert rows[1][1]["narration"] == "cash"
+
+    @pytest.mark.unit
+    def test_parse_helpers(self):
+        """Test amount, date and phone normalisation."""
+        assert parse_amount("₹1,200.50") == Decimal("1200.50")
+        assert parse_amount("500.00 Dr") == Decimal("-500.00")
+        assert parse_amount("abc") is None
+        assert parse_date("05-Mar-2024") == date(2024, 3, 5)
+        assert parse_date("31/12/2024") == date(2024, 12, 31)
+        assert normalise_phone("+91 98765-43210") == "9876543210"
+
+class TestStatementNormalisation:
+    """Test bank statement row normalisation."""
+
+    @pytest.mark.unit
+    def test_credit_row_with_upi_narration(self):
+        """Test reference and phone are pulled out of a UPI narration."""
+        row, error = normalise_statement_row(1, {
+            "date": "10/01/2024",
+            "narration": "UPI/412345678901/9876543210@ybl/Payment",
+            "credit": "100.00",
+        })
+        assert error is None
+        assert row.amount == 10000
+        assert row.reference == "412345678901"
+        assert row.phone == "9876543210"
+
+    @pytest.mark.unit
+    def test_debit_row_is_skipped(self):
+        """Test withdrawals are skipped rather than reported as errors."""
+        row, error = normalise_statement_row(1, {"date": "10/01/2024", "debit": "100.00", "credit": ""})
+        assert row is None
+        assert error is None
+
+    @pytest.mark.unit
+    def test_bad_date_is_reported(self):
+        """Test unreadable dates are reported as errors."""
+        row, error = normalise_statement_row(1, {"date": "yesterday", "amount": "100"})
+        assert row is None
+        assert error == "Unreadable date"
+
+    @pytest.mark.unit
+    def test_long_reference_fits_the_column(self):
+        """Test an oversized reference is cut to the stored column length."""
+        row, error = normalise_statement_row(1, {"date": "10/01/2024", "credit": "100.00", "reference": "R" * 500})
+        assert error is None
+        assert row.reference == "r" * REFERENCE_MAX_LENGTH
+
+class TestReconciliationIndex:
+    """Test hash-join matching of statement rows."""
+
+    @pytest.mark.unit
+    def test_exact_match_within_window(self):
+        """Test a single candidate with the same amount inside the window matches."""
+        index = ReconciliationIndex([candidate(1, day=date(2024, 1, 9))], window_days=2, tolerance_paise=100)
+
+        outcome, options, method = index.match(statement_row())
+
+        assert outcome == "matched"
+        assert options[0].id == 1
+        assert method == "exact"
+
+    @pytest.mark.unit
+    def test_candidate_is_only_matched_once(self):
+        """Test a matched candidate is not reused for a second statement row."""
+        index = ReconciliationIndex([candidate(1)], window_days=2, tolerance_paise=100)
+
+        assert index.match(statement_row())[0] == "matched"
+        assert index.match(statement_row())[0] == "unmatched"
+
+    @pytest.mark.unit
+    def test_phone_disambiguates_same_amount(self):
+        """Test the payer phone picks between candidates of the same amount."""
+        index = ReconciliationIndex(
+            [candidate(1, phone="9000000001"), candidate(2, phone="9000000002", customer_id=2)],
+            window_days=2,
+            tolerance_paise=100,
+        )
+
+        outcome, options, method = index.match(statement_row(phone="9000000002"))
+
+        assert outcome == "matched"
+        assert options[0].id == 2
+        assert method == "phone"
+
+    @pytest.mark.unit
+    def test_same_amount_without_hints_is_ambiguous(self):
+        """Test identical candidates without a reference or phone are ambiguous."""
+        index = ReconciliationIndex([candidate(1), candidate(2, customer_id=2)], window_days=2, tolerance_paise=100)
+
+        outcome, options, _ = index.match(statement_row())
+
+        assert outcome == "ambiguous"
+        assert {c.id for c in options} == {1, 2}
+
+    @pytest.mark.unit
+    def test_phone_fuzzy_fallback_allows_small_amount_difference(self):
+        """Test the phone fallback tolerates small amount differences."""
+        index = ReconciliationIndex([candidate(1, amount=10050, phone="9000000001")], window_days=2, tolerance_paise=100)
+
+        outcome, options, method = index.match(statement_row(phone="9000000001"))
+
+        assert outcome == "matched"
+        assert method == "phone_fuzzy"
+
+    @pytest.mark.unit
+    def test_outside_window_is_unmatched(self):
+        """Test candidates outside the date window are not matched."""
+        index = ReconciliationIndex([candidate(1, day=date(2024, 1, 1))], window_days=2, tolerance_paise=100)
+
+        assert index.match(statement_row())[0] == "unmatched"
+
+class TestReconcileStatement:
+    """Test recording reconciliation matches."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_concurrent_import_is_a_conflict(self, monkeypatch):
+        """Test a match already taken by a concurrent import is a 409, not a 500."""
+        async def load_candidates(db, business_id, start, end):
+            return [candidate(1, kind="payment")]
+        monkeypatch.setattr(reconciliation_service, "load_candidates", load_candidates)
+        mock_db = AsyncMock()
+        mock_db.execute.side_effect = IntegrityError("INSERT", {}, Exception("duplicate key"))
+        user = Mock(id=1, business_id=1)
+
+        with pytest.raises(HTTPException) as exc:
+            await reconcile_statement(chunked(b"date,credit\n10/01/2024,100.00\n", 8), user, mock_db)
+
+        assert exc.value.status_code == 409
+        mock_db.rollback.assert_awaited_once()
+        mock_db.commit.assert_not_awaited()
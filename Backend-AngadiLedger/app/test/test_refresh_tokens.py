@@ -0,0 +1,110 @@
+import hashlib
+import pytest
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+from fastapi import HTTPException
+
+from app.db.models.business import Business
+from app.db.models.customer import Customer
+from app.db.models.ledger_entry import LedgerEntry
+from app.db.models.payment import Payment
+from app.db.models.refresh_token import RefreshToken
+from app.services.payment_status_service import utc_now
+from app.services.refresh_tokens import hash_refresh_token, issue_refresh_token, rotate_refresh_token
+
+def stored_token(**overrides):
+    values = dict(id=5, user_id=1, family_id="family", used_at=None, revoked_at=None, expires_at=utc_now() + timedelta(days=1))
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+def mock_db(row, claimed=1):
+    db = Mock()
+    db.add = Mock()
+    db.commit = AsyncMock()
+    db.rollback = AsyncMock()
+    db.execute = AsyncMock(side_effect=[
+        Mock(first=Mock(return_value=row)),
+        Mock(rowcount=claimed),
+        Mock(rowcount=2),
+    ])
+    return db
+
+USER = SimpleNamespace(id=1, email="owner@example.com", role="owner", is_verified=True)
+
+class TestIssueRefreshToken:
+    """Test minting opaque refresh tokens."""
+
+    @pytest.mark.unit
+    def test_only_the_hash_is_stored(self):
+        """Test the row holds the SHA-256 of the token and a new family."""
+        db = Mock()
+
+        token = issue_refresh_token(db, 1)
+        stored = db.add.call_args.args[0]
+
+        assert isinstance(stored, RefreshToken)
+        assert stored.token_hash == hashlib.sha256(token.encode()).hexdigest() == hash_refresh_token(token)
+        assert token not in (stored.token_hash, stored.family_id)
+        assert len(stored.family_id) == 32
+        assert stored.expires_at > utc_now()
+
+class TestRotateRefreshToken:
+    """Test rotation and reuse detection."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_rotation_keeps_the_family(self):
+        """Test a fresh token is marked used and replaced in its family."""
+        db = mock_db((stored_token(), USER))
+
+        user, new_token = await rotate_refresh_token(db, "old-token")
+        replacement = db.add.call_args.args[0]
+
+        assert user is USER
+        assert replacement.family_id == "family"
+        assert replacement.token_hash == hash_refresh_token(new_token)
+        db.commit.assert_awaited_once()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_reuse_revokes_the_family(self):
+        """Test presenting a used token revokes every token in its family."""
+        db = mock_db((stored_token(used_at=utc_now()), USER))
+
+        with pytest.raises(HTTPException) as exc:
+            await rotate_refresh_token(db, "old-token")
+
+        revoke = db.execute.await_args_list[1].args[0]
+        assert exc.value.status_code == 401
+        assert revoke.table.name == "refresh_tokens"
+        assert "family_id" in str(revoke)
+        db.add.assert_not_called()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_lost_race_counts_as_reuse(self):
+        """Test a token claimed by a concurrent refresh is rejected."""
+        db = mock_db((stored_token(), USER), claimed=0)
+
+        with pytest.raises(HTTPException) as exc:
+            await rotate_refresh_token(db, "old-token")
+
+        assert exc.value.status_code == 401
+        db.rollback.assert_awaited_once()
+        assert db.execute.await_count == 3
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("row, detail", [
+        (None, "Invalid refresh token"),
+        ((stored_token(expires_at=utc_now() - timedelta(seconds=1)), USER), "Refresh token has expired"),
+    ])
+    async def test_unknown_or_expired(self, row, detail):
+        """Test unknown and expired tokens are rejected."""
+        db = mock_db(row)
+
+        with pytest.raises(HTTPException) as exc:
+            await rotate_refresh_token(db, "old-token")
+
+        assert (exc.value.status_code, exc.value.detail) == (401, detail)
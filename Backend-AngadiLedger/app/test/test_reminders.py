@@ -0,0 +1,132 @@
+import httpx
+import pytest
+from unittest.mock import Mock, AsyncMock
+from datetime import datetime
+
+from app.db.models.payment_reminder import PaymentReminder
+from app.db.models.payment import Payment
+from app.db.models.customer import Customer
+from app.db.models.ledger_entry import LedgerEntry
+from app.db.models.user import User
+from app.db.models.business import Business
+from app.deps import get_db
+from app.main import app
+from app.services.auth import cashier_or_owner_required
+from app.services.principal_cache import Principal
+from app.services.reminder_service import REMINDER_THROTTLE_HOURS, claim_reminders, finish_reminder, get_recently_reminded_customer_ids, plan_reminders
+
+@pytest.fixture
+def outstanding_customers():
+    """Create outstanding balance rows for testing."""
+    return [
+        {"customer_id": 1, "customer_name": "One", "email": "one@example.com", "outstanding_balance": 15000.0},
+        {"customer_id": 2, "customer_name": "Two", "email": "two@example.com", "outstanding_balance": 12000.0},
+        {"customer_id": 3, "customer_name": "Three", "email": "three@example.com", "outstanding_balance": 11000.0},
+    ]
+
+class TestReminderPlanning:
+    """Test reminder throttling and quota planning."""
+
+    @pytest.mark.unit
+    def test_recently_reminded_customers_are_skipped(self, outstanding_customers):
+        """Test customers reminded inside the window are skipped."""
+        to_send, skipped = plan_reminders(outstanding_customers, {2}, remaining_quota=10, window_hours=24)
+
+        assert [c["customer_id"] for c in to_send] == [1, 3]
+        assert skipped == [{"customer": "Two", "reason": "Already reminded in the last 24 hours"}]
+
+    @pytest.mark.unit
+    def test_hourly_quota_limits_sends(self, outstanding_customers):
+        """Test sends stop once the hourly quota is used up."""
+        to_send, skipped = plan_reminders(outstanding_customers, set(), remaining_quota=1, window_hours=24)
+
+        assert [c["customer_id"] for c in to_send] == [1]
+        assert all(s["reason"] == "Hourly reminder quota reached" for s in skipped)
+
+    @pytest.mark.unit
+    def test_exhausted_quota_sends_nothing(self, outstanding_customers):
+        """Test an exhausted quota skips every customer."""
+        to_send, skipped = plan_reminders(outstanding_customers, set(), remaining_quota=-5, window_hours=24)
+
+        assert to_send == []
+        assert len(skipped) == 3
+
+class TestReminderQueries:
+    """Test reminder history queries."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_recent_reminders_single_query(self):
+        """Test the throttle check is one batched query."""
+        mock_db = AsyncMock()
+        result = Mock()
+        result.scalars.return_value.all.return_value = [2]
+        mock_db.execute.return_value = result
+
+        reminded = await get_recently_reminded_customer_ids(mock_db, [1, 2, 3], datetime(2024, 1, 1))
+
+        assert reminded == {2}
+        assert mock_db.execute.await_count == 1
+        assert "payment_reminders.status IN" in str(mock_db.execute.await_args.args[0])
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_no_customers_skips_query(self):
+        """Test no query runs when there is nobody to check."""
+        mock_db = AsyncMock()
+
+        assert await get_recently_reminded_customer_ids(mock_db, [], datetime(2024, 1, 1)) == set()
+        mock_db.execute.assert_not_awaited()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_claim_reminders_batch_insert(self):
+        """Test customers are claimed in one committed insert before sending."""
+        mock_db = AsyncMock()
+        result = Mock()
+        result.scalars.return_value.all.return_value = [10, 11]
+        mock_db.execute.return_value = result
+        sent_at = datetime(2024, 1, 1)
+
+        reminder_ids = await claim_reminders(mock_db, 1, [1, 2], "email", sent_at)
+
+        assert reminder_ids == [10, 11]
+        assert mock_db.execute.await_count == 1
+        rows = mock_db.execute.await_args.args[1]
+        assert rows[0] == {"customer_id": 1, "business_id": 1, "method": "email", "status": "sending", "sent_at": sent_at}
+        mock_db.commit.assert_awaited_once()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_finish_reminder_commits_outcome(self):
+        """Test each send outcome is committed on its own."""
+        mock_db = AsyncMock()
+
+        await finish_reminder(mock_db, 10, "failed")
+
+        assert mock_db.execute.await_count == 1
+        mock_db.commit.assert_awaited_once()
+
+class TestReminderWindow:
+    """Test callers cannot shorten the reminder throttle."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_window_below_throttle_is_rejected(self):
+        """Test a window shorter than the throttle is refused before any reminder is planned."""
+        db = Mock()
+        db.execute = AsyncMock()
+        cashier = Principal(2, "cashier@example.com", "staff", 10, "cashier", True)
+        app.dependency_overrides[get_db] = lambda: db
+        app.dependency_overrides[cashier_or_owner_required] = lambda: cashier
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.post(
+                    "/payments/customers/outstanding-balances/send-reminders/",
+                    params={"window_hours": REMINDER_THROTTLE_HOURS - 1}
+                )
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 422
+        db.execute.assert_not_awaited()
@@ -0,0 +1,75 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+from fastapi import HTTPException
+
+from app.db.models.business import Business
+from app.db.models.customer import Customer
+from app.db.models.ledger_entry import LedgerEntry
+from app.db.models.payment import Payment
+from app.services.principal_cache import Principal
+from app.services.resource_access import business_access_required, business_customer_access_required, load_business_resource
+
+CASHIER = Principal(2, "cashier@example.com", "staff", 10, "cashier", True)
+
+def mock_db(row):
+    db = Mock()
+    db.execute = AsyncMock(return_value=Mock(scalars=Mock(return_value=Mock(first=Mock(return_value=row)))))
+    return db
+
+def mock_request():
+    return SimpleNamespace(state=SimpleNamespace())
+
+class TestLoadBusinessResource:
+    """Test loading rows scoped to the caller's business."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_query_is_scoped_by_business(self):
+        """Test one query filters on both the id and the business."""
+        customer = SimpleNamespace(id=5, business_id=10)
+        db = mock_db(customer)
+
+        assert await business_customer_access_required(5, mock_request(), db, CASHIER) is customer
+
+        stmt = str(db.execute.await_args.args[0])
+        assert db.execute.await_count == 1
+        assert "customers.id = " in stmt and "customers.business_id = " in stmt
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_other_business_is_not_found(self):
+        """Test a row outside the caller's business is reported as missing."""
+        with pytest.raises(HTTPException) as exc:
+            await business_access_required(11, mock_request(), mock_db(None), CASHIER)
+
+        assert exc.value.status_code == 404
+        assert exc.value.detail == "Business not found."
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_request_reuses_loaded_rows(self):
+        """Test a row authorized once is served from the request without a query."""
+        entry = SimpleNamespace(id=7, business_id=10)
+        db = mock_db(entry)
+        request = mock_request()
+
+        first = await load_business_resource(db, LedgerEntry, 7, 10, request)
+        second = await load_business_resource(db, LedgerEntry, 7, 10, request)
+        assert first is second
+        assert db.execute.await_count == 1
+
+        await load_business_resource(db, Customer, 7, 10, request)
+        assert db.execute.await_count == 2
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_user_without_business_is_not_queried(self):
+        """Test a caller with no business gets a 404 without touching the database."""
+        db = mock_db(None)
+
+        with pytest.raises(HTTPException) as exc:
+            await load_business_resource(db, Customer, 5, None, mock_request())
+
+        assert exc.value.status_code == 404
+        db.execute.assert_not_awaited()
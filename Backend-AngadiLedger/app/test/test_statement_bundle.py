@@ -0,0 +1,88 @@
+import io
+import zipfile
+import pytest
+from collections import namedtuple
+from datetime import date, datetime
+from decimal import Decimal
+
+from app.db.models.business import Business
+from app.db.models.customer import Customer
+from app.services.statement_bundle_service import _EntryCursor, _entry_name, stream_statement_bundle
+
+EntryRow = namedtuple("EntryRow", "customer_id ledger_entry_id created_at entry_type description amount")
+CustomerRow = namedtuple("CustomerRow", "id name opening_balance closing_balance")
+
+class FakeResult:
+    def __init__(self, rows, size=2):
+        self.rows = rows
+        self.size = size
+
+    async def partitions(self):
+        for start in range(0, len(self.rows), self.size):
+            yield self.rows[start:start + self.size]
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def stream(self, stmt):
+        return FakeResult(self.rows)
+
+async def iter_rows(rows):
+    for row in rows:
+        yield row
+
+def entry(customer_id, entry_id, entry_type, amount):
+    return EntryRow(customer_id, entry_id, datetime(2024, 3, entry_id, 10, 0), entry_type, f"entry {entry_id}", Decimal(amount))
+
+class TestEntryCursor:
+    """Test splitting one ordered entry stream by customer."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_entries_for_each_customer(self):
+        """Test each customer gets only its rows with running balances."""
+        rows = [entry(1, 1, "credit", "100.00"), entry(1, 2, "debit", "30.00"), entry(2, 3, "credit", "5.00"), entry(4, 4, "credit", "1.00")]
+        cursor = _EntryCursor(FakeResult(rows))
+        await cursor.advance()
+
+        first = [row async for row in cursor.entries_for(1, Decimal("10.00"))]
+        third = [row async for row in cursor.entries_for(3, Decimal("0.00"))]
+        fourth = [row async for row in cursor.entries_for(4, Decimal("0.00"))]
+
+        assert [row["balance"] for row in first] == [Decimal("110.00"), Decimal("80.00")]
+        assert first[1]["debit"] == Decimal("30.00")
+        assert third == []
+        assert [row["ledger_entry_id"] for row in fourth] == [4]
+
+    @pytest.mark.unit
+    def test_entry_name_is_safe(self):
+        """Test customer names are reduced to safe archive file names."""
+        assert _entry_name(CustomerRow(7, "Ravi & Sons/Ltd", 0, 0), "csv") == "statement_7_Ravi_Sons_Ltd.csv"
+        assert _entry_name(CustomerRow(8, "../", 0, 0), "html") == "statement_8.html"
+        assert _entry_name(CustomerRow(9, "///", 0, 0), "csv") == "statement_9.csv"
+
+class TestStatementBundle:
+    """Test the streamed ZIP of customer statements."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_one_statement_per_customer(self):
+        """Test every customer gets a statement, including ones without entries."""
+        db = FakeSession([entry(1, 1, "credit", "100.00"), entry(2, 2, "credit", "5.00")])
+        customers = iter_rows([
+            CustomerRow(1, "Asha", Decimal("0"), Decimal("100")),
+            CustomerRow(2, "Bala", Decimal("20"), Decimal("25")),
+            CustomerRow(3, "Chitra", Decimal("7"), Decimal("7")),
+        ])
+
+        chunks = [chunk async for chunk in stream_statement_bundle(db, 1, customers, date(2024, 3, 1), date(2024, 3, 31), "csv")]
+
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+        assert archive.namelist() == ["statement_1_Asha.csv", "statement_2_Bala.csv", "statement_3_Chitra.csv"]
+        bala = archive.read("statement_2_Bala.csv").decode().splitlines()
+        assert bala[1] == "2024-03-01,,,Opening balance,,,20.00"
+        assert bala[2].endswith(",entry 2,0.00,5.00,25.00")
+        assert bala[3] == "2024-03-31,,,Closing balance,,,25.00"
+        assert len(archive.read("statement_3_Chitra.csv").decode().splitlines()) == 3
+        assert len(chunks) > 2
@@ -3,10 +3,21 @@ from unittest.mock import Mock, AsyncMock
 from fastapi import HTTPException
 from fastapi.responses import StreamingResponse
 from decimal import Decimal
-from datetime import datetime
+from datetime import date, datetime
 from io import StringIO
 
+from app.db.models.business import Business
+from app.db.models.customer import Customer
 from app.db.models.user import User
+from app.services.statement_services import (
+    _statement_entries_stmt,
+    get_statement_balances,
+    peek_rows,
+    statement_csv_rows,
+    statement_period,
+    stream_csv,
+    stream_statement_html,
+)
 
 @pytest.fixture
 def owner_user():
@@ -34,6 +45,10 @@ def mock_list_of_dicts_to_csv(data_list):
     csv_content.seek(0)
     return csv_content
 
+async def iter_rows(rows):
+    for row in rows:
+        yield row
+
 async def mock_get_payments_from_ledger_entries(db, customer_id: int):
     """Mock function to get payments from ledger entries."""
     if customer_id == 999:
@@ -193,6 +208,111 @@ class TestCSVGeneration:
         
         assert content == ""
 
+class TestStreamingCSV:
+    """Test chunked CSV streaming from row iterators."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stream_csv_chunks(self):
+        """Test rows are written in bounded chunks with the header first."""
+        rows = [{"id": i, "name": f"Customer {i}", "amount": Decimal("10.50")} for i in range(200)]
+
+        chunks = [chunk async for chunk in stream_csv(iter_rows(rows), chunk_size=256)]
+        content = b"".join(chunks).decode()
+
+        assert chunks[0].decode().startswith("id,name,amount\r\n0,Customer 0,10.50")
+        assert len(chunks) > 10
+        assert all(len(chunk) < 512 for chunk in chunks)
+        assert content.count("\r\n") == 201
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stream_csv_empty(self):
+        """Test an empty iterator produces the no-data message."""
+        chunks = [chunk async for chunk in stream_csv(iter_rows([]))]
+
+        assert chunks == [b"No data available.\n"]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_peek_rows(self):
+        """Test peeking keeps the first row and reports empty results."""
+        assert await peek_rows(iter_rows([])) is None
+
+        rows = await peek_rows(iter_rows([{"id": 1}, {"id": 2}]))
+
+        assert [row async for row in rows] == [{"id": 1}, {"id": 2}]
+
+class TestCustomerStatement:
+    """Test statement of account balances and rendering."""
+
+    @pytest.fixture
+    def entries(self):
+        """Create statement entries with running balances."""
+        return [
+            {"ledger_entry_id": 1, "created_at": datetime(2024, 1, 2, 10, 0), "entry_type": "credit",
+             "description": "Sale <cash>", "debit": Decimal("0.00"), "credit": Decimal("100.00"), "balance": Decimal("150.00")},
+            {"ledger_entry_id": 2, "created_at": datetime(2024, 1, 3, 11, 30), "entry_type": "debit",
+             "description": None, "debit": Decimal("40.00"), "credit": Decimal("0.00"), "balance": Decimal("110.00")},
+        ]
+
+    @pytest.mark.unit
+    def test_statement_period(self):
+        """Test the period covers whole days up to and including to_date."""
+        assert statement_period(date(2024, 1, 1), date(2024, 1, 31)) == (datetime(2024, 1, 1), datetime(2024, 2, 1))
+        assert statement_period(None, date(2024, 1, 31)) == (None, datetime(2024, 2, 1))
+
+    @pytest.mark.unit
+    def test_running_balance_uses_window_function(self):
+        """Test running balances are computed in SQL over (created_at, id)."""
+        start, end = statement_period(date(2024, 1, 1), date(2024, 1, 31))
+        sql = str(_statement_entries_stmt(1, start, end, Decimal("50.00")))
+
+        assert "sum(CASE" in sql
+        assert "OVER (ORDER BY ledger_entries.created_at, ledger_entries.id ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW)" in sql
+        assert "ledger_entries.created_at >= " in sql
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_get_statement_balances(self):
+        """Test opening and closing balances come from a single aggregate query."""
+        mock_db = AsyncMock()
+        result = Mock()
+        result.one.return_value = (Decimal("50"), 110)
+        mock_db.execute.return_value = result
+
+        opening, closing = await get_statement_balances(mock_db, 1, date(2024, 1, 2), date(2024, 1, 31))
+
+        assert (opening, closing) == (Decimal("50.00"), Decimal("110.00"))
+        assert mock_db.execute.await_count == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_statement_csv(self, entries):
+        """Test the CSV statement has opening, entry and closing rows."""
+        rows = statement_csv_rows(iter_rows(entries), date(2024, 1, 1), date(2024, 1, 31), Decimal("50.00"), Decimal("110.00"))
+        content = b"".join([chunk async for chunk in stream_csv(rows)]).decode()
+        lines = content.strip().split("\r\n")
+
+        assert lines[0] == "date,ledger_entry_id,entry_type,description,debit,credit,balance"
+        assert lines[1] == "2024-01-01,,,Opening balance,,,50.00"
+        assert lines[2] == "2024-01-02 10:00:00,1,credit,Sale <cash>,0.00,100.00,150.00"
+        assert lines[-1] == "2024-01-31,,,Closing balance,,,110.00"
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_statement_html_escapes_text(self, entries):
+        """Test the printable statement escapes customer and entry text."""
+        customer = Mock(id=1)
+        customer.name = "A & B"
+        chunks = stream_statement_html(customer, iter_rows(entries), None, date(2024, 1, 31), Decimal("0.00"), Decimal("110.00"))
+        content = b"".join([chunk async for chunk in chunks]).decode()
+
+        assert "A &amp; B" in content
+        assert "Sale &lt;cash&gt;" in content
+        assert "<td>Closing balance</td><td></td><td></td><td>110.00</td>" in content
+        assert content.rstrip().endswith("</html>")
+
 class TestDataRetrieval:
     """Test data retrieval functions."""
     
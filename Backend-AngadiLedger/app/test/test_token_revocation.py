@@ -0,0 +1,135 @@
+import jwt
+import pytest
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+from fastapi import HTTPException
+
+from app.db.models.business import Business
+from app.db.models.customer import Customer
+from app.db.models.ledger_entry import LedgerEntry
+from app.db.models.payment import Payment
+from app.db.models.token_revocation import TokenRevocation
+from app.services import auth, principal_cache as cache_module, token_revocation
+from app.services.auth import _not_revoked, create_access_token
+from app.services.payment_status_service import utc_now
+from app.services.principal_cache import Principal, PrincipalCache, PrincipalNotifier
+from app.services.token_revocation import RevocationList, deactivate_user, reactivate_user
+
+def row(row_id, kind, user_id, jti=None, expires_at=None):
+    return SimpleNamespace(id=row_id, kind=kind, jti=jti, user_id=user_id, expires_at=expires_at, created_at=utc_now())
+
+def rows_db(*batches):
+    db = Mock()
+    db.execute = AsyncMock(side_effect=[Mock(all=Mock(return_value=list(batch))) for batch in batches])
+    return db
+
+@pytest.fixture
+def fresh_list(monkeypatch):
+    """Replace the process-wide revocation list, principal cache and notifier."""
+    revocations = RevocationList()
+    monkeypatch.setattr(token_revocation, "revocation_list", revocations)
+    monkeypatch.setattr(auth, "revocation_list", revocations)
+    monkeypatch.setattr(cache_module, "principal_cache", PrincipalCache(ttl_seconds=60, max_size=10))
+    monkeypatch.setattr(cache_module, "principal_notifier", PrincipalNotifier())
+    return revocations
+
+class TestRevocationList:
+    """Test the in-memory revocation list."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_refresh_applies_rows_incrementally(self):
+        """Test the first refresh loads every row and later ones only newer rows."""
+        later = utc_now() + timedelta(minutes=5)
+        revocations = RevocationList()
+        db = rows_db(
+            [row(1, "token", 1, "abc", later), row(2, "deactivate", 2)],
+            [row(3, "reactivate", 2, expires_at=later)],
+        )
+
+        assert await revocations.refresh(db) == 2
+        assert revocations.is_revoked("abc", 1)
+        assert revocations.is_revoked(None, 2)
+        assert await revocations.refresh(db) == 1
+
+        assert not revocations.is_revoked(None, 2)
+        assert "token_revocations.id > " in str(db.execute.await_args_list[1].args[0])
+        assert revocations.rows.last_id == 3
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_late_commits_below_the_last_id_are_applied(self):
+        """Test a row that commits after a higher id was read is still applied, and only once."""
+        later = utc_now() + timedelta(minutes=5)
+        revocations = RevocationList()
+        first, late = row(2, "token", 1, "abc", later), row(1, "token", 1, "def", later)
+        db = rows_db([first], [late, first], [late, first])
+
+        await revocations.refresh(db)
+        assert await revocations.refresh(db) == 1
+        assert await revocations.refresh(db) == 0
+
+        assert revocations.is_revoked("def", 1)
+        assert "token_revocations.created_at >= " in str(db.execute.await_args_list[1].args[0])
+        assert revocations.rows.last_id == 2
+
+    @pytest.mark.unit
+    def test_expired_tokens_are_pruned(self):
+        """Test tokens are forgotten once they would have expired anyway."""
+        revocations = RevocationList()
+        revocations.apply("token", "old", 1, utc_now() - timedelta(seconds=1))
+        revocations.apply("token", "new", 1, utc_now() + timedelta(minutes=5))
+
+        revocations.prune(utc_now())
+
+        assert not revocations.is_revoked("old", 1)
+        assert revocations.is_revoked("new", 1)
+
+class TestRevocationChecks:
+    """Test revocation in token checks and user deactivation."""
+
+    @pytest.mark.unit
+    def test_access_tokens_carry_unique_ids(self, monkeypatch):
+        """Test every access token gets its own jti."""
+        monkeypatch.setattr(auth, "SECRET_KEY", "test-secret-key")
+        first = jwt.decode(create_access_token({"sub": "a"}), options={"verify_signature": False})
+        second = jwt.decode(create_access_token({"sub": "a"}), options={"verify_signature": False})
+
+        assert first["jti"] != second["jti"]
+
+    @pytest.mark.unit
+    def test_revoked_and_inactive_principals_are_rejected(self, fresh_list):
+        """Test a revoked jti, a deactivated user id and an inactive principal all give 401."""
+        active = Principal(1, "owner@example.com", "owner", 10, None, True)
+        fresh_list.apply("token", "abc", 1, utc_now() + timedelta(minutes=5))
+
+        assert _not_revoked(active, "other") is active
+        for principal, jti in ((active, "abc"), (active._replace(is_active=False), None)):
+            with pytest.raises(HTTPException) as exc:
+                _not_revoked(principal, jti)
+            assert exc.value.status_code == 401
+        fresh_list.apply("deactivate", None, 1, None)
+        with pytest.raises(HTTPException):
+            _not_revoked(active)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_deactivation_round_trip(self, fresh_list):
+        """Test deactivating records the user and bumps the token version, and reactivating clears it."""
+        user = SimpleNamespace(id=4, is_active=True, token_version=2)
+        db = Mock(add=Mock(), execute=AsyncMock(), commit=AsyncMock())
+
+        await deactivate_user(db, user)
+
+        recorded = db.add.call_args.args[0]
+        assert isinstance(recorded, TokenRevocation)
+        assert (recorded.kind, recorded.user_id) == ("deactivate", 4)
+        assert (user.is_active, user.token_version) == (False, 3)
+        assert fresh_list.is_revoked(None, 4)
+
+        await reactivate_user(db, user)
+
+        assert db.add.call_args.args[0].kind == "reactivate"
+        assert user.is_active is True
+        assert not fresh_list.is_revoked(None, 4)
@@ -0,0 +1,86 @@
+import hashlib
+import io
+import zipfile
+import pytest
+from datetime import date, datetime
+from decimal import Decimal
+
+from app.services.xlsx_export import _cell, stream_xlsx
+
+async def iter_rows(rows):
+    for row in rows:
+        yield row
+
+async def build_workbook(rows, title="Ledger"):
+    return b"".join([chunk async for chunk in stream_xlsx(iter_rows(rows), title)])
+
+class TestXlsxCells:
+    """Test typed cell encoding."""
+
+    @pytest.mark.unit
+    def test_numbers_and_money(self):
+        """Test numbers stay numeric and money columns get the 2dp style."""
+        assert _cell(42, False) == "<c><v>42</v></c>"
+        assert _cell(Decimal("1E+2"), True) == '<c s="1"><v>100</v></c>'
+        assert _cell(Decimal("10.50"), True) == '<c s="1"><v>10.50</v></c>'
+
+    @pytest.mark.unit
+    def test_dates_are_excel_serials(self):
+        """Test dates and datetimes are written as Excel serial numbers."""
+        assert _cell(date(1900, 3, 1), False) == '<c s="2"><v>61</v></c>'
+        assert _cell(datetime(1900, 3, 1, 12, 0), False) == '<c s="3"><v>61.5</v></c>'
+
+    @pytest.mark.unit
+    def test_text_is_escaped_and_cleaned(self):
+        """Test text is XML-escaped and stripped of control characters."""
+        cell = _cell("A & <B>\x01", False)
+
+        assert "A &amp; &lt;B&gt;</t>" in cell
+        assert "\x01" not in cell
+        assert _cell(None, False) == "<c/>"
+        assert _cell("", True) == "<c/>"
+
+class TestStreamXlsx:
+    """Test streaming workbook generation."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_workbook_parts(self):
+        """Test the archive holds a complete single-sheet workbook."""
+        content = await build_workbook([{"id": 1, "amount": Decimal("5.00")}], title="Bad:/Name")
+
+        archive = zipfile.ZipFile(io.BytesIO(content))
+        assert set(archive.namelist()) == {
+            "[Content_Types].xml", "_rels/.rels", "xl/workbook.xml",
+            "xl/_rels/workbook.xml.rels", "xl/styles.xml", "xl/worksheets/sheet1.xml",
+        }
+        assert 'name="BadName"' in archive.read("xl/workbook.xml").decode()
+        sheet = archive.read("xl/worksheets/sheet1.xml").decode()
+        assert sheet.count("<row>") == 2
+        assert '<c s="1"><v>5.00</v></c>' in sheet
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_streams_in_chunks(self, monkeypatch):
+        """Test compressed data is emitted while rows are still being read."""
+        monkeypatch.setattr("app.services.xlsx_export.XLSX_ROWS_PER_CHUNK", 100)
+        rows = [{"id": i, "description": hashlib.sha256(str(i).encode()).hexdigest()} for i in range(2000)]
+
+        chunks = [chunk async for chunk in stream_xlsx(iter_rows(rows), "Ledger")]
+
+        assert len(chunks) > 3
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_readable_by_openpyxl(self):
+        """Test the workbook opens with typed values."""
+        openpyxl = pytest.importorskip("openpyxl")
+        rows = [{"id": 7, "amount": Decimal("12.25"), "created_at": datetime(2024, 1, 2, 9, 30), "description": "Rice"}]
+
+        workbook = openpyxl.load_workbook(io.BytesIO(await build_workbook(rows)))
+        sheet = workbook.active
+        values = [cell.value for cell in sheet[2]]
+
+        assert [cell.value for cell in sheet[1]] == ["id", "amount", "created_at", "description"]
+        assert values == [7, 12.25, datetime(2024, 1, 2, 9, 30), "Rice"]
+        assert sheet["B2"].number_format == "#,##0.00"
@@ -0,0 +1,277 @@
+"""Latency and throughput of authentication and authorization.
+
+Runs the app in process against a fresh, seeded SQLite database and
+measures, per scenario, p50/p99 latency and requests per second:
+
+- login: the password check and token minting
+- the unauthenticated /health endpoint, as a floor for everything else
+- authenticated GETs as an owner, a cashier, a supervisor and an API key,
+  each through get_current_user and its role dependency
+- resource access checks on customers, ledger entries and businesses,
+  including a miss on another business's customer
+
+It also times token decoding and the full get_current_user call on their
+own, without HTTP. Results are JSON; write them with --output and pass an
+earlier file as --baseline to get the change per scenario.
+
+    python benchmarks/auth_suite.py --requests 2000 --output auth.json
+    python benchmarks/auth_suite.py --baseline auth.json
+
+BCRYPT_ROUNDS and PASSWORD_HASH_WORKERS are read from the environment as
+in the app.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+WORKDIR = tempfile.mkdtemp(prefix="auth_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(WORKDIR, 'bench.db')}")
+os.environ.setdefault("SECRET_KEY", "auth-benchmark-secret-key-long-enough-for-hs256")
+# Every request comes from one address; keep the login throttle out of the way.
+os.environ.setdefault("LOGIN_RATE_LIMIT_PER_IP", "1000000/1")
+os.environ.setdefault("LOGIN_RATE_LIMIT_PER_ACCOUNT", "1000000/1")
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+# --output and --baseline are relative to where the script was started.
+INVOCATION_DIR = os.getcwd()
+os.chdir(WORKDIR)
+
+import httpx
+from app.database import Base, SessionLocal, engine
+from app.db.models.business import Business
+from app.db.models.customer import Customer
+from app.db.models.ledger_entry import LedgerEntry
+from app.db.models.user import StaffAssignment, User
+from app.main import app
+from app.services.api_keys import issue_api_key
+from app.services.auth import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, decode_access_token, get_current_user, get_password_hash, password_hasher
+
+PASSWORD = "benchmark-password"
+USERS = {
+    "owner": "owner@example.com",
+    "cashier": "cashier@example.com",
+    "supervisor": "supervisor@example.com",
+}
+
+
+async def seed(customers: int, entries_per_customer: int) -> str:
+    engine.echo = False
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    hashed = await get_password_hash(PASSWORD)
+    async with SessionLocal() as db:
+        business, other = Business(name="Benchmark"), Business(name="Other")
+        db.add_all([business, other])
+        await db.flush()
+        owner = User(email=USERS["owner"], hashed_password=hashed, role="owner", business_id=business.id, is_verified=True)
+        db.add(owner)
+        await db.flush()
+        for staff_role in ("cashier", "supervisor"):
+            staff = User(email=USERS[staff_role], hashed_password=hashed, role="staff", business_id=business.id, is_verified=True)
+            db.add(staff)
+            await db.flush()
+            db.add(StaffAssignment(staff_id=staff.id, owner_id=owner.id, assigned_role=staff_role))
+        for i in range(customers):
+            customer = Customer(
+                name=f"Customer {i}", email=f"customer{i}@example.com", business_id=business.id, created_by_id=owner.id
+            )
+            db.add(customer)
+            await db.flush()
+            db.add_all([
+                LedgerEntry(
+                    customer_id=customer.id, business_id=business.id, entry_type="credit" if j % 2 else "debit",
+                    amount=100 + j, created_by_id=owner.id
+                )
+                for j in range(entries_per_customer)
+            ])
+        db.add(Customer(name="Elsewhere", email="elsewhere@example.com", business_id=other.id, created_by_id=owner.id))
+        _, key = issue_api_key(db, business.id, owner.id, "Benchmark", ["ledger:write", "analytics:read"])
+        await db.commit()
+    return key
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(name: str, latencies, statuses: dict, elapsed: float, expected: int) -> dict:
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "unexpected": sum(count for code, count in statuses.items() if code != expected),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "latency_p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, request, requests: int, concurrency: int, warmup: int, expected: int) -> dict:
+    # request() builds the call for one iteration; warm-up requests fill
+    # the principal and API key caches and are not counted.
+    for _ in range(warmup):
+        await request(client)
+    latencies, statuses = [], {}
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await request(client)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(name, latencies, statuses, time.perf_counter() - started, expected)
+
+
+async def time_call(name: str, call, iterations: int) -> dict:
+    # Microbenchmarks run one call at a time, so the numbers are CPU cost.
+    for _ in range(min(iterations, 100)):
+        await call()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await call()
+        samples.append(time.perf_counter() - started)
+    return {
+        "scenario": name,
+        "iterations": iterations,
+        "latency_p50_us": round(statistics.median(samples) * 1e6, 2),
+        "latency_p99_us": round(percentile(samples, 0.99) * 1e6, 2),
+        "calls_per_second": round(iterations / sum(samples), 1),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: dict, baseline: dict):
+    # Adds the relative change of p50 latency and throughput to each
+    # scenario that also appears in the baseline.
+    earlier = {entry["scenario"]: entry for entry in baseline.get("scenarios", []) + baseline.get("micro", [])}
+    for entry in results["scenarios"] + results["micro"]:
+        before = earlier.get(entry["scenario"])
+        if before is None:
+            continue
+        for key in ("latency_p50_ms", "latency_p50_us", "requests_per_second", "calls_per_second"):
+            if key in entry and before.get(key):
+                entry[f"{key}_change_pct"] = round((entry[key] - before[key]) / before[key] * 100, 1)
+    results["baseline_commit"] = baseline.get("commit")
+
+
+async def run(args) -> dict:
+    api_key = await seed(args.customers, args.entries)
+    transport = httpx.ASGITransport(app=app)
+    scenarios = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = {}
+        refresh_token = None
+        for role, email in USERS.items():
+            response = await client.post("/users/login", json={"email": email, "password": PASSWORD})
+            response.raise_for_status()
+            headers[role] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            refresh_token = refresh_token or response.json()["refresh_token"]
+        headers["api_key"] = {"X-API-Key": api_key}
+
+        def get(path: str, role: str = None):
+            return lambda c: c.get(path, headers=headers.get(role, {}))
+
+        login = lambda c: c.post("/users/login", json={"email": USERS["owner"], "password": PASSWORD})
+        cases = [
+            ("login", login, args.login_requests, 200),
+            ("health_unauthenticated", get("/health"), args.requests, 200),
+            ("profile_owner", get("/profile", "owner"), args.requests, 200),
+            ("customers_list_owner", get("/customers/", "owner"), args.requests, 200),
+            ("customers_list_cashier", get("/customers/", "cashier"), args.requests, 200),
+            ("customers_list_api_key", get("/customers/", "api_key"), args.requests, 200),
+            ("analytics_supervisor", get("/analytics/customer/receivables/", "supervisor"), args.requests, 200),
+            ("analytics_api_key", get("/analytics/customer/receivables/", "api_key"), args.requests, 200),
+            ("role_denied_supervisor", get("/customers/", "supervisor"), args.requests, 403),
+            ("customer_access_owner", get("/customers/1", "owner"), args.requests, 200),
+            ("customer_access_cashier", get("/customers/1", "cashier"), args.requests, 200),
+            ("customer_access_other_business", get(f"/customers/{args.customers + 1}", "owner"), args.requests, 404),
+            ("ledger_entry_access_cashier", get("/ledger/1", "cashier"), args.requests, 200),
+            ("business_ledgers_owner", get("/businesses/1/ledgers/", "owner"), args.requests, 200),
+        ]
+        for name, request, requests, expected in cases:
+            if requests <= 0:
+                continue
+            concurrency = min(args.concurrency, requests)
+            scenarios.append(await run_scenario(client, name, request, requests, concurrency, args.warmup, expected))
+
+    token = headers["owner"]["Authorization"].split(" ", 1)[1]
+    credentials = SimpleNamespace(credentials=token)
+
+    async def decode():
+        decode_access_token(token)
+
+    async def resolve():
+        async with SessionLocal() as db:
+            await get_current_user(credentials, db, None)
+
+    micro = [
+        await time_call("token_decode", decode, args.iterations),
+        await time_call("get_current_user_cached", resolve, args.iterations),
+    ]
+    password_hasher.shutdown()
+    await engine.dispose()
+
+    return {
+        "benchmark": "auth_suite",
+        "commit": git_commit(),
+        "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "bcrypt_rounds": BCRYPT_ROUNDS,
+        "hash_workers": PASSWORD_HASH_WORKERS,
+        "concurrency": args.concurrency,
+        "customers": args.customers,
+        "entries_per_customer": args.entries,
+        "scenarios": scenarios,
+        "micro": micro,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=100, help="requests for the login scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=5000, help="calls per microbenchmark")
+    parser.add_argument("--customers", type=int, default=20)
+    parser.add_argument("--entries", type=int, default=5, help="ledger entries per customer")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.baseline:
+        with open(os.path.join(INVOCATION_DIR, args.baseline)) as handle:
+            compare(results, json.load(handle))
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(os.path.join(INVOCATION_DIR, args.output), "w") as handle:
+            handle.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
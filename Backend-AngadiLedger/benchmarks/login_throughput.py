@@ -0,0 +1,125 @@
+"""Login throughput at a fixed number of concurrent clients.
+
+Runs the app in process against a fresh SQLite database and sends
+--requests logins, --concurrency at a time. It also samples event-loop
+lag: with hashing off the loop, other requests keep being served while
+logins wait for bcrypt.
+
+    python benchmarks/login_throughput.py --concurrency 50 --requests 500
+
+BCRYPT_ROUNDS and PASSWORD_HASH_WORKERS are read from the environment as
+in the app.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix="login_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(WORKDIR, 'bench.db')}")
+os.environ.setdefault("SECRET_KEY", "login-benchmark-secret-key-long-enough-for-hs256")
+# Every request comes from one address; keep the login throttle out of the way.
+os.environ.setdefault("LOGIN_RATE_LIMIT_PER_IP", "1000000/1")
+os.environ.setdefault("LOGIN_RATE_LIMIT_PER_ACCOUNT", "1000000/1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(WORKDIR)
+
+import httpx
+from app.database import Base, SessionLocal, engine
+from app.db.models.business import Business
+from app.db.models.user import User
+from app.main import app
+from app.services.auth import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, get_password_hash, password_hasher
+
+PASSWORD = "benchmark-password"
+
+
+async def seed(users: int):
+    engine.echo = False
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    hashed = await get_password_hash(PASSWORD)
+    async with SessionLocal() as db:
+        business = Business(name="Benchmark")
+        db.add(business)
+        await db.flush()
+        for i in range(users):
+            db.add(User(
+                email=f"user{i}@example.com", hashed_password=hashed, role="owner",
+                business_id=business.id, is_verified=True
+            ))
+        await db.commit()
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.01):
+    lags = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+    return lags
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run(concurrency: int, requests: int, users: int) -> dict:
+    await seed(users)
+    latencies, statuses = [], {}
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(f"user{i % users}@example.com")
+
+    async def client_worker(client: httpx.AsyncClient):
+        while not queue.empty():
+            email = queue.get_nowait()
+            started = time.perf_counter()
+            response = await client.post("/users/login", json={"email": email, "password": PASSWORD})
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    stop.set()
+    lags = await lag_task
+    password_hasher.shutdown()
+    await engine.dispose()
+
+    return {
+        "benchmark": "login_throughput",
+        "bcrypt_rounds": BCRYPT_ROUNDS,
+        "hash_workers": PASSWORD_HASH_WORKERS,
+        "concurrency": concurrency,
+        "requests": requests,
+        "statuses": statuses,
+        "seconds": round(elapsed, 3),
+        "logins_per_second": round(requests / elapsed, 1),
+        "latency_p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "loop_lag_max_ms": round(max(lags, default=0.0) * 1000, 1),
+        "loop_lag_p99_ms": round(percentile(lags, 0.99) * 1000, 1) if lags else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.concurrency, args.requests, args.users)), indent=2))
+
+
+if __name__ == "__main__":
+    main()